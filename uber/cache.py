@@ -1,5 +1,6 @@
 import time
-from threading import Lock
+from collections import OrderedDict
+from threading import Event, Lock
 
 _cache = {}
 _lock = Lock()
@@ -75,3 +76,86 @@ def get_flights(fetch_func):
     data = fetch_func()
     set_cached('global', 'flights', data)
     return data
+
+
+# Driver lookups by location, shared by the intelligence daemon and the
+# driver endpoints. Keys are coordinates rounded to ~100 m; a lookup already
+# in flight for a key is joined rather than repeated upstream. Entries are kept
+# oldest first, so expiry and the size cap both trim from the front.
+
+DRIVER_LOCATION_TTL = 10
+DRIVER_LOCATION_PRECISION = 3
+DRIVER_LOCATION_MAX_ENTRIES = 5000
+
+_location_cache = OrderedDict()
+_location_inflight = {}
+_location_stats = {'hits': 0, 'misses': 0, 'coalesced': 0, 'errors': 0, 'evicted': 0}
+
+def _location_key(lat, lng):
+    return (round(lat, DRIVER_LOCATION_PRECISION), round(lng, DRIVER_LOCATION_PRECISION))
+
+def _copy_drivers(drivers):
+    # Callers stamp and merge the dicts they get back, so never hand out the cached ones
+    return [dict(d) for d in drivers]
+
+def _prune_locations(now):
+    while _location_cache:
+        key, entry = next(iter(_location_cache.items()))
+        if now - entry['timestamp'] < DRIVER_LOCATION_TTL:
+            break
+        del _location_cache[key]
+    while len(_location_cache) >= DRIVER_LOCATION_MAX_ENTRIES:
+        _location_cache.popitem(last=False)
+        _location_stats['evicted'] += 1
+
+def get_drivers_at_location(lat, lng, fetch_func, max_age=DRIVER_LOCATION_TTL):
+    key = _location_key(lat, lng)
+    with _lock:
+        entry = _location_cache.get(key)
+        if entry is not None and time.time() - entry['timestamp'] < max_age:
+            _location_stats['hits'] += 1
+            return _copy_drivers(entry['data'])
+        call = _location_inflight.get(key)
+        leader = call is None
+        if leader:
+            call = {'done': Event(), 'data': None, 'error': None}
+            _location_inflight[key] = call
+            _location_stats['misses'] += 1
+        else:
+            _location_stats['coalesced'] += 1
+
+    if not leader:
+        call['done'].wait()
+        if call['error'] is not None:
+            raise call['error']
+        return _copy_drivers(call['data'])
+
+    try:
+        data = fetch_func(lat, lng) or []
+        call['data'] = data
+        with _lock:
+            now = time.time()
+            if len(_location_cache) >= DRIVER_LOCATION_MAX_ENTRIES:
+                _prune_locations(now)
+            _location_cache.pop(key, None)
+            _location_cache[key] = {'data': data, 'timestamp': now}
+    except Exception as e:
+        call['error'] = e
+        with _lock:
+            _location_stats['errors'] += 1
+        raise
+    finally:
+        with _lock:
+            _location_inflight.pop(key, None)
+        call['done'].set()
+    return _copy_drivers(data)
+
+def get_location_cache_stats():
+    with _lock:
+        lookups = _location_stats['hits'] + _location_stats['misses'] + _location_stats['coalesced']
+        return {
+            **_location_stats,
+            'entries': len(_location_cache),
+            'inflight': len(_location_inflight),
+            'upstream_saved_rate': round((lookups - _location_stats['misses']) / lookups, 3) if lookups else 0.0,
+        }
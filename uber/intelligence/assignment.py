@@ -0,0 +1,128 @@
+"""
+Sparse One-to-One Assignment
+Min-cost matching of sightings to tracks on the gated candidate graph.
+The graph is split into connected components and each component is solved
+with the Hungarian method, so cost follows component size, not batch size.
+"""
+
+from typing import Dict, Hashable, List, Optional, Sequence, Tuple
+
+FORBIDDEN_COST = 1e6
+
+
+def _hungarian(cost: List[List[float]]) -> List[int]:
+    """Column index assigned to each row of an n x m cost matrix (n <= m)"""
+    n = len(cost)
+    m = len(cost[0]) if n else 0
+    inf = float('inf')
+
+    u = [0.0] * (n + 1)
+    v = [0.0] * (m + 1)
+    p = [0] * (m + 1)
+    way = [0] * (m + 1)
+
+    for i in range(1, n + 1):
+        p[0] = i
+        j0 = 0
+        minv = [inf] * (m + 1)
+        used = [False] * (m + 1)
+        while True:
+            used[j0] = True
+            i0 = p[j0]
+            row = cost[i0 - 1]
+            delta = inf
+            j1 = 0
+            for j in range(1, m + 1):
+                if used[j]:
+                    continue
+                cur = row[j - 1] - u[i0] - v[j]
+                if cur < minv[j]:
+                    minv[j] = cur
+                    way[j] = j0
+                if minv[j] < delta:
+                    delta = minv[j]
+                    j1 = j
+            for j in range(m + 1):
+                if used[j]:
+                    u[p[j]] += delta
+                    v[j] -= delta
+                else:
+                    minv[j] -= delta
+            j0 = j1
+            if p[j0] == 0:
+                break
+        while True:
+            j1 = way[j0]
+            p[j0] = p[j1]
+            j0 = j1
+            if j0 == 0:
+                break
+
+    assignment = [-1] * n
+    for j in range(1, m + 1):
+        if p[j]:
+            assignment[p[j] - 1] = j - 1
+    return assignment
+
+
+def _components(candidates: Sequence[Sequence[Tuple[Hashable, float]]]) -> List[List[int]]:
+    parent = list(range(len(candidates)))
+
+    def find(x: int) -> int:
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    owner: Dict[Hashable, int] = {}
+    for row, cands in enumerate(candidates):
+        for key, _ in cands:
+            other = owner.setdefault(key, row)
+            if other != row:
+                ra, rb = find(row), find(other)
+                if ra != rb:
+                    parent[ra] = rb
+
+    groups: Dict[int, List[int]] = {}
+    for row, cands in enumerate(candidates):
+        if cands:
+            groups.setdefault(find(row), []).append(row)
+    return list(groups.values())
+
+
+def solve_assignment(candidates: Sequence[Sequence[Tuple[Hashable, float]]]) -> List[Optional[Hashable]]:
+    """
+    candidates[row] lists the (track_key, score) pairs that passed gating for that row.
+    Returns the track key assigned to each row (or None), maximising the total score
+    with every track used at most once.
+    """
+    assigned: List[Optional[Hashable]] = [None] * len(candidates)
+
+    for rows in _components(candidates):
+        if len(rows) == 1:
+            row = rows[0]
+            assigned[row] = max(candidates[row], key=lambda c: c[1])[0]
+            continue
+
+        keys: List[Hashable] = []
+        col_of: Dict[Hashable, int] = {}
+        for row in rows:
+            for key, _ in candidates[row]:
+                if key not in col_of:
+                    col_of[key] = len(keys)
+                    keys.append(key)
+
+        n_cols = len(keys)
+        cost = []
+        for r, row in enumerate(rows):
+            line = [FORBIDDEN_COST] * (n_cols + len(rows))
+            for key, score in candidates[row]:
+                line[col_of[key]] = min(line[col_of[key]], -score)
+            line[n_cols + r] = 0.0
+            cost.append(line)
+
+        for r, col in enumerate(_hungarian(cost)):
+            if 0 <= col < n_cols and cost[r][col] < FORBIDDEN_COST:
+                assigned[rows[r]] = keys[col]
+
+    return assigned
@@ -0,0 +1,869 @@
+"""
+Intelligence Engine Benchmarks
+Run from the repository root:
+    python -m uber.intelligence.bench scoring
+    python -m uber.intelligence.bench assignment
+    python -m uber.intelligence.bench fallback
+    python -m uber.intelligence.bench archive
+    python -m uber.intelligence.bench lifecycle
+    python -m uber.intelligence.bench counts
+    python -m uber.intelligence.bench memory
+    python -m uber.intelligence.bench grid
+    python -m uber.intelligence.bench sharding
+    python -m uber.intelligence.bench dedup
+    python -m uber.intelligence.bench geo
+    python -m uber.intelligence.bench trajectory
+    python -m uber.intelligence.bench prediction
+    python -m uber.intelligence.bench flows
+"""
+
+import argparse
+import collections
+import math
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+import types
+from typing import Callable, List
+
+import numpy as np
+
+from . import clock
+from .dedup import DriverDeduplicator, DriverSighting, SpatialGrid
+from . import geo
+from .geo import bearing_deg, haversine_m
+from .scoring import score_pairs
+from .sharding import ShardedDeduplicator
+from .simulator import TrafficSimulator
+from .spatial import TimedSpatialIndex
+from .trackstore import TrackStore
+from .trajectory import FlowEventLog, TrajectoryAnalyzer
+from .zones import SCAN_ZONES, ZONE_REGISTRY, zone_id_for_name
+
+CBD_LAT, CBD_LNG = -31.9505, 115.8605
+VEHICLE_TYPES = ['UberX', 'UberX', 'UberX', 'Comfort', 'XL', 'Black']
+
+
+def _offset(lat: float, lng: float, north_m: float, east_m: float):
+    return (lat + north_m / 111000,
+            lng + east_m / (111000 * math.cos(math.radians(lat))))
+
+
+def _random_point(rng: random.Random, radius_m: float, center=(CBD_LAT, CBD_LNG)):
+    r = radius_m * math.sqrt(rng.random())
+    theta = rng.random() * 2 * math.pi
+    return _offset(center[0], center[1], r * math.cos(theta), r * math.sin(theta))
+
+
+def seed_tracks(dedup: DriverDeduplicator, n_tracks: int, now: float,
+                radius_m: float = 2000, seed: int = 7):
+    """Populate dedup with n_tracks moving tracks, each seen twice before now"""
+    rng = random.Random(seed)
+    for _ in range(n_tracks):
+        lat, lng = _random_point(rng, radius_m)
+        heading = rng.uniform(0, 360)
+        speed = rng.uniform(0, 15)
+        vtype = rng.choice(VEHICLE_TYPES)
+        first_ts = now - rng.uniform(20, 40)
+
+        first = DriverSighting(lat=lat, lng=lng, bearing=heading, vehicle_type=vtype,
+                               timestamp=first_ts, zone_id='perth_cbd',
+                               eta_seconds=rng.choice([None, rng.uniform(60, 600)]))
+        fid = dedup._create_fingerprint()
+        dedup._add_new_driver(fid, first)
+
+        dt = rng.uniform(8, 15)
+        lat2, lng2 = _offset(lat, lng,
+                             speed * dt * math.cos(math.radians(heading)),
+                             speed * dt * math.sin(math.radians(heading)))
+        second = DriverSighting(lat=lat2, lng=lng2, bearing=heading, vehicle_type=vtype,
+                                timestamp=first_ts + dt, zone_id='perth_cbd',
+                                eta_seconds=first.eta_seconds)
+        dedup._update_driver(dedup.tracked_drivers[fid], second)
+
+
+def jump_batch(dedup: DriverDeduplicator, n_sightings: int, now: float,
+               radius_m: float = 15000, seed: int = 13) -> List[DriverSighting]:
+    """Tracks whose last fix jumped 300 m in 2 s, plus a sighting on each one's prediction 30 s on"""
+    rng = random.Random(seed)
+    batch = []
+    for _ in range(n_sightings):
+        lat, lng = _random_point(rng, radius_m)
+        heading = rng.uniform(0, 360)
+        vtype = rng.choice(VEHICLE_TYPES)
+        first = DriverSighting(lat=lat, lng=lng, bearing=heading, vehicle_type=vtype,
+                               timestamp=now - 32, zone_id='perth_cbd')
+        fid = dedup._create_fingerprint()
+        dedup._add_new_driver(fid, first)
+
+        lat2, lng2 = _offset(lat, lng, 300 * math.cos(math.radians(heading)), 300 * math.sin(math.radians(heading)))
+        dedup._update_driver(dedup.tracked_drivers[fid],
+                             DriverSighting(lat=lat2, lng=lng2, bearing=heading, vehicle_type=vtype,
+                                            timestamp=now - 30, zone_id='perth_cbd'))
+
+        pred_lat, pred_lng = dedup.tracked_drivers[fid].get_predicted_position(now)
+        batch.append(DriverSighting(lat=pred_lat, lng=pred_lng, bearing=heading, vehicle_type=vtype,
+                                    timestamp=now, zone_id='perth_cbd'))
+    return batch
+
+
+def make_batch(n_sightings: int, now: float, radius_m: float = 800, seed: int = 11) -> List[DriverSighting]:
+    rng = random.Random(seed)
+    batch = []
+    for _ in range(n_sightings):
+        lat, lng = _random_point(rng, radius_m)
+        batch.append(DriverSighting(
+            lat=lat, lng=lng,
+            bearing=rng.choice([None, rng.uniform(0, 360)]),
+            vehicle_type=rng.choice(VEHICLE_TYPES),
+            timestamp=now,
+            zone_id='perth_cbd',
+            eta_seconds=rng.choice([None, rng.uniform(60, 600)])
+        ))
+    return batch
+
+
+def _time_ms(func: Callable, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+class SyntheticTraffic:
+    """Cars driving in close platoons with noisy sightings and a known true identity"""
+
+    def __init__(self, n_cars: int, start: float, platoon_size: int = 3,
+                 spacing_m: float = 25, noise_m: float = 8, seed: int = 3,
+                 center=(CBD_LAT, CBD_LNG), zone_id: str = 'perth_cbd'):
+        self.rng = random.Random(seed)
+        self.now = start
+        self.noise_m = noise_m
+        self.zone_id = zone_id
+        self.cars = []
+        for i in range(n_cars):
+            if i % platoon_size == 0:
+                lat, lng = _random_point(self.rng, 1500, center)
+                heading = self.rng.uniform(0, 360)
+                speed = self.rng.uniform(4, 14)
+                vtype = self.rng.choice(VEHICLE_TYPES)
+                lead = (lat, lng)
+            back = (i % platoon_size) * spacing_m
+            lat, lng = _offset(lead[0], lead[1],
+                               -back * math.cos(math.radians(heading)),
+                               -back * math.sin(math.radians(heading)))
+            self.cars.append({'id': i, 'lat': lat, 'lng': lng, 'heading': heading,
+                              'speed': speed * self.rng.uniform(0.9, 1.1), 'vtype': vtype})
+
+    def step(self, dt: float) -> List[DriverSighting]:
+        self.now += dt
+        for car in self.cars:
+            car['heading'] = (car['heading'] + self.rng.gauss(0, 4)) % 360
+            dist = car['speed'] * dt
+            car['lat'], car['lng'] = _offset(car['lat'], car['lng'],
+                                             dist * math.cos(math.radians(car['heading'])),
+                                             dist * math.sin(math.radians(car['heading'])))
+
+        batch = []
+        for car in self.cars:
+            lat, lng = _offset(car['lat'], car['lng'],
+                               self.rng.gauss(0, self.noise_m), self.rng.gauss(0, self.noise_m))
+            batch.append(DriverSighting(
+                lat=lat, lng=lng,
+                bearing=(car['heading'] + self.rng.gauss(0, 5)) % 360,
+                vehicle_type=car['vtype'],
+                timestamp=self.now,
+                zone_id=self.zone_id,
+            ))
+        return batch
+
+
+def run_traffic(dedup: DriverDeduplicator, traffic: SyntheticTraffic, steps: int, dt: float = 10):
+    """Feed traffic through dedup; returns (sightings/sec, identity continuity, tracks created)"""
+    last_fid = {}
+    transitions = 0
+    kept = 0
+    total_sightings = 0
+    elapsed = 0.0
+
+    for _ in range(steps):
+        batch = traffic.step(dt)
+        start = time.perf_counter()
+        results = dedup.process_batch(batch, is_dense=True)
+        elapsed += time.perf_counter() - start
+        total_sightings += len(batch)
+
+        for car, (fid, _, _) in zip(traffic.cars, results):
+            if car['id'] in last_fid:
+                transitions += 1
+                kept += last_fid[car['id']] == fid
+            last_fid[car['id']] = fid
+
+    continuity = kept / transitions if transitions else 1.0
+    return total_sightings / max(elapsed, 1e-9), continuity, dedup._stats['new_tracks']
+
+
+def bench_assignment(car_counts=(15, 30, 60), steps: int = 30, seeds=(0, 1, 2)):
+    """Greedy vs optimal one-to-one assignment on platooned synthetic traffic"""
+    print(f"{'cars':>6} {'strategy':>9} {'sightings/s':>12} {'continuity':>11} {'tracks':>7}")
+
+    for n_cars in car_counts:
+        for strategy in ('greedy', 'optimal'):
+            runs = []
+            for seed in seeds:
+                traffic = SyntheticTraffic(n_cars, 1000.0, seed=seed)
+                dedup = DriverDeduplicator(clock=lambda: traffic.now)
+                dedup.ASSIGNMENT_STRATEGY = strategy
+                runs.append(run_traffic(dedup, traffic, steps))
+
+            rate = statistics.mean(r[0] for r in runs)
+            continuity = statistics.mean(r[1] for r in runs)
+            tracks = statistics.mean(r[2] for r in runs)
+            print(f"{n_cars:>6} {strategy:>9} {rate:>12.0f} {continuity:>10.1%} {tracks:>7.1f}")
+
+
+def bench_fallback(track_counts=(100, 1000, 10000), n_sightings: int = 50, repeat: int = 5):
+    """_find_recent_match: full scan of tracked_drivers vs spatially indexed lookup
+
+    'gps jump' sightings sit on the extrapolation of tracks whose last fix
+    jumped 300 m in 2 s, so the indexed radius has to cover the prediction.
+    """
+    print(f"{'tracks':>8} {'batch':>9} {'scan ms':>9} {'indexed ms':>11} {'speedup':>8} {'same match':>11}")
+
+    for n_tracks in track_counts:
+        for kind in ('random', 'gps jump'):
+            now = clock.now()
+            dedup = DriverDeduplicator()
+            seed_tracks(dedup, n_tracks, now, radius_m=15000)
+            if kind == 'random':
+                batch = make_batch(n_sightings, now, radius_m=15000)
+            else:
+                batch = jump_batch(dedup, n_sightings, now)
+            threshold_m = dedup.DEFAULT_COORD_THRESHOLD_M
+
+            def scan():
+                return [dedup._best_recent_match(s, threshold_m, None, dedup.tracked_drivers.values())
+                        for s in batch]
+
+            def indexed():
+                return [dedup._find_recent_match(s, threshold_m) for s in batch]
+
+            same = sum(a[0] is b[0] for a, b in zip(scan(), indexed()))
+            scan_ms = _time_ms(scan, repeat)
+            indexed_ms = _time_ms(indexed, repeat)
+            print(f"{n_tracks:>8} {kind:>9} {scan_ms:>9.2f} {indexed_ms:>11.2f} "
+                  f"{scan_ms / max(indexed_ms, 1e-9):>7.1f}x {same:>5}/{len(batch):<5}")
+
+
+def _nearest_scan(entries, vehicle_type: str, lat: float, lng: float, radius_m: float):
+    best, best_distance = None, float('inf')
+    for key, (vtype, e_lat, e_lng) in entries.items():
+        if vtype != vehicle_type:
+            continue
+        distance = haversine_m(e_lat, e_lng, lat, lng)
+        if distance < radius_m and distance < best_distance:
+            best, best_distance = key, distance
+    return best
+
+
+def _nearest_indexed(index: TimedSpatialIndex, vehicle_type: str, lat: float, lng: float, radius_m: float):
+    best, best_distance = None, float('inf')
+    for key, entry in index.query(vehicle_type, lat, lng, radius_m):
+        distance = haversine_m(entry.lat, entry.lng, lat, lng)
+        if distance < radius_m and distance < best_distance:
+            best, best_distance = key, distance
+    return best
+
+
+def bench_archive(entry_counts=(100, 1000, 10000), n_sightings: int = 50, repeat: int = 5):
+    """Cross-grid cache / dead archive lookups: dict scan vs TimedSpatialIndex"""
+    print(f"{'entries':>8} {'radius m':>9} {'scan ms':>9} {'indexed ms':>11} {'speedup':>8} {'same':>9}")
+
+    for n_entries in entry_counts:
+        for radius_m, cell_size_m in ((1230, DriverDeduplicator.CROSS_GRID_CELL_SIZE_M),
+                                      (450, DriverDeduplicator.ARCHIVE_CELL_SIZE_M)):
+            now = clock.now()
+            rng = random.Random(5)
+            entries = {}
+            index = TimedSpatialIndex(cell_size_m=cell_size_m)
+            for i in range(n_entries):
+                lat, lng = _random_point(rng, 15000)
+                vtype = rng.choice(VEHICLE_TYPES)
+                entries[str(i)] = (vtype, lat, lng)
+                index.put(str(i), vtype, lat, lng, now)
+            batch = make_batch(n_sightings, now, radius_m=15000)
+
+            def scan():
+                return [_nearest_scan(entries, s.vehicle_type, s.lat, s.lng, radius_m) for s in batch]
+
+            def indexed():
+                return [_nearest_indexed(index, s.vehicle_type, s.lat, s.lng, radius_m) for s in batch]
+
+            same = sum(a == b for a, b in zip(scan(), indexed()))
+            scan_ms = _time_ms(scan, repeat)
+            indexed_ms = _time_ms(indexed, repeat)
+            print(f"{n_entries:>8} {radius_m:>9} {scan_ms:>9.2f} {indexed_ms:>11.2f} "
+                  f"{scan_ms / max(indexed_ms, 1e-9):>7.1f}x {same:>4}/{len(batch):<4}")
+
+
+def bench_lifecycle(track_counts=(100, 1000, 10000), repeat: int = 20):
+    """Per-batch _update_track_states cost when no TTL has expired"""
+    print(f"{'tracks':>8} {'ms/call':>9}")
+
+    for n_tracks in track_counts:
+        now = clock.now()
+        dedup = DriverDeduplicator(clock=lambda: now)
+        seed_tracks(dedup, n_tracks, now)
+        print(f"{n_tracks:>8} {_time_ms(dedup._update_track_states, repeat):>9.4f}")
+
+
+def bench_counts(track_counts=(100, 1000, 10000), repeat: int = 20):
+    """Fleet counter reads: full recount vs incrementally maintained counters"""
+    print(f"{'tracks':>8} {'recount ms':>11} {'counters ms':>12} {'speedup':>8}")
+
+    for n_tracks in track_counts:
+        now = clock.now()
+        dedup = DriverDeduplicator(clock=lambda: now)
+        seed_tracks(dedup, n_tracks, now)
+
+        def counters():
+            dedup.get_driver_count()
+            dedup.get_counts_by_type()
+            dedup.get_counts_by_zone()
+
+        recount_ms = _time_ms(dedup._recount, repeat)
+        counters_ms = _time_ms(counters, repeat)
+        print(f"{n_tracks:>8} {recount_ms:>11.3f} {counters_ms:>12.4f} "
+              f"{recount_ms / max(counters_ms, 1e-9):>7.0f}x")
+
+
+class LegacySpatialGrid:
+    """The pre-index SpatialGrid: one set per cell, (2r+1)^2 lookups per query, cos per call"""
+    CELL_SIZE_M = 150
+
+    def __init__(self):
+        self.cells = collections.defaultdict(set)
+
+    def _lat_lng_to_cell(self, lat: float, lng: float):
+        lat_cell = int((lat + 90) * 111000 / self.CELL_SIZE_M)
+        lng_cell = int((lng + 180) * 111000 * math.cos(math.radians(lat)) / self.CELL_SIZE_M)
+        return (lat_cell, lng_cell)
+
+    def add_driver(self, fingerprint_id: str, lat: float, lng: float):
+        cell = self._lat_lng_to_cell(lat, lng)
+        self.cells[cell].add(fingerprint_id)
+        return cell
+
+    def get_nearby_drivers(self, lat: float, lng: float, radius: int = 1):
+        cx, cy = self._lat_lng_to_cell(lat, lng)
+        nearby = set()
+        for dx in range(-radius, radius + 1):
+            for dy in range(-radius, radius + 1):
+                nearby.update(self.cells.get((cx + dx, cy + dy), set()))
+        return nearby
+
+
+def bench_grid(track_counts=(100, 1000, 10000), radii=(5, 10), n_sightings: int = 200, repeat: int = 5):
+    """SpatialGrid neighbour queries: legacy cell-set unions vs type-partitioned row range scans"""
+    print("recall = share of same-type tracks within radius * 150 m that the query returns")
+    print(f"{'tracks':>8} {'radius':>7} {'legacy ms':>10} {'indexed ms':>11} {'speedup':>8} "
+          f"{'legacy recall':>14} {'indexed recall':>15}")
+
+    for n_tracks in track_counts:
+        rng = random.Random(17)
+        legacy = LegacySpatialGrid()
+        grid = SpatialGrid()
+        tracks = {}
+        for i in range(n_tracks):
+            lat, lng = _random_point(rng, 15000)
+            vtype = rng.choice(VEHICLE_TYPES)
+            tracks[str(i)] = (vtype, lat, lng)
+            legacy.add_driver(str(i), lat, lng)
+            grid.add_driver(str(i), vtype, lat, lng)
+        batch = make_batch(n_sightings, 0.0, radius_m=15000)
+
+        for radius in radii:
+            def legacy_query():
+                return [[fid for fid in legacy.get_nearby_drivers(s.lat, s.lng, radius)
+                         if tracks[fid][0] == s.vehicle_type] for s in batch]
+
+            def indexed_query():
+                return [grid.get_nearby_drivers(s.lat, s.lng, radius, s.vehicle_type) for s in batch]
+
+            truth = [{fid for fid, (vtype, lat, lng) in tracks.items()
+                      if vtype == s.vehicle_type and haversine_m(lat, lng, s.lat, s.lng) <= radius * 150}
+                     for s in batch]
+            total = max(sum(len(t) for t in truth), 1)
+            legacy_recall = sum(len(t & set(r)) for t, r in zip(truth, legacy_query())) / total
+            indexed_recall = sum(len(t & set(r)) for t, r in zip(truth, indexed_query())) / total
+
+            legacy_ms = _time_ms(legacy_query, repeat)
+            indexed_ms = _time_ms(indexed_query, repeat)
+            print(f"{n_tracks:>8} {radius:>7} {legacy_ms:>10.2f} {indexed_ms:>11.2f} "
+                  f"{legacy_ms / max(indexed_ms, 1e-9):>7.1f}x {legacy_recall:>13.1%} {indexed_recall:>14.1%}")
+
+
+def _deep_sizeof(obj, seen: set) -> int:
+    """sys.getsizeof summed over everything reachable from obj (classes and modules excluded)"""
+    if id(obj) in seen or isinstance(obj, (type, types.ModuleType, types.FunctionType)):
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+
+    if isinstance(obj, dict):
+        size += sum(_deep_sizeof(k, seen) + _deep_sizeof(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset, collections.deque)):
+        size += sum(_deep_sizeof(item, seen) for item in obj)
+    if hasattr(obj, '__dict__'):
+        size += _deep_sizeof(vars(obj), seen)
+    for slot in getattr(type(obj), '__slots__', ()):
+        if hasattr(obj, slot):
+            size += _deep_sizeof(getattr(obj, slot), seen)
+    return size
+
+
+def bench_memory(n_tracks: int = 300, points_per_track: int = 60):
+    """Bytes held per tracked driver once dedup and trajectory history buffers are full"""
+    now = clock.now()
+    rng = random.Random(13)
+
+    dedup = DriverDeduplicator()
+    analyzer = TrajectoryAnalyzer()
+    for _ in range(n_tracks):
+        lat, lng = _random_point(rng, 5000)
+        vtype = rng.choice(VEHICLE_TYPES)
+        ts = now - 10 * points_per_track
+        sighting = DriverSighting(lat=lat, lng=lng, bearing=90.0, vehicle_type=vtype,
+                                  timestamp=ts, zone_id='perth_cbd')
+        fid = dedup._create_fingerprint()
+        dedup._add_new_driver(fid, sighting)
+        driver = dedup.tracked_drivers[fid]
+
+        for _ in range(points_per_track):
+            ts += 10
+            lat, lng = _offset(lat, lng, rng.gauss(0, 30), rng.gauss(0, 30))
+            sighting = DriverSighting(lat=lat, lng=lng, bearing=rng.uniform(0, 360), vehicle_type=vtype,
+                                      timestamp=ts, zone_id='perth_cbd')
+            dedup._update_driver(driver, sighting)
+            analyzer.update_driver(fid, vtype, lat, lng, sighting.bearing, 'perth_cbd', ts, confidence=0.9)
+
+    seen = set()
+    dedup_bytes = _deep_sizeof(dedup.tracked_drivers, seen)
+    trajectory_bytes = _deep_sizeof(analyzer.trajectories, seen)
+    print(f"{n_tracks} tracks x {points_per_track} points")
+    print(f"{'dedup B/driver':>15} {'trajectory B/driver':>20} {'total B/driver':>15}")
+    print(f"{dedup_bytes / n_tracks:>15.0f} {trajectory_bytes / n_tracks:>20.0f} "
+          f"{(dedup_bytes + trajectory_bytes) / n_tracks:>15.0f}")
+
+
+def bench_scoring(track_counts=(100, 1000, 10000), n_sightings: int = 20, repeat: int = 5):
+    """Per-pair vs vectorized candidate scoring for one coordinate batch"""
+    print("Full candidate stage (grid lookup + scoring), then the scoring kernel alone")
+    print(f"{'tracks':>8} {'pairs':>9} {'per-pair ms':>12} {'vector ms':>10} {'speedup':>8} "
+          f"{'kernel pp':>10} {'kernel vec':>11} {'speedup':>8} {'max |diff|':>11}")
+
+    for n_tracks in track_counts:
+        now = clock.now()
+        dedup = DriverDeduplicator()
+        seed_tracks(dedup, n_tracks, now)
+        batch = make_batch(n_sightings, now)
+
+        scalar = dedup._collect_candidates(batch, True)
+        vector = dedup._collect_candidates_vectorized(batch, True)
+
+        max_diff = 0.0
+        for (_, _, s_cands), (_, _, v_cands) in zip(scalar, vector):
+            s_scores = {d.fingerprint_id: sc for d, sc in s_cands}
+            v_scores = {d.fingerprint_id: sc for d, sc in v_cands}
+            if s_scores.keys() != v_scores.keys():
+                max_diff = float('inf')
+                continue
+            for fid, sc in s_scores.items():
+                max_diff = max(max_diff, abs(sc - v_scores[fid]))
+
+        nearby = [dedup._gather_nearby(s) for s in batch]
+        pair_list = [(s, d) for s, drivers in zip(batch, nearby) for d in drivers]
+        drivers = list({d.fingerprint_id: d for _, d in pair_list}.values())
+        column_of = {d.fingerprint_id: col for col, d in enumerate(drivers)}
+        rows = [i for i, ds in enumerate(nearby) for _ in ds]
+        cols = [column_of[d.fingerprint_id] for _, d in pair_list]
+        thresholds = [dedup.get_threshold_for_zone(s.zone_id, True) for s in batch]
+        zone_speeds = [dedup._get_zone_speed(s.zone_id) for s in batch]
+
+        def kernel_scalar():
+            for s, d in pair_list:
+                dedup._calculate_match_score(d, s, dedup.get_threshold_for_zone(s.zone_id, True))
+
+        def kernel_vector():
+            score_pairs(batch, drivers, rows, cols, thresholds, zone_speeds, dedup.WEIGHTS,
+                        dedup.ACTIVE_TTL_SECONDS, dedup.MISSING_TTL_SECONDS)
+
+        scalar_ms = _time_ms(lambda: dedup._collect_candidates(batch, True), repeat)
+        vector_ms = _time_ms(lambda: dedup._collect_candidates_vectorized(batch, True), repeat)
+        kernel_scalar_ms = _time_ms(kernel_scalar, repeat)
+        kernel_vector_ms = _time_ms(kernel_vector, repeat)
+
+        print(f"{n_tracks:>8} {len(pair_list):>9} {scalar_ms:>12.2f} {vector_ms:>10.2f} "
+              f"{scalar_ms / max(vector_ms, 1e-9):>7.1f}x "
+              f"{kernel_scalar_ms:>10.2f} {kernel_vector_ms:>11.2f} "
+              f"{kernel_scalar_ms / max(kernel_vector_ms, 1e-9):>7.1f}x {max_diff:>11.2e}")
+
+
+def bench_sharding(cars_per_zone=(10, 30), steps: int = 30, dt: float = 10):
+    """One deduplicator vs one shard per region, every scan zone polled each step"""
+    print(f"{'cars':>6} {'mode':>8} {'sightings/s':>12} {'continuity':>11} {'tracks':>7} {'counted':>8} "
+          f"{'handoffs':>9}")
+
+    for n_cars in cars_per_zone:
+        for mode in ('single', 'sharded'):
+            traffics = [SyntheticTraffic(n_cars, 1000.0, seed=i, center=(zone['lat'], zone['lng']),
+                                         zone_id=zone_id_for_name(zone['name']))
+                        for i, zone in enumerate(SCAN_ZONES)]
+            now = [1000.0]
+            if mode == 'single':
+                dedup = DriverDeduplicator(clock=lambda: now[0])
+            else:
+                dedup = ShardedDeduplicator(clock=lambda: now[0])
+                dedup.get_driver_count()
+
+            last_fid = {}
+            transitions = kept = total = 0
+            elapsed = 0.0
+            for _ in range(steps):
+                batches = [t.step(dt) for t in traffics]
+                now[0] += dt
+                start = time.perf_counter()
+                if mode == 'single':
+                    results = [dedup.process_batch(b, is_dense=True) for b in batches]
+                else:
+                    tickets = [dedup.submit_batch(b, is_dense=True) for b in batches]
+                    results = [dedup.collect(t) for t in tickets]
+                elapsed += time.perf_counter() - start
+
+                for zone_idx, (traffic, zone_results) in enumerate(zip(traffics, results)):
+                    total += len(zone_results)
+                    for car, (fid, _, _) in zip(traffic.cars, zone_results):
+                        key = (zone_idx, car['id'])
+                        if key in last_fid:
+                            transitions += 1
+                            kept += last_fid[key] == fid
+                        last_fid[key] = fid
+
+            stats = dedup.get_stats()
+            counted = dedup.get_driver_count()
+            if mode == 'sharded':
+                dedup.close()
+            handoffs = stats['shards']['handoffs'] if mode == 'sharded' else 0
+            print(f"{n_cars * len(traffics):>6} {mode:>8} {total / max(elapsed, 1e-9):>12.0f} "
+                  f"{kept / max(transitions, 1):>10.1%} {stats['matching_stats']['new_tracks']:>7} {counted:>8} "
+                  f"{handoffs:>9}")
+
+
+def _pairs(n: int) -> int:
+    return n * (n - 1) // 2
+
+
+def run_simulation(n_vehicles: int, cycles: int, seed: int = 7, trace_memory: bool = False):
+    """Feed simulated daemon cycles through a fresh deduplicator and score it against ground truth"""
+    sim = TrafficSimulator(n_vehicles, seed=seed)
+    dedup = DriverDeduplicator(clock=lambda: sim.now, store=TrackStore())
+    latencies = []
+    joint = collections.Counter()
+    per_vehicle = collections.Counter()
+    per_fingerprint = collections.Counter()
+    count_errors = []
+
+    if trace_memory:
+        tracemalloc.start()
+    for _ in range(cycles):
+        visible = set()
+        for point, sightings, truth in sim.cycle():
+            if not sightings:
+                continue
+            start = time.perf_counter()
+            results = dedup.process_batch(sightings, point.is_dense)
+            latencies.append(time.perf_counter() - start)
+
+            for vehicle_id, (fid, _, _) in zip(truth, results):
+                joint[vehicle_id, fid] += 1
+                per_vehicle[vehicle_id] += 1
+                per_fingerprint[fid] += 1
+            visible.update(truth)
+        count_errors.append(dedup.get_driver_count() - len(visible))
+
+    peak_bytes = 0
+    if trace_memory:
+        peak_bytes = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    same_both = sum(_pairs(n) for n in joint.values())
+    same_fid = sum(_pairs(n) for n in per_fingerprint.values())
+    same_vehicle = sum(_pairs(n) for n in per_vehicle.values())
+    latencies.sort()
+    return {
+        'sightings': sum(per_vehicle.values()),
+        'elapsed': sum(latencies),
+        'p50_ms': latencies[len(latencies) // 2] * 1000 if latencies else 0,
+        'p99_ms': latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000 if latencies else 0,
+        'precision': same_both / same_fid if same_fid else 1.0,
+        'recall': same_both / same_vehicle if same_vehicle else 1.0,
+        'fids_per_vehicle': len(joint) / max(len(per_vehicle), 1),
+        'count_error': statistics.mean(count_errors[cycles // 4:]) if count_errors else 0,
+        'peak_bytes': peak_bytes,
+    }
+
+
+def bench_dedup(vehicle_counts=(200, 800), cycles: int = 40, seeds=(7, 8)):
+    """Throughput, latency, memory and pairwise identity precision/recall on simulated Perth traffic"""
+    print("precision/recall: pairs of sightings sharing a fingerprint vs pairs from the same vehicle")
+    print(f"{'vehicles':>8} {'sightings/s':>12} {'p50 ms':>7} {'p99 ms':>7} {'peak MB':>8} "
+          f"{'precision':>10} {'recall':>7} {'fids/veh':>9} {'count err':>10}")
+
+    for n_vehicles in vehicle_counts:
+        runs = [run_simulation(n_vehicles, cycles, seed) for seed in seeds]
+        memory = run_simulation(n_vehicles, cycles, seeds[0], trace_memory=True)
+        rate = sum(r['sightings'] for r in runs) / max(sum(r['elapsed'] for r in runs), 1e-9)
+        print(f"{n_vehicles:>8} {rate:>12.0f} "
+              f"{statistics.mean(r['p50_ms'] for r in runs):>7.2f} "
+              f"{statistics.mean(r['p99_ms'] for r in runs):>7.2f} "
+              f"{memory['peak_bytes'] / 1e6:>8.2f} "
+              f"{statistics.mean(r['precision'] for r in runs):>9.1%} "
+              f"{statistics.mean(r['recall'] for r in runs):>6.1%} "
+              f"{statistics.mean(r['fids_per_vehicle'] for r in runs):>9.2f} "
+              f"{statistics.mean(r['count_error'] for r in runs):>+10.1f}")
+
+
+def _legacy_haversine_m(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    """The per-module haversine this repo used before geo.py (radians per call, atan2 form)"""
+    lat1_rad = math.radians(lat1)
+    lat2_rad = math.radians(lat2)
+    delta_lat = math.radians(lat2 - lat1)
+    delta_lng = math.radians(lng2 - lng1)
+    a = math.sin(delta_lat / 2) ** 2 + math.cos(lat1_rad) * math.cos(lat2_rad) * math.sin(delta_lng / 2) ** 2
+    return 6371000 * 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+
+
+def _random_pairs(n: int, span_m: float, seed: int = 5):
+    rng = np.random.default_rng(seed)
+    lat1 = CBD_LAT + rng.uniform(-0.3, 0.3, n)
+    lng1 = CBD_LNG + rng.uniform(-0.3, 0.3, n)
+    r = rng.uniform(0, span_m, n)
+    theta = rng.uniform(0, 2 * np.pi, n)
+    lat2 = lat1 + r * np.cos(theta) / 111000
+    lng2 = lng1 + r * np.sin(theta) / (111000 * np.cos(np.radians(lat1)))
+    return lat1, lng1, lat2, lng2
+
+
+def bench_geo(n_scalar: int = 20000, batch_sizes=(100, 10000, 1000000), repeat: int = 5):
+    """Scalar and NumPy geo kernels, plus equirectangular error against haversine"""
+    pairs = [tuple(map(float, p)) for p in zip(*_random_pairs(n_scalar, 5000))]
+
+    print(f"{'scalar kernel':>22} {'ns/call':>8}")
+    for name, func in (('legacy haversine', _legacy_haversine_m), ('haversine_m', geo.haversine_m),
+                       ('equirectangular_m', geo.equirectangular_m), ('bearing_deg', geo.bearing_deg)):
+        ms = _time_ms(lambda: [func(*p) for p in pairs], repeat)
+        print(f"{name:>22} {ms * 1e6 / n_scalar:>8.0f}")
+    ms = _time_ms(lambda: [geo.cross_track_m(p[0], p[1], 45.0, p[2], p[3]) for p in pairs], repeat)
+    print(f"{'cross_track_m':>22} {ms * 1e6 / n_scalar:>8.0f}")
+
+    print(f"{'batch':>8} {'haversine ns/pt':>16} {'equirect ns/pt':>15} {'bearing ns/pt':>14} {'cross-track ns/pt':>18}")
+    for n in batch_sizes:
+        lat1, lng1, lat2, lng2 = _random_pairs(n, 5000)
+        per_point = [_time_ms(lambda: func(lat1, lng1, lat2, lng2), repeat) * 1e6 / n
+                     for func in (geo.haversine_m_np, geo.equirectangular_m_np, geo.bearing_deg_np)]
+        per_point.append(_time_ms(lambda: geo.cross_track_m_np(lat1, lng1, 45.0, lat2, lng2), repeat) * 1e6 / n)
+        print(f"{n:>8} {per_point[0]:>16.1f} {per_point[1]:>15.1f} {per_point[2]:>14.1f} {per_point[3]:>18.1f}")
+
+    print(f"{'span':>8} {'equirect max rel err':>21} {'max abs err m':>14}")
+    for span_m in (500, 2000, 5000, 20000, 50000):
+        lat1, lng1, lat2, lng2 = _random_pairs(200000, span_m)
+        exact = geo.haversine_m_np(lat1, lng1, lat2, lng2)
+        error = np.abs(geo.equirectangular_m_np(lat1, lng1, lat2, lng2) - exact)
+        mask = exact > 1
+        print(f"{span_m:>8} {np.max(error[mask] / exact[mask]):>21.1e} {np.max(error):>14.1e}")
+
+
+def _legacy_update_zone_metrics(analyzer: TrajectoryAnalyzer):
+    """The per-observation recompute update_driver used to run: every zone, occupancy by full scan"""
+    cutoff = clock.now() - 300
+    for zone_id, metrics in analyzer.zone_metrics.items():
+        metrics.update_flow_rates()
+        occupancy = sum(1 for traj in analyzer.trajectories.values()
+                        if traj.current_zone == zone_id and traj.last_updated >= cutoff)
+        metrics.current_driver_count = occupancy
+        metrics.calculate_heat_score(occupancy)
+
+
+def _seed_trajectories(analyzer: TrajectoryAnalyzer, n_trajectories: int, zone_ids: List[str], seed: int = 9):
+    rng = random.Random(seed)
+    now = clock.now()
+    for i in range(n_trajectories):
+        lat, lng = _random_point(rng, 15000)
+        for step in range(3):
+            analyzer.update_driver(f"t{i}", rng.choice(VEHICLE_TYPES), lat, lng, rng.uniform(0, 360),
+                                   rng.choice(zone_ids), now - 60 + step * 10, confidence=0.9)
+
+
+def bench_trajectory(fleet_sizes=(100, 1000, 10000), n_updates: int = 200, repeat: int = 3):
+    """TrajectoryAnalyzer.update_driver cost: eager all-zone recompute by scanning vs indexed, per-cycle metrics"""
+    zone_ids = [p.zone_id for p in ZONE_REGISTRY.profiles]
+    print(f"{len(zone_ids)} zones")
+    print(f"{'fleet':>8} {'eager us/obs':>13} {'current us/obs':>15} {'speedup':>8}")
+
+    for n_trajectories in fleet_sizes:
+        analyzer = TrajectoryAnalyzer(store=TrackStore())
+        _seed_trajectories(analyzer, n_trajectories, zone_ids)
+
+        rng = random.Random(4)
+        updates = [(f"t{rng.randrange(n_trajectories)}", rng.choice(zone_ids), *_random_point(rng, 15000))
+                   for _ in range(n_updates)]
+
+        def run(eager: bool):
+            def updates_loop():
+                for fid, zone_id, lat, lng in updates:
+                    analyzer.update_driver(fid, 'UberX', lat, lng, 90.0, zone_id, clock.now(), confidence=0.9)
+                    if eager:
+                        _legacy_update_zone_metrics(analyzer)
+            return updates_loop
+
+        eager_us = _time_ms(run(True), repeat) * 1000 / n_updates
+        current_us = _time_ms(run(False), repeat) * 1000 / n_updates
+        analyzer.refresh()
+        summary = analyzer.get_zone_metrics_summary()
+        _legacy_update_zone_metrics(analyzer)
+        assert summary == analyzer.get_zone_metrics_summary()
+        print(f"{n_trajectories:>8} {eager_us:>13.1f} {current_us:>15.1f} {eager_us / max(current_us, 1e-9):>7.1f}x")
+
+
+def _legacy_predict_destination(traj, min_confidence: float):
+    """The pre-batching per-trajectory scorer: a bearing and haversine per zone centre in Python"""
+    if len(traj.points) < 3:
+        return None, 0
+    is_freeway = traj.current_zone_idx is not None and ZONE_REGISTRY.is_freeway[traj.current_zone_idx]
+    if traj.avg_speed_ms < (5 if is_freeway else 2) or not traj.has_stable_heading(window=3, tolerance_deg=30):
+        return None, 0
+
+    last_point = traj.points[-1]
+    best_dest, best_confidence = None, 0
+    for dest in ZONE_REGISTRY.destinations:
+        if dest.idx == traj.current_zone_idx:
+            continue
+        bearing_diff = abs(traj.heading_deg - bearing_deg(last_point.lat, last_point.lng, *dest.center))
+        bearing_diff = min(bearing_diff, 360 - bearing_diff)
+        if bearing_diff > 60:
+            continue
+        distance_km = haversine_m(last_point.lat, last_point.lng, *dest.center) / 1000
+        confidence = (1 - bearing_diff / 60) * 0.6 + max(0, 1 - distance_km / 15) * 0.4
+        if confidence > best_confidence:
+            best_dest, best_confidence = dest.zone_id, confidence
+    if best_confidence >= min_confidence:
+        return best_dest, best_confidence
+    return None, 0
+
+
+def bench_prediction(fleet_sizes=(100, 1000, 10000), repeat: int = 5):
+    """Destination prediction for every trajectory: per-trajectory scalar scoring vs one batched pass"""
+    print(f"{len(ZONE_REGISTRY.destinations)} destinations")
+    print(f"{'fleet':>8} {'predicted':>10} {'scalar ms':>10} {'batched ms':>11} {'speedup':>8} {'agree':>7}")
+
+    for n_trajectories in fleet_sizes:
+        analyzer = TrajectoryAnalyzer(store=TrackStore())
+        rng = random.Random(21)
+        now = clock.now()
+        for i in range(n_trajectories):
+            lat, lng = _random_point(rng, 15000)
+            heading, speed = rng.uniform(0, 360), rng.uniform(0, 20)
+            for step in range(4):
+                analyzer.update_driver(f"t{i}", 'UberX', lat, lng, heading, 'perth_cbd',
+                                       now - 40 + step * 10, confidence=0.9)
+                lat, lng = _offset(lat, lng, speed * 10 * math.cos(math.radians(heading)),
+                                   speed * 10 * math.sin(math.radians(heading)))
+        trajs = list(analyzer.trajectories.values())
+
+        legacy = [_legacy_predict_destination(t, analyzer.MIN_DEST_CONFIDENCE) for t in trajs]
+        batched = analyzer._predict_destinations(trajs)
+        agree = sum(a[0] == b[0] and abs(a[1] - b[1]) < 1e-9 for a, b in zip(legacy, batched))
+
+        scalar_ms = _time_ms(lambda: [_legacy_predict_destination(t, analyzer.MIN_DEST_CONFIDENCE)
+                                      for t in trajs], repeat)
+        batched_ms = _time_ms(lambda: analyzer._predict_destinations(trajs), repeat)
+        print(f"{n_trajectories:>8} {sum(1 for d, _ in batched if d):>10} {scalar_ms:>10.2f} {batched_ms:>11.2f} "
+              f"{scalar_ms / max(batched_ms, 1e-9):>7.1f}x {agree / len(trajs):>6.1%}")
+
+
+def bench_flows(flows_per_minute=(10, 100, 1000), minutes: int = 30, repeat: int = 5):
+    """Windowed flow queries: scanning an event list vs the bucketed FlowEventLog"""
+    zone_ids = [p.zone_id for p in ZONE_REGISTRY.profiles]
+    print(f"{minutes} min window; 'kept' = share of the window's flows the old 500-event list still held")
+    print(f"{'flows/min':>10} {'capped ms':>10} {'full scan ms':>13} {'log ms':>7} {'vs full':>8} {'kept':>6}")
+
+    for rate in flows_per_minute:
+        rng = random.Random(6)
+        now = clock.now()
+        log = FlowEventLog()
+        events = []
+        n_events = rate * minutes
+        for i in range(n_events):
+            event = {'source_zone': rng.choice(zone_ids), 'target_zone': rng.choice(zone_ids),
+                     'timestamp': now - minutes * 60 + i * 60 / rate}
+            log.append(event)
+            events.append(event)
+        cutoff = now - minutes * 60
+
+        def scan(history):
+            def queries():
+                pairs = collections.Counter()
+                for event in history:
+                    if event['timestamp'] >= cutoff:
+                        pairs[event['source_zone'], event['target_zone']] += 1
+                sum(1 for event in history if event['timestamp'] >= cutoff and event['target_zone'] == 'perth_cbd')
+                sum(1 for event in history if event['timestamp'] >= cutoff)
+            return queries
+
+        def aggregated():
+            log.pair_counts(cutoff)
+            log.target_count('perth_cbd', cutoff)
+            log.count(cutoff)
+
+        capped_ms = _time_ms(scan(events[-500:]), repeat)
+        full_ms = _time_ms(scan(events), repeat)
+        log_ms = _time_ms(aggregated, repeat)
+        print(f"{rate:>10} {capped_ms:>10.3f} {full_ms:>13.3f} {log_ms:>7.3f} "
+              f"{full_ms / max(log_ms, 1e-9):>7.1f}x {min(500, n_events) / n_events:>6.0%}")
+
+
+BENCHMARKS = {
+    'archive': bench_archive,
+    'counts': bench_counts,
+    'dedup': bench_dedup,
+    'assignment': bench_assignment,
+    'fallback': bench_fallback,
+    'flows': bench_flows,
+    'geo': bench_geo,
+    'grid': bench_grid,
+    'lifecycle': bench_lifecycle,
+    'memory': bench_memory,
+    'prediction': bench_prediction,
+    'scoring': bench_scoring,
+    'sharding': bench_sharding,
+    'trajectory': bench_trajectory,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Intelligence engine benchmarks')
+    parser.add_argument('name', choices=sorted(BENCHMARKS) + ['all'])
+    args = parser.parse_args()
+
+    names = sorted(BENCHMARKS) if args.name == 'all' else [args.name]
+    for name in names:
+        print(f"== {name} ==")
+        BENCHMARKS[name]()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,197 @@
+"""
+Tracking Checkpoints
+Compact snapshots of deduplicator and trajectory state so a restart resumes
+existing fingerprints instead of minting new ones. Track points are written as
+flat columns, timestamps as epoch seconds (the monotonic clock does not survive
+a restart), and files are replaced atomically so a crash never leaves half a file.
+
+The file is a JSON header followed by the raw column bytes; nothing in it is
+executable, and it is only read back from a directory and file that belong to
+this user and are not writable by anyone else.
+"""
+
+import json
+import os
+import struct
+import tempfile
+import zlib
+from array import array
+from typing import Dict, List, Optional, Tuple
+
+from . import clock
+from .trackstore import TrackHandle, TrackStore
+from .zones import ZONE_REGISTRY
+
+MAGIC = b'RZCK'
+VERSION = 3
+COLUMN_TYPES = 'ddddHB'
+
+DEFAULT_DIR = os.path.join(os.path.expanduser('~'), '.riztar')
+DEFAULT_PATH = os.path.join(DEFAULT_DIR, 'intelligence.ckpt')
+
+
+def _pack_tracks(store: TrackStore, handles: List[TrackHandle], epoch_offset: float) -> Tuple[Dict, List[bytes]]:
+    keys, lengths = [], []
+    lat, lng, ts, bearing = array('d'), array('d'), array('d'), array('d')
+    zone, flags = array('H'), array('B')
+
+    for handle in handles:
+        indices = store.points(handle)
+        if not indices:
+            continue
+        keys.append(handle.key)
+        lengths.append(len(indices))
+        for idx in indices:
+            lat.append(store.lat[idx])
+            lng.append(store.lng[idx])
+            ts.append(store.ts[idx] + epoch_offset)
+            bearing.append(store.bearing[idx])
+            zone.append(store.zone[idx])
+            flags.append(store.flags[idx])
+
+    header = {
+        'zones': [p.zone_id for p in ZONE_REGISTRY.profiles],
+        'keys': keys,
+        'lengths': lengths,
+    }
+    return header, [column.tobytes() for column in (lat, lng, ts, bearing, zone, flags)]
+
+
+def _unpack_tracks(store: TrackStore, packed: Dict, blobs: List[bytes], epoch_offset: float) -> List[TrackHandle]:
+    """Write checkpointed points into the store; returns handles the caller must release"""
+    zone_map = [ZONE_REGISTRY.id_of(zone_id) for zone_id in packed['zones']]
+    lengths = packed['lengths']
+    columns = []
+    for typecode, raw in zip(COLUMN_TYPES, blobs):
+        column = array(typecode)
+        column.frombytes(raw)
+        columns.append(column)
+    lat, lng, ts, bearing, zone, flags = columns
+    if sum(lengths) != len(lat) or any(len(column) != len(lat) for column in columns):
+        raise ValueError("track columns do not match their lengths")
+
+    handles = []
+    pos = 0
+    for key, length in zip(packed['keys'], lengths):
+        handle = store.acquire(key)
+        for idx in range(pos, pos + length):
+            store.append(handle, lat[idx], lng[idx], ts[idx] - epoch_offset,
+                         None if bearing[idx] != bearing[idx] else bearing[idx],
+                         zone_map[zone[idx]], flags[idx])
+        handles.append(handle)
+        pos += length
+    return handles
+
+
+def save_checkpoint(path: str, deduplicator, trajectory_analyzer=None) -> int:
+    """Write a checkpoint atomically; returns its size in bytes"""
+    epoch_offset = clock.to_epoch(0.0)
+    store = deduplicator.store
+
+    handles = {}
+    for driver in deduplicator.tracked_drivers.values():
+        handles[driver.fingerprint_id] = driver.track
+    for fid, entry in deduplicator.dead_archive.items():
+        handles[fid] = entry.value.track
+    if trajectory_analyzer is not None:
+        for fid, traj in trajectory_analyzer.trajectories.items():
+            handles[fid] = traj.track
+
+    tracks, blobs = _pack_tracks(store, [h for h in handles.values() if h is not None], epoch_offset)
+    state = {
+        'saved_at': clock.to_epoch(clock.now()),
+        'tracks': tracks,
+        'blob_sizes': [len(blob) for blob in blobs],
+        'dedup': deduplicator.export_state(epoch_offset),
+        'trajectory': trajectory_analyzer.export_state(epoch_offset) if trajectory_analyzer is not None else None,
+    }
+    header = json.dumps(state, separators=(',', ':')).encode()
+    body = struct.pack('<I', len(header)) + header + b''.join(blobs)
+    payload = MAGIC + bytes([VERSION]) + zlib.compress(body)
+
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.ckpt-')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+    return len(payload)
+
+
+def _is_private(path: str) -> bool:
+    """The file and its directory belong to this user and nobody else can write to them"""
+    if not hasattr(os, 'getuid'):
+        return True
+    for target in (os.path.dirname(os.path.abspath(path)), path):
+        info = os.stat(target)
+        if info.st_uid != os.getuid() or info.st_mode & 0o022:
+            return False
+    return True
+
+
+def _decode(payload: bytes) -> Tuple[Dict, List[bytes]]:
+    body = zlib.decompress(payload[5:])
+    (header_len,) = struct.unpack_from('<I', body)
+    state = json.loads(body[4:4 + header_len])
+    blobs, pos = [], 4 + header_len
+    for size in state['blob_sizes']:
+        blobs.append(body[pos:pos + size])
+        pos += size
+    if len(blobs) != len(COLUMN_TYPES) or pos != len(body):
+        raise ValueError("truncated track columns")
+    return state, blobs
+
+
+def load_checkpoint(path: str, deduplicator, trajectory_analyzer=None,
+                    max_age_seconds: Optional[float] = None) -> bool:
+    """Restore state from path; False if there is no usable checkpoint"""
+    try:
+        if not _is_private(path):
+            print(f"[Checkpoint] Ignoring {path}: not private to this user", flush=True)
+            return False
+        with open(path, 'rb') as f:
+            payload = f.read()
+    except FileNotFoundError:
+        return False
+
+    if payload[:4] != MAGIC or payload[4:5] != bytes([VERSION]):
+        print(f"[Checkpoint] Ignoring {path}: unknown format", flush=True)
+        return False
+    try:
+        state, blobs = _decode(payload)
+    except Exception as e:
+        print(f"[Checkpoint] Ignoring {path}: {e}", flush=True)
+        return False
+
+    age = clock.to_epoch(clock.now()) - state['saved_at']
+    if max_age_seconds is not None and age > max_age_seconds:
+        print(f"[Checkpoint] Ignoring {path}: {age:.0f}s old", flush=True)
+        return False
+
+    deduplicator.reset()
+    if trajectory_analyzer is not None:
+        trajectory_analyzer.reset()
+
+    epoch_offset = clock.to_epoch(0.0)
+    store = deduplicator.store
+    handles = _unpack_tracks(store, state['tracks'], blobs, epoch_offset)
+    try:
+        deduplicator.restore_state(state['dedup'], epoch_offset)
+        if trajectory_analyzer is not None and state['trajectory'] is not None:
+            trajectory_analyzer.restore_state(state['trajectory'], epoch_offset)
+    finally:
+        for handle in handles:
+            store.release(handle)
+
+    print(f"[Checkpoint] Restored {len(deduplicator.tracked_drivers)} tracks from {path} ({age:.0f}s old)",
+          flush=True)
+    return True
@@ -0,0 +1,28 @@
+"""
+Pipeline Clock
+Intelligence timestamps are float seconds on the monotonic clock, so TTLs,
+windows and match scoring are plain float subtraction that wall-clock jumps
+cannot disturb. Wall-clock datetimes are produced only where a value leaves
+the pipeline (database rows, API payloads).
+"""
+
+import time
+from datetime import datetime
+
+now = time.monotonic
+
+
+def to_epoch(t: float) -> float:
+    """Wall-clock epoch seconds for a pipeline timestamp"""
+    return t + (time.time() - time.monotonic())
+
+
+def from_epoch(epoch: float) -> float:
+    """Pipeline timestamp for wall-clock epoch seconds (e.g. restored from disk)"""
+    return epoch - (time.time() - time.monotonic())
+
+
+def to_datetime(t: float) -> datetime:
+    """Naive local datetime for a pipeline timestamp, matching datetime.now()"""
+    return datetime.fromtimestamp(to_epoch(t))
+
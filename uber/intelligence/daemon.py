@@ -3,19 +3,29 @@
 Continuous background scanning with:
 - Reduced polling (2 polls per coordinate)
 - Interleaved zone scanning
+- Optional adaptive schedule that backs off stable zones
 - Batch processing
+- Staged pipeline: fetch -> dedup/trajectory -> notification, joined by bounded queues
 - High-confidence trajectory tracking
 """
 
+import os
 import time
 import uuid
 import threading
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Callable
-from collections import defaultdict
+from collections import defaultdict, deque
 
+from . import clock
+from .checkpoint import DEFAULT_PATH as DEFAULT_CHECKPOINT_PATH, load_checkpoint, save_checkpoint
 from .grid import PERTH_GRID, GridPoint
+from .persistence import FlowEventWriter, ObservationWriter
+from .metrics import AGE_BUCKETS, CYCLE_BUCKETS, MetricsRegistry
+from .pipeline import RateMeter, Stage
+from .schedule import AdaptiveScheduler
 from .dedup import DriverDeduplicator, DriverSighting
+from .sharding import ShardedDeduplicator
 from .trajectory import get_trajectory_analyzer
 
 
@@ -32,17 +42,33 @@ class IntelligenceDaemon:
     
     MIN_TRAJECTORY_CONFIDENCE = 0.7
     
-    def __init__(self, fetch_drivers_func: Callable, flask_app=None):
+    SHARDED_DEDUP = False
+    ADAPTIVE_SCHEDULE = False
+    
+    PROCESS_QUEUE_SIZE = 256
+    NOTIFY_QUEUE_SIZE = 1000
+    
+    CHECKPOINT_PATH = os.environ.get('INTEL_CHECKPOINT_PATH', DEFAULT_CHECKPOINT_PATH)
+    CHECKPOINT_INTERVAL_SEC = 60
+    
+    def __init__(self, fetch_drivers_func: Callable, flask_app=None, sharded: Optional[bool] = None,
+                 adaptive: Optional[bool] = None):
         self.fetch_drivers = fetch_drivers_func
         self.flask_app = flask_app
-        self.deduplicator = DriverDeduplicator()
+        self.sharded = self.SHARDED_DEDUP if sharded is None else sharded
+        self.deduplicator = ShardedDeduplicator() if self.sharded else DriverDeduplicator()
         self.trajectory_analyzer = get_trajectory_analyzer()
+        adaptive = self.ADAPTIVE_SCHEDULE if adaptive is None else adaptive
+        self.scheduler = AdaptiveScheduler(self.POLLS_PER_COORDINATE, self.CYCLE_PAUSE_SEC) if adaptive else None
+        self.flow_writer = FlowEventWriter(flask_app) if flask_app else None
+        self.observation_writer = ObservationWriter(flask_app) if flask_app else None
         self.is_running = False
         self._thread: Optional[threading.Thread] = None
         self._watchdog_thread: Optional[threading.Thread] = None
         self._report_thread: Optional[threading.Thread] = None
         self._stop_event = threading.Event()
-        self._last_heartbeat = datetime.now()
+        self._last_heartbeat = clock.now()
+        self._last_checkpoint = clock.now()
         
         self.current_batch_id: Optional[str] = None
         self.current_zone: Optional[str] = None
@@ -68,17 +94,58 @@ class IntelligenceDaemon:
             'on_flow_event': [],
             'on_activity_report': []
         }
+        
+        self._pending = deque()
+        self._fetch_meter = RateMeter()
+        self.last_cycle_sec: Optional[float] = None
+        self._last_observation_at: Optional[float] = None
+        self.metrics = MetricsRegistry()
+        self._fetch_hist = self.metrics.histogram(
+            'riztar_intel_fetch_seconds', 'Upstream driver fetch per poll, including retries')
+        self._dedup_hists = {phase: self.metrics.histogram(
+            'riztar_intel_dedup_seconds', 'Deduplicator time per grid point', phase=phase)
+            for phase in (('submit', 'collect') if self.sharded else ('process_batch',))}
+        self._update_driver_hist = self.metrics.histogram(
+            'riztar_intel_update_driver_seconds', 'Trajectory update per high-confidence sighting')
+        self._process_lag_hist = self.metrics.histogram(
+            'riztar_intel_process_lag_seconds', 'Fetch to dedup/trajectory completion per grid point')
+        self._callback_hists = {event: self.metrics.histogram(
+            'riztar_intel_callback_seconds', 'Registered callbacks per emitted event', event=event)
+            for event in self._callbacks}
+        self._cycle_hist = self.metrics.histogram(
+            'riztar_intel_cycle_seconds', 'Scan cycle duration, fetch side', CYCLE_BUCKETS)
+        self._report_hist = self.metrics.histogram(
+            'riztar_intel_report_seconds', 'Activity report generation', CYCLE_BUCKETS)
+        self._freshness_hist = self.metrics.histogram(
+            'riztar_intel_dashboard_observation_age_seconds',
+            'Age of the newest processed observation when the dashboard reads', AGE_BUCKETS)
+        
+        self._process_stage = Stage('process', self._process_item, self.PROCESS_QUEUE_SIZE,
+                                    on_error=self._on_stage_error)
+        self._notify_stage = Stage('notify', self._dispatch, self.NOTIFY_QUEUE_SIZE, block=False)
     
     def register_callback(self, event: str, callback: Callable):
         if event in self._callbacks:
             self._callbacks[event].append(callback)
     
     def _emit(self, event: str, data: dict):
-        for callback in self._callbacks.get(event, []):
+        if self._notify_stage.is_running:
+            self._notify_stage.put((event, data))
+        else:
+            self._dispatch((event, data))
+    
+    def _dispatch(self, item):
+        event, data = item
+        callbacks = self._callbacks.get(event, [])
+        if not callbacks:
+            return
+        start = time.perf_counter()
+        for callback in callbacks:
             try:
                 callback(data)
             except Exception as e:
                 print(f"Callback error for {event}: {e}")
+        self._callback_hists[event].observe(time.perf_counter() - start)
     
     def start(self):
         if self.is_running:
@@ -89,8 +156,16 @@ class IntelligenceDaemon:
         self.started_at = datetime.now()
         self.current_batch_id = str(uuid.uuid4())[:8]
         
+        self._restore_checkpoint()
         self.deduplicator.start_window()
         
+        if self.flow_writer:
+            self.flow_writer.start()
+        if self.observation_writer:
+            self.observation_writer.start()
+        self._notify_stage.start()
+        self._process_stage.start()
+        
         self._thread = threading.Thread(target=self._run_with_recovery, daemon=False)
         self._thread.start()
         
@@ -114,8 +189,40 @@ class IntelligenceDaemon:
         if self._thread:
             self._thread.join(timeout=10)
         
+        self._process_stage.stop()
+        self._notify_stage.stop()
+        self._save_checkpoint()
+        
+        if self.flow_writer:
+            self.flow_writer.stop()
+        if self.observation_writer:
+            self.observation_writer.stop()
+        
+        if self.sharded:
+            self.deduplicator.close()
+        
         return True
     
+    def _save_checkpoint(self):
+        if self.sharded or not self.CHECKPOINT_PATH:
+            return
+        self._last_checkpoint = clock.now()
+        try:
+            save_checkpoint(self.CHECKPOINT_PATH, self.deduplicator, self.trajectory_analyzer)
+        except Exception as e:
+            print(f"[Checkpoint] Save failed: {e}", flush=True)
+    
+    def _restore_checkpoint(self):
+        if self.sharded or not self.CHECKPOINT_PATH:
+            return
+        max_age = self.deduplicator.DEAD_ARCHIVE_MINUTES * 60
+        try:
+            load_checkpoint(self.CHECKPOINT_PATH, self.deduplicator, self.trajectory_analyzer, max_age)
+        except Exception as e:
+            print(f"[Checkpoint] Restore failed: {e}", flush=True)
+            self.deduplicator.reset()
+            self.trajectory_analyzer.reset()
+    
     def _run_with_recovery(self):
         restart_delay = 5
         max_restart_delay = 300
@@ -149,7 +256,7 @@ class IntelligenceDaemon:
             if not self.is_running:
                 continue
             
-            heartbeat_age = (datetime.now() - self._last_heartbeat).total_seconds()
+            heartbeat_age = clock.now() - self._last_heartbeat
             
             if heartbeat_age > self.WATCHDOG_INTERVAL * 3:
                 self.last_error = f"Watchdog: No heartbeat for {heartbeat_age:.0f}s, daemon may be stuck"
@@ -180,16 +287,20 @@ class IntelligenceDaemon:
         
         while not self._stop_event.is_set():
             try:
-                interleaved_points = self._interleave_grid_points(grid_points)
-                self._run_cycle(interleaved_points)
-                self.cycle_count += 1
-                self._record_cycle_sample()
+                points = self.scheduler.plan(grid_points, clock.now()) if self.scheduler else grid_points
+                if not points:
+                    self._stop_event.wait(self.CYCLE_PAUSE_SEC)
+                    continue
                 
-                self._emit('on_cycle_complete', {
-                    'cycle': self.cycle_count,
-                    'unique_drivers': self.deduplicator.get_driver_count(),
-                    'counts': self.deduplicator.get_counts_by_type()
-                })
+                interleaved_points = self._interleave_grid_points(points)
+                cycle_start = time.monotonic()
+                batch_id = self._run_cycle(interleaved_points)
+                cycle_sec = time.monotonic() - cycle_start
+                self.last_cycle_sec = round(cycle_sec, 1)
+                self._cycle_hist.observe(cycle_sec)
+                if self.scheduler:
+                    self.scheduler.record_cycle(self.last_cycle_sec, clock.now())
+                self._process_stage.put(('cycle_end', batch_id))
                 
                 self._stop_event.wait(self.CYCLE_PAUSE_SEC)
                 
@@ -229,7 +340,8 @@ class IntelligenceDaemon:
             self.current_zone = point.zone_id
             
             point_sightings = []
-            observations = []
+            wall_times: Dict[float, datetime] = {}
+            fetch_failed = False
             
             for poll in range(self.POLLS_PER_COORDINATE):
                 if self._stop_event.is_set():
@@ -238,8 +350,12 @@ class IntelligenceDaemon:
                 self.current_poll_count = poll + 1
                 
                 try:
-                    self._last_heartbeat = datetime.now()
+                    self._last_heartbeat = clock.now()
+                    fetch_start = time.perf_counter()
                     drivers = self._fetch_with_retry(point.lat, point.lng)
+                    self._fetch_hist.observe(time.perf_counter() - fetch_start)
+                    observed_at = clock.now()
+                    wall_times[observed_at] = clock.to_datetime(observed_at)
                     
                     for driver in drivers:
                         sighting = DriverSighting(
@@ -247,7 +363,7 @@ class IntelligenceDaemon:
                             lng=driver.get('lng', point.lng),
                             bearing=driver.get('bearing'),
                             vehicle_type=driver.get('product_type', 'UberX'),
-                            timestamp=datetime.now(),
+                            timestamp=observed_at,
                             zone_id=point.zone_id
                         )
                         point_sightings.append(sighting)
@@ -255,53 +371,131 @@ class IntelligenceDaemon:
                 except Exception as e:
                     self.last_error = str(e)
                     self._emit('on_error', {'error': str(e), 'coordinate': idx})
+                    fetch_failed = True
                 
                 if poll < self.POLLS_PER_COORDINATE - 1:
                     self._stop_event.wait(self.POLL_INTERVAL_SEC)
             
+            self.coordinates_scanned += 1
+            self._fetch_meter.mark()
+            if self.scheduler and not fetch_failed and not self._stop_event.is_set():
+                self.scheduler.observe(point, len(point_sightings), clock.now())
+            
             if point_sightings:
+                self._process_stage.put(('point', batch_id, point, point_sightings, wall_times))
+        
+        return batch_id
+    
+    def _process_item(self, item: tuple):
+        """Process stage: the only thread that feeds the deduplicator and trajectory analyzer"""
+        if item[0] == 'point':
+            _, batch_id, point, point_sightings, wall_times = item
+            if self.sharded:
+                start = time.perf_counter()
+                ticket = self.deduplicator.submit_batch(point_sightings, point.is_dense)
+                self._dedup_hists['submit'].observe(time.perf_counter() - start)
+                self._pending.append((batch_id, point, point_sightings, wall_times, ticket))
+                while self._pending and self.deduplicator.ready(self._pending[0][4]):
+                    self._handle_point_results(*self._pending.popleft())
+            else:
+                start = time.perf_counter()
                 results = self.deduplicator.process_batch(point_sightings, point.is_dense)
-                
-                for sighting, (fingerprint_id, confidence, is_new) in zip(point_sightings, results):
-                    observations.append({
-                        'fingerprint_id': fingerprint_id,
-                        'lat': sighting.lat,
-                        'lng': sighting.lng,
-                        'bearing': sighting.bearing,
-                        'vehicle_type': sighting.vehicle_type,
-                        'zone_id': point.zone_id,
-                        'confidence': confidence,
-                        'is_new': is_new,
-                        'batch_id': batch_id,
-                        'timestamp': sighting.timestamp
-                    })
-                    
-                    if confidence >= self.MIN_TRAJECTORY_CONFIDENCE:
-                        flow_event = self.trajectory_analyzer.update_driver(
-                            fingerprint_id=fingerprint_id,
-                            vehicle_type=sighting.vehicle_type,
-                            lat=sighting.lat,
-                            lng=sighting.lng,
-                            bearing=sighting.bearing,
-                            zone_id=point.zone_id,
-                            timestamp=sighting.timestamp,
-                            confidence=confidence
-                        )
-                        
-                        if flow_event:
-                            self._emit('on_flow_event', flow_event)
-                    
-                    self.total_observations += 1
+                self._dedup_hists['process_batch'].observe(time.perf_counter() - start)
+                self._handle_point_results(batch_id, point, point_sightings, wall_times, results)
+        elif item[0] == 'cycle_end':
+            while self._pending:
+                self._handle_point_results(*self._pending.popleft())
+            self._finish_cycle(item[1])
+        elif item[0] == 'window_reset':
+            while self._pending:
+                self._handle_point_results(*self._pending.popleft())
+            try:
+                self._reset_window_state()
+            finally:
+                item[1].set()
+    
+    def _finish_cycle(self, batch_id: str):
+        self.cycle_count += 1
+        self.trajectory_analyzer.refresh()
+        self._record_cycle_sample()
+        
+        unique_drivers = self.deduplicator.get_driver_count()
+        if self.observation_writer:
+            self.observation_writer.complete_batch(batch_id, unique_drivers)
+        
+        self._emit('on_cycle_complete', {
+            'cycle': self.cycle_count,
+            'batch_id': batch_id,
+            'unique_drivers': unique_drivers,
+            'counts': self.deduplicator.get_counts_by_type()
+        })
+        
+        if clock.now() - self._last_checkpoint >= self.CHECKPOINT_INTERVAL_SEC:
+            self._save_checkpoint()
+    
+    def _on_stage_error(self, error: Exception):
+        self.last_error = str(error)
+        self._emit('on_error', {'error': str(error)})
+    
+    def _handle_point_results(self, batch_id: str, point: GridPoint, point_sightings: List[DriverSighting],
+                              wall_times: Dict[float, datetime], results):
+        if self.sharded:
+            start = time.perf_counter()
+            results = self.deduplicator.collect(results)
+            self._dedup_hists['collect'].observe(time.perf_counter() - start)
+        
+        observations = []
+        for sighting, (fingerprint_id, confidence, is_new) in zip(point_sightings, results):
+            observations.append({
+                'fingerprint_id': fingerprint_id,
+                'lat': sighting.lat,
+                'lng': sighting.lng,
+                'bearing': sighting.bearing,
+                'vehicle_type': sighting.vehicle_type,
+                'zone_id': point.zone_id,
+                'confidence': confidence,
+                'is_new': is_new,
+                'batch_id': batch_id,
+                'timestamp': wall_times[sighting.timestamp]
+            })
+            if self.observation_writer:
+                self.observation_writer.submit(observations[-1])
             
-            self.coordinates_scanned += 1
+            if confidence >= self.MIN_TRAJECTORY_CONFIDENCE:
+                start = time.perf_counter()
+                flow_event = self.trajectory_analyzer.update_driver(
+                    fingerprint_id=fingerprint_id,
+                    vehicle_type=sighting.vehicle_type,
+                    lat=sighting.lat,
+                    lng=sighting.lng,
+                    bearing=sighting.bearing,
+                    zone_id=point.zone_id,
+                    timestamp=sighting.timestamp,
+                    confidence=confidence
+                )
+                self._update_driver_hist.observe(time.perf_counter() - start)
+                
+                if flow_event:
+                    flow_event = {**flow_event, 'timestamp': wall_times[sighting.timestamp]}
+                    if self.flow_writer:
+                        self.flow_writer.submit(flow_event)
+                    self._emit('on_flow_event', flow_event)
             
-            if observations:
-                self._emit('on_observation', {
-                    'zone_id': point.zone_id,
-                    'coordinate': {'lat': point.lat, 'lng': point.lng},
-                    'observations': observations,
-                    'unique_at_point': len(set(o['fingerprint_id'] for o in observations))
-                })
+            self.total_observations += 1
+        
+        newest = max(s.timestamp for s in point_sightings)
+        if self._last_observation_at is None or newest > self._last_observation_at:
+            self._last_observation_at = newest
+        self._process_lag_hist.observe(clock.now() - newest)
+        
+        if observations:
+            self._emit('on_observation', {
+                'zone_id': point.zone_id,
+                'batch_id': batch_id,
+                'coordinate': {'lat': point.lat, 'lng': point.lng},
+                'observations': observations,
+                'unique_at_point': len(set(o['fingerprint_id'] for o in observations))
+            })
     
     def get_status(self) -> Dict:
         uptime = None
@@ -337,11 +531,87 @@ class IntelligenceDaemon:
             'top_zones_by_type': top_zones_by_type,
             'dedup_stats': self.deduplicator.get_stats(),
             'trajectory_stats': self.trajectory_analyzer.get_stats(),
+            'flow_writer_stats': self.flow_writer.get_stats() if self.flow_writer else None,
+            'observation_writer_stats': self.observation_writer.get_stats() if self.observation_writer else None,
+            'pipeline': {
+                'fetch': {
+                    'coordinates_per_sec': round(self._fetch_meter.rate(), 2),
+                    'last_cycle_sec': self.last_cycle_sec,
+                },
+                'process': self._process_stage.get_stats(),
+                'notify': self._notify_stage.get_stats(),
+            },
+            'schedule': self.scheduler.get_stats(clock.now()) if self.scheduler else {'mode': 'fixed'},
+            'timings': self._timing_summary(),
             'last_error': self.last_error,
             'consecutive_errors': self.consecutive_errors,
             'grid_stats': PERTH_GRID.get_stats()
         }
     
+    def _timing_summary(self) -> Dict:
+        """p50/p95 bucket bounds per stage, in ms; the full histograms are on the metrics endpoint"""
+        stages = {
+            'fetch': self._fetch_hist,
+            'update_driver': self._update_driver_hist,
+            'cycle': self._cycle_hist,
+            'report': self._report_hist,
+            'process_lag': self._process_lag_hist,
+            'dashboard_observation_age': self._freshness_hist,
+        }
+        stages.update({f'dedup_{phase}': hist for phase, hist in self._dedup_hists.items()})
+        summary = {}
+        for name, hist in stages.items():
+            if not hist.count:
+                continue
+            p50, p95 = hist.quantile(0.5), hist.quantile(0.95)
+            summary[name] = {
+                'count': hist.count,
+                'avg_ms': round(hist.sum / hist.count * 1000, 2),
+                'p50_ms': p50 * 1000 if p50 is not None else None,
+                'p95_ms': p95 * 1000 if p95 is not None else None,
+            }
+        return summary
+    
+    def record_dashboard_read(self):
+        """Called by dashboard endpoints to sample how far behind real time the served data is"""
+        if self._last_observation_at is not None:
+            self._freshness_hist.observe(clock.now() - self._last_observation_at)
+    
+    def get_metrics_text(self, extra_gauges: Optional[list] = None, extra_counters: Optional[list] = None) -> str:
+        gauges = [
+            ('riztar_intel_running', 'Whether the scan loop is running', [({}, int(self.is_running))]),
+            ('riztar_intel_unique_drivers', 'Drivers tracked in the current window',
+             [({}, self.deduplicator.get_driver_count())]),
+            ('riztar_intel_stage_queue_depth', 'Items waiting per pipeline stage', [
+                ({'stage': 'process'}, self._process_stage.get_stats()['queued']),
+                ({'stage': 'notify'}, self._notify_stage.get_stats()['queued']),
+            ]),
+        ]
+        counters = [
+            ('riztar_intel_cycles', 'Completed scan cycles since start', [({}, self.cycle_count)]),
+            ('riztar_intel_observations', 'Observations processed since start', [({}, self.total_observations)]),
+            ('riztar_intel_stage_dropped', 'Items shed per pipeline stage', [
+                ({'stage': 'process'}, self._process_stage.get_stats()['dropped']),
+                ({'stage': 'notify'}, self._notify_stage.get_stats()['dropped']),
+            ]),
+        ]
+        if self._last_observation_at is not None:
+            gauges.append(('riztar_intel_last_observation_age_seconds', 'Seconds since the newest processed observation',
+                           [({}, round(clock.now() - self._last_observation_at, 3))]))
+        
+        writers = [(name, writer) for name, writer in (('observations', self.observation_writer),
+                                                       ('flows', self.flow_writer)) if writer]
+        if writers:
+            writer_stats = [(name, writer.get_stats()) for name, writer in writers]
+            gauges.append(('riztar_intel_writer_queue_depth', 'Rows waiting per persistence writer',
+                           [({'writer': name}, stats['queued']) for name, stats in writer_stats]))
+            counters.append(('riztar_intel_writer_dropped', 'Rows shed per persistence writer',
+                             [({'writer': name}, stats['dropped']) for name, stats in writer_stats]))
+            gauges.append(('riztar_intel_writer_last_flush_ms', 'Duration of the last flush per writer',
+                           [({'writer': name}, stats['last_flush_ms']) for name, stats in writer_stats]))
+        
+        return self.metrics.render(gauges + (extra_gauges or []), counters + (extra_counters or []))
+    
     def reset_stats(self):
         self.coordinates_scanned = 0
         self.total_observations = 0
@@ -378,8 +648,10 @@ class IntelligenceDaemon:
             
             try:
                 print(f"[Report] Generating activity report for {current_slot.strftime('%H:%M')}", flush=True)
+                start = time.perf_counter()
                 self._generate_activity_report(current_slot)
-                self._reset_window_state()
+                self._report_hist.observe(time.perf_counter() - start)
+                self._request_window_reset()
                 self._last_report_time = current_slot
                 print(f"[Report] Activity report saved successfully", flush=True)
             except Exception as e:
@@ -558,11 +830,21 @@ class IntelligenceDaemon:
         self._period_driver_samples.append(driver_count)
         self._cycles_since_report += 1
     
+    def _request_window_reset(self) -> Optional[dict]:
+        """Queue the reset behind pending points on the process stage and wait for its summary"""
+        done = threading.Event()
+        if not self._process_stage.put(('window_reset', done)):
+            return None
+        while not done.wait(1):
+            if not self._process_stage.is_running:
+                return None
+        return self._last_window_summary
+    
     def _reset_window_state(self):
-        window_summary = self.trajectory_analyzer.get_window_summary()
+        """Runs on the process stage, the only thread that mutates dedup and trajectory state"""
+        window_summary = self.trajectory_analyzer.reset_window()
         self._last_window_summary = window_summary
         
-        self.trajectory_analyzer.reset_window()
         self.deduplicator.reset()
         self._period_driver_samples.clear()
         
@@ -4,21 +4,31 @@ Multi-factor probabilistic identity matching with:
 - Random UUID fingerprints (identity placeholders)
 - Prediction-before-dedup matching
 - Speed-aware dynamic thresholds
-- One-to-one assignment per cycle (greedy Hungarian)
+- One-to-one assignment per cycle (min-cost, per connected component)
 - Kalman-like motion prediction
-- Track lifecycle with confidence decay
+- Track lifecycle with confidence decay (deadline-driven)
 - Spatial grid indexing with speed-adaptive radius
 - Cross-grid identity carryover
+- Vectorized batch scoring (NumPy score matrix per coordinate batch)
 """
 
+import bisect
+import heapq
+import itertools
 import math
 import uuid
-from datetime import datetime, timedelta
-from typing import List, Dict, Optional, Tuple, Set
+from typing import Callable, Iterable, List, Dict, Optional, Tuple, Set
 from dataclasses import dataclass, field
-from collections import defaultdict
 from enum import Enum
 
+from . import clock
+from .assignment import solve_assignment
+from .geo import bearing_deg, haversine_m
+from .scoring import score_pairs
+from .spatial import TimedSpatialIndex
+from .trackstore import FLAG_DEDUP, TrackHandle, TrackStore, TrackView, get_track_store
+from .zones import ZONE_REGISTRY
+
 
 class TrackState(Enum):
     ACTIVE = "active"
@@ -32,26 +42,31 @@ class DriverSighting:
     lng: float
     bearing: Optional[float]
     vehicle_type: str
-    timestamp: datetime
+    timestamp: float
     zone_id: str
     eta_seconds: Optional[float] = None
     confidence: float = 0.5
+    zone_idx: int = field(init=False, repr=False, compare=False)
+    
+    def __post_init__(self):
+        self.zone_idx = ZONE_REGISTRY.id_of(self.zone_id)
 
 
 @dataclass 
 class TrackedDriver:
     fingerprint_id: str
     vehicle_type: str
-    positions: List[Tuple[float, float, datetime]] = field(default_factory=list)
-    bearings: List[float] = field(default_factory=list)
+    track: Optional[TrackHandle] = None
+    last_bearing: Optional[float] = None
+    bearing_count: int = 0
     confidence: float = 0.5
-    first_seen: datetime = field(default_factory=datetime.now)
-    last_seen: datetime = field(default_factory=datetime.now)
+    first_seen: float = field(default_factory=clock.now)
+    last_seen: float = field(default_factory=clock.now)
     zone_id: str = ""
     observation_count: int = 1
     
     state: TrackState = TrackState.ACTIVE
-    missing_since: Optional[datetime] = None
+    missing_since: Optional[float] = None
     
     velocity_lat: float = 0.0
     velocity_lng: float = 0.0
@@ -63,14 +78,23 @@ class TrackedDriver:
     smoothed_speed_ms: float = 0.0
     smoothed_heading: float = 0.0
     
-    def get_predicted_position(self, target_time: datetime) -> Tuple[float, float]:
+    POSITION_HISTORY = 30
+    # Extrapolation speed cap; a GPS jump must not project a track beyond
+    # what DriverDeduplicator searches around a sighting
+    MAX_SPEED_MS = 28
+    
+    @property
+    def positions(self) -> TrackView:
+        return TrackView(self.track, FLAG_DEDUP, self.POSITION_HISTORY, TrackStore.position)
+    
+    def get_predicted_position(self, target_time: float) -> Tuple[float, float]:
         if not self.positions:
             return (0, 0)
         
         last_pos = self.positions[-1]
         last_lat, last_lng, last_time = last_pos
         
-        dt = (target_time - last_time).total_seconds()
+        dt = target_time - last_time
         dt = min(dt, 60)
         
         predicted_lat = last_lat + self.velocity_lat * dt
@@ -87,22 +111,23 @@ class TrackedDriver:
         p1 = self.positions[-2]
         p2 = self.positions[-1]
         
-        dt = (p2[2] - p1[2]).total_seconds()
+        dt = p2[2] - p1[2]
         if dt <= 0:
             return
         
-        self.velocity_lat = (p2[0] - p1[0]) / dt
-        self.velocity_lng = (p2[1] - p1[1]) / dt
-        
         distance = haversine_m(p1[0], p1[1], p2[0], p2[1])
         instant_speed = distance / dt
         
+        scale = self.MAX_SPEED_MS / instant_speed if instant_speed > self.MAX_SPEED_MS else 1.0
+        self.velocity_lat = (p2[0] - p1[0]) / dt * scale
+        self.velocity_lng = (p2[1] - p1[1]) / dt * scale
+        
         alpha = 0.35
         self.smoothed_speed_ms = alpha * instant_speed + (1 - alpha) * self.smoothed_speed_ms
         self.last_speed_ms = self.smoothed_speed_ms
         
-        if len(self.bearings) >= 2:
-            new_heading = calculate_bearing(p1[0], p1[1], p2[0], p2[1])
+        if self.bearing_count >= 2:
+            new_heading = bearing_deg(p1[0], p1[1], p2[0], p2[1])
             heading_diff = new_heading - self.smoothed_heading
             if heading_diff > 180:
                 heading_diff -= 360
@@ -111,55 +136,132 @@ class TrackedDriver:
             self.smoothed_heading = (self.smoothed_heading + alpha * heading_diff) % 360
 
 
+class _GridRow:
+    """Occupied cells of one grid row, with their columns kept sorted for range scans"""
+    __slots__ = ('cols', 'cells')
+    
+    def __init__(self):
+        self.cols: List[int] = []
+        self.cells: Dict[int, Set[str]] = {}
+
+
 class SpatialGrid:
+    """
+    Tracks bucketed by vehicle type and 150 m cell. Each row keeps its occupied
+    columns sorted, so a radius query costs one bisect per row plus the hits,
+    whatever the radius. Longitude cells use one cosine per latitude row.
+    """
     CELL_SIZE_M = 150
     
     def __init__(self):
-        self.cells: Dict[Tuple[int, int], Set[str]] = defaultdict(set)
-        
+        self.rows: Dict[str, Dict[int, _GridRow]] = {}
+        self._row_cos: Dict[int, float] = {}
+    
+    def _cos_for_row(self, row: int) -> float:
+        cos = self._row_cos.get(row)
+        if cos is None:
+            center_lat = (row + 0.5) * self.CELL_SIZE_M / 111000 - 90
+            cos = max(math.cos(math.radians(center_lat)), 0.01)
+            self._row_cos[row] = cos
+        return cos
+    
     def _lat_lng_to_cell(self, lat: float, lng: float) -> Tuple[int, int]:
-        lat_cell = int((lat + 90) * 111000 / self.CELL_SIZE_M)
-        lng_cell = int((lng + 180) * 111000 * math.cos(math.radians(lat)) / self.CELL_SIZE_M)
-        return (lat_cell, lng_cell)
-    
-    def get_adjacent_cells(self, cell: Tuple[int, int], radius: int = 1) -> List[Tuple[int, int]]:
-        cx, cy = cell
-        cells = []
-        for dx in range(-radius, radius + 1):
-            for dy in range(-radius, radius + 1):
-                cells.append((cx + dx, cy + dy))
-        return cells
-    
-    def add_driver(self, fingerprint_id: str, lat: float, lng: float) -> Tuple[int, int]:
+        row = int((lat + 90) * 111000 / self.CELL_SIZE_M)
+        col = int((lng + 180) * 111000 * self._cos_for_row(row) / self.CELL_SIZE_M)
+        return (row, col)
+    
+    def add_driver(self, fingerprint_id: str, vehicle_type: str, lat: float, lng: float) -> Tuple[int, int]:
         cell = self._lat_lng_to_cell(lat, lng)
-        self.cells[cell].add(fingerprint_id)
+        self._insert(fingerprint_id, vehicle_type, cell)
         return cell
     
-    def remove_driver(self, fingerprint_id: str, old_cell: Optional[Tuple[int, int]]):
-        if old_cell and fingerprint_id in self.cells.get(old_cell, set()):
-            self.cells[old_cell].discard(fingerprint_id)
+    def _insert(self, fingerprint_id: str, vehicle_type: str, cell: Tuple[int, int]):
+        rows = self.rows.get(vehicle_type)
+        if rows is None:
+            rows = self.rows[vehicle_type] = {}
+        grid_row = rows.get(cell[0])
+        if grid_row is None:
+            grid_row = rows[cell[0]] = _GridRow()
+        ids = grid_row.cells.get(cell[1])
+        if ids is None:
+            ids = grid_row.cells[cell[1]] = set()
+            bisect.insort(grid_row.cols, cell[1])
+        ids.add(fingerprint_id)
+    
+    def remove_driver(self, fingerprint_id: str, vehicle_type: str, old_cell: Optional[Tuple[int, int]]):
+        if not old_cell:
+            return
+        rows = self.rows.get(vehicle_type, {})
+        grid_row = rows.get(old_cell[0])
+        ids = grid_row.cells.get(old_cell[1]) if grid_row else None
+        if not ids or fingerprint_id not in ids:
+            return
+        ids.discard(fingerprint_id)
+        if not ids:
+            del grid_row.cells[old_cell[1]]
+            del grid_row.cols[bisect.bisect_left(grid_row.cols, old_cell[1])]
+            if not grid_row.cols:
+                del rows[old_cell[0]]
     
-    def update_driver(self, fingerprint_id: str, old_cell: Optional[Tuple[int, int]], 
+    def update_driver(self, fingerprint_id: str, vehicle_type: str, old_cell: Optional[Tuple[int, int]],
                       lat: float, lng: float) -> Tuple[int, int]:
         new_cell = self._lat_lng_to_cell(lat, lng)
         if old_cell != new_cell:
-            self.remove_driver(fingerprint_id, old_cell)
-        self.cells[new_cell].add(fingerprint_id)
+            self.remove_driver(fingerprint_id, vehicle_type, old_cell)
+        self._insert(fingerprint_id, vehicle_type, new_cell)
         return new_cell
     
-    def get_nearby_drivers(self, lat: float, lng: float, radius: int = 1) -> Set[str]:
-        cell = self._lat_lng_to_cell(lat, lng)
-        nearby = set()
-        for adj_cell in self.get_adjacent_cells(cell, radius):
-            nearby.update(self.cells.get(adj_cell, set()))
-        return nearby
+    def _scan(self, vehicle_type: Optional[str], col_ranges: Iterable[Tuple[int, int, int]]) -> List[str]:
+        if vehicle_type is None:
+            partitions = list(self.rows.values())
+        else:
+            partitions = [self.rows[vehicle_type]] if vehicle_type in self.rows else []
+        
+        found: List[str] = []
+        for rows in partitions:
+            for row, first_col, last_col in col_ranges:
+                grid_row = rows.get(row)
+                if grid_row is None:
+                    continue
+                cols = grid_row.cols
+                i = bisect.bisect_left(cols, first_col)
+                while i < len(cols) and cols[i] <= last_col:
+                    found.extend(grid_row.cells[cols[i]])
+                    i += 1
+        return found
+    
+    def get_nearby_drivers(self, lat: float, lng: float, radius: int = 1,
+                           vehicle_type: Optional[str] = None) -> List[str]:
+        """Drivers within radius cells of the point's cell (all vehicle types if none given)"""
+        row = int((lat + 90) * 111000 / self.CELL_SIZE_M)
+        x = (lng + 180) * 111000 / self.CELL_SIZE_M
+        col_ranges = []
+        for r in range(row - radius, row + radius + 1):
+            col = int(x * self._cos_for_row(r))
+            col_ranges.append((r, col - radius, col + radius))
+        return self._scan(vehicle_type, col_ranges)
+    
+    def get_drivers_within(self, lat: float, lng: float, radius_m: float,
+                           vehicle_type: Optional[str] = None) -> List[str]:
+        """Drivers whose cell may lie within radius_m (callers check exact distance)"""
+        dlat = radius_m / 111000
+        widest_lat = min(max(abs(lat - dlat), abs(lat + dlat)), 89)
+        dlng = radius_m / (111000 * math.cos(math.radians(widest_lat)))
+        
+        first_row = int((lat - dlat + 90) * 111000 / self.CELL_SIZE_M)
+        last_row = int((lat + dlat + 90) * 111000 / self.CELL_SIZE_M)
+        
+        west = (lng - dlng + 180) * 111000 / self.CELL_SIZE_M
+        east = (lng + dlng + 180) * 111000 / self.CELL_SIZE_M
+        return self._scan(vehicle_type, [(row, int(west * self._cos_for_row(row)), int(east * self._cos_for_row(row)))
+                                         for row in range(first_row, last_row + 1)])
 
 
 class DriverDeduplicator:
     DEFAULT_COORD_THRESHOLD_M = 150
     DENSE_COORD_THRESHOLD_M = 80
     BEARING_THRESHOLD_DEG = 45
-    MAX_SPEED_MS = 28
+    MAX_SPEED_MS = TrackedDriver.MAX_SPEED_MS
     
     ACTIVE_TTL_SECONDS = 45
     MISSING_TTL_SECONDS = 90
@@ -170,6 +272,14 @@ class DriverDeduplicator:
     HIGH_CONFIDENCE_MATCH = 0.70
     
     FAST_SPEED_MS = 12
+    RECENT_MATCH_HORIZON_SECONDS = 60
+    
+    CROSS_GRID_CELL_SIZE_M = 1000
+    ARCHIVE_CELL_SIZE_M = 250
+    
+    VECTORIZED_SCORING = True
+    DEBUG_VERIFY_COUNTS = False
+    ASSIGNMENT_STRATEGY = 'optimal'
     
     WEIGHTS = {
         'distance': 0.30,
@@ -180,34 +290,28 @@ class DriverDeduplicator:
         'time_penalty': 0.10
     }
     
-    ZONE_SPEEDS_MS = {
-        'cbd': 12, 'perth_cbd': 12, 'northbridge': 12,
-        'east_perth': 14, 'west_perth': 14, 'elizabeth_quay': 12,
-        'subiaco': 15, 'leederville': 15, 'victoria_park': 15, 'south_perth': 15,
-        'fremantle': 14, 'south_fremantle': 14, 'north_fremantle': 14, 'fremantle_port': 12,
-        'armadale': 15, 'rockingham': 15, 'cannington': 15, 'success': 17,
-        'midland': 15, 'girrawheen': 17, 'heathridge': 17,
-        'airport': 17, 'perth_airport': 17, 'default_suburb': 17,
-        'kwinana_fwy': 28, 'mitchell_fwy': 28, 'roe_hwy': 28, 'tonkin_hwy': 28, 'freeway': 28,
-    }
-    
-    GRID_VISIBILITY_KM = {
-        'perth_cbd': 0.8, 'northbridge': 0.8, 'cbd': 0.8,
-        'fremantle': 0.9, 'south_fremantle': 0.9, 'north_fremantle': 0.9,
-        'perth_airport': 1.2, 'airport': 1.2,
-        'default': 1.0
+    VEHICLE_TYPE_MAPPING = {
+        'UBERX': 'UberX', 'COMFORT': 'Comfort', 'XL': 'XL', 'BLACK': 'Black',
+        'UberX': 'UberX', 'Comfort': 'Comfort', 'Black': 'Black'
     }
     
-    def __init__(self):
+    def __init__(self, clock: Callable[[], float] = clock.now, store: Optional[TrackStore] = None):
+        self._clock = clock
+        self.store = store or get_track_store()
         self.tracked_drivers: Dict[str, TrackedDriver] = {}
         self.zone_thresholds: Dict[str, int] = {}
         self.spatial_grid = SpatialGrid()
         
-        self.dead_archive: Dict[str, TrackedDriver] = {}
+        self.dead_archive = TimedSpatialIndex(cell_size_m=self.ARCHIVE_CELL_SIZE_M)
         
-        self.cross_grid_cache: Dict[str, Tuple[str, float, float, datetime]] = {}
+        self.cross_grid_cache = TimedSpatialIndex(cell_size_m=self.CROSS_GRID_CELL_SIZE_M)
         self.CROSS_GRID_TTL_SECONDS = 90
         
+        self._state_deadlines: List[Tuple[float, int, str, float, TrackState]] = []
+        self._deadline_seq = itertools.count()
+        
+        self._reset_counts()
+        
         self._seen_fingerprints_this_cycle: Set[str] = set()
         self._current_cycle_zone: Optional[str] = None
         
@@ -221,7 +325,7 @@ class DriverDeduplicator:
         
         self._zone_flow_tracking: Dict[str, Dict] = {}
         self._window_start_counts: Dict[str, int] = {}
-        self._driver_zone_entry: Dict[str, Tuple[str, datetime]] = {}
+        self._driver_zone_entry: Dict[str, Tuple[str, float]] = {}
     
     def start_cycle(self, zone_id: Optional[str] = None):
         self._seen_fingerprints_this_cycle.clear()
@@ -236,28 +340,13 @@ class DriverDeduplicator:
         return self.DENSE_COORD_THRESHOLD_M if is_dense else self.DEFAULT_COORD_THRESHOLD_M
     
     def _get_zone_speed(self, zone_id: str) -> float:
-        zone_lower = zone_id.lower() if zone_id else ''
-        if zone_lower in self.ZONE_SPEEDS_MS:
-            return self.ZONE_SPEEDS_MS[zone_lower]
-        for key in self.ZONE_SPEEDS_MS:
-            if key in zone_lower or zone_lower in key:
-                return self.ZONE_SPEEDS_MS[key]
-        if 'fwy' in zone_lower or 'freeway' in zone_lower or 'hwy' in zone_lower:
-            return 28
-        if 'cbd' in zone_lower:
-            return 12
-        return self.MAX_SPEED_MS
+        return ZONE_REGISTRY.get(zone_id).speed_ms
     
     def _is_freeway_zone(self, zone_id: str) -> bool:
-        if not zone_id:
-            return False
-        zone_lower = zone_id.lower()
-        return any(kw in zone_lower for kw in ['fwy', 'freeway', 'hwy', 'highway', 'motorway'])
+        return ZONE_REGISTRY.get(zone_id).is_freeway
     
-    def _get_speed_adaptive_grid_radius(self, zone_id: str, driver_speed_ms: float = 0) -> int:
-        is_freeway = self._is_freeway_zone(zone_id)
-        
-        if is_freeway:
+    def _get_speed_adaptive_grid_radius(self, zone_idx: int, driver_speed_ms: float = 0) -> int:
+        if ZONE_REGISTRY.is_freeway[zone_idx]:
             return 10
         
         if driver_speed_ms > 20:
@@ -289,59 +378,32 @@ class DriverDeduplicator:
         
         self._update_track_states()
         
-        results = []
+        results: List[Optional[Tuple[str, float, bool]]] = [None] * len(sightings)
         matched_drivers: Set[str] = set()
         unmatched_sightings: List[Tuple[int, DriverSighting]] = []
         
-        all_candidates: List[Tuple[int, DriverSighting, List[Tuple[TrackedDriver, float]]]] = []
-        
-        for idx, sighting in enumerate(sightings):
-            threshold_m = self.get_threshold_for_zone(sighting.zone_id, is_dense)
-            
-            is_freeway = self._is_freeway_zone(sighting.zone_id)
-            grid_radius = self._get_speed_adaptive_grid_radius(sighting.zone_id)
-            
-            nearby_ids = self.spatial_grid.get_nearby_drivers(sighting.lat, sighting.lng, radius=grid_radius)
-            
-            candidates = []
-            for fid in nearby_ids:
-                driver = self.tracked_drivers.get(fid)
-                if not driver or driver.vehicle_type != sighting.vehicle_type:
-                    continue
-                if driver.state == TrackState.DEAD:
-                    continue
-                
-                dynamic_threshold = self._get_dynamic_match_threshold(driver)
-                score = self._calculate_match_score(driver, sighting, threshold_m)
-                
-                if score >= dynamic_threshold:
-                    candidates.append((driver, score))
-            
-            all_candidates.append((idx, sighting, candidates))
+        if self.VECTORIZED_SCORING:
+            all_candidates = self._collect_candidates_vectorized(sightings, is_dense)
+        else:
+            all_candidates = self._collect_candidates(sightings, is_dense)
         
-        all_candidates.sort(key=lambda x: max([s for _, s in x[2]], default=0), reverse=True)
+        if self.ASSIGNMENT_STRATEGY == 'optimal':
+            assignments = self._assign_optimal(all_candidates)
+        else:
+            assignments = self._assign_greedy(all_candidates)
         
-        for idx, sighting, candidates in all_candidates:
-            best_match = None
-            best_score = 0
-            
-            for driver, score in sorted(candidates, key=lambda x: -x[1]):
-                if driver.fingerprint_id not in matched_drivers:
-                    best_match = driver
-                    best_score = score
-                    break
-            
+        for idx, sighting, best_match in assignments:
             if best_match:
                 if best_match.fingerprint_id in self._seen_fingerprints_this_cycle:
                     self._stats['cycle_deduped'] += 1
-                    results.append((best_match.fingerprint_id, best_match.confidence, False))
+                    results[idx] = (best_match.fingerprint_id, best_match.confidence, False)
                     continue
                 
                 matched_drivers.add(best_match.fingerprint_id)
                 self._seen_fingerprints_this_cycle.add(best_match.fingerprint_id)
                 self._update_driver(best_match, sighting)
                 self._stats['matches'] += 1
-                results.append((best_match.fingerprint_id, best_match.confidence, False))
+                results[idx] = (best_match.fingerprint_id, best_match.confidence, False)
             else:
                 unmatched_sightings.append((idx, sighting))
         
@@ -352,73 +414,171 @@ class DriverDeduplicator:
             if fallback:
                 if fallback.fingerprint_id in self._seen_fingerprints_this_cycle:
                     self._stats['cycle_deduped'] += 1
-                    results.append((fallback.fingerprint_id, fallback.confidence, False))
+                    results[idx] = (fallback.fingerprint_id, fallback.confidence, False)
                     continue
                     
                 matched_drivers.add(fallback.fingerprint_id)
                 self._seen_fingerprints_this_cycle.add(fallback.fingerprint_id)
                 self._update_driver(fallback, sighting)
                 self._stats['matches'] += 1
-                results.append((fallback.fingerprint_id, fallback.confidence, False))
+                results[idx] = (fallback.fingerprint_id, fallback.confidence, False)
                 continue
             
             cross_grid = self._check_cross_grid_cache(sighting)
             if cross_grid:
                 if cross_grid.fingerprint_id in self._seen_fingerprints_this_cycle:
                     self._stats['cycle_deduped'] += 1
-                    results.append((cross_grid.fingerprint_id, cross_grid.confidence, False))
+                    results[idx] = (cross_grid.fingerprint_id, cross_grid.confidence, False)
                     continue
                     
                 matched_drivers.add(cross_grid.fingerprint_id)
                 self._seen_fingerprints_this_cycle.add(cross_grid.fingerprint_id)
                 self._update_driver(cross_grid, sighting)
-                results.append((cross_grid.fingerprint_id, cross_grid.confidence, False))
+                results[idx] = (cross_grid.fingerprint_id, cross_grid.confidence, False)
                 continue
             
             resurrected = self._try_resurrect(sighting, threshold_m)
             if resurrected:
                 if resurrected.fingerprint_id in self._seen_fingerprints_this_cycle:
                     self._stats['cycle_deduped'] += 1
-                    results.append((resurrected.fingerprint_id, resurrected.confidence, False))
+                    results[idx] = (resurrected.fingerprint_id, resurrected.confidence, False)
                     continue
                     
                 matched_drivers.add(resurrected.fingerprint_id)
                 self._seen_fingerprints_this_cycle.add(resurrected.fingerprint_id)
                 self._stats['resurrections'] += 1
-                results.append((resurrected.fingerprint_id, resurrected.confidence, False))
+                results[idx] = (resurrected.fingerprint_id, resurrected.confidence, False)
                 continue
             
             fingerprint_id = self._create_fingerprint()
             self._add_new_driver(fingerprint_id, sighting)
             self._seen_fingerprints_this_cycle.add(fingerprint_id)
             self._stats['new_tracks'] += 1
-            results.append((fingerprint_id, 0.5, True))
+            results[idx] = (fingerprint_id, 0.5, True)
         
         return results
     
+    def _gather_nearby(self, sighting: DriverSighting) -> List[TrackedDriver]:
+        grid_radius = self._get_speed_adaptive_grid_radius(sighting.zone_idx)
+        nearby_ids = self.spatial_grid.get_nearby_drivers(sighting.lat, sighting.lng, grid_radius,
+                                                          sighting.vehicle_type)
+        
+        nearby = []
+        for fid in nearby_ids:
+            driver = self.tracked_drivers.get(fid)
+            if not driver:
+                continue
+            if driver.state == TrackState.DEAD:
+                continue
+            nearby.append(driver)
+        return nearby
+    
+    def _collect_candidates(self, sightings: List[DriverSighting],
+                            is_dense: bool) -> List[Tuple[int, DriverSighting, List[Tuple[TrackedDriver, float]]]]:
+        all_candidates = []
+        
+        for idx, sighting in enumerate(sightings):
+            threshold_m = self.get_threshold_for_zone(sighting.zone_id, is_dense)
+            
+            candidates = []
+            for driver in self._gather_nearby(sighting):
+                dynamic_threshold = self._get_dynamic_match_threshold(driver)
+                score = self._calculate_match_score(driver, sighting, threshold_m)
+                
+                if score >= dynamic_threshold:
+                    candidates.append((driver, score))
+            
+            all_candidates.append((idx, sighting, candidates))
+        
+        return all_candidates
+    
+    def _collect_candidates_vectorized(self, sightings: List[DriverSighting],
+                                       is_dense: bool) -> List[Tuple[int, DriverSighting, List[Tuple[TrackedDriver, float]]]]:
+        """Same result as _collect_candidates, scored in one NumPy pass over the gated pairs"""
+        column_of: Dict[str, int] = {}
+        drivers: List[TrackedDriver] = []
+        rows: List[int] = []
+        cols: List[int] = []
+        
+        for idx, sighting in enumerate(sightings):
+            for driver in self._gather_nearby(sighting):
+                col = column_of.get(driver.fingerprint_id)
+                if col is None:
+                    col = len(drivers)
+                    column_of[driver.fingerprint_id] = col
+                    drivers.append(driver)
+                rows.append(idx)
+                cols.append(col)
+        
+        all_candidates = [(idx, sighting, []) for idx, sighting in enumerate(sightings)]
+        if not rows:
+            return all_candidates
+        
+        thresholds = [self.get_threshold_for_zone(s.zone_id, is_dense) for s in sightings]
+        zone_speeds = [ZONE_REGISTRY.speed_ms[s.zone_idx] for s in sightings]
+        scores = score_pairs(
+            sightings, drivers, rows, cols, thresholds, zone_speeds, self.WEIGHTS,
+            self.ACTIVE_TTL_SECONDS, self.MISSING_TTL_SECONDS
+        ).tolist()
+        dynamic_thresholds = [self._get_dynamic_match_threshold(d) for d in drivers]
+        
+        for row, col, score in zip(rows, cols, scores):
+            if score >= dynamic_thresholds[col]:
+                all_candidates[row][2].append((drivers[col], score))
+        
+        return all_candidates
+    
+    def _assign_greedy(self, all_candidates) -> List[Tuple[int, DriverSighting, Optional[TrackedDriver]]]:
+        ordered = sorted(all_candidates, key=lambda x: max([s for _, s in x[2]], default=0), reverse=True)
+        taken: Set[str] = set()
+        assignments = []
+        
+        for idx, sighting, candidates in ordered:
+            best_match = None
+            for driver, score in sorted(candidates, key=lambda x: -x[1]):
+                if driver.fingerprint_id not in taken:
+                    best_match = driver
+                    taken.add(driver.fingerprint_id)
+                    break
+            assignments.append((idx, sighting, best_match))
+        
+        return assignments
+    
+    def _assign_optimal(self, all_candidates) -> List[Tuple[int, DriverSighting, Optional[TrackedDriver]]]:
+        by_id: Dict[str, TrackedDriver] = {}
+        for _, _, candidates in all_candidates:
+            for driver, _ in candidates:
+                by_id[driver.fingerprint_id] = driver
+        
+        chosen = solve_assignment([
+            [(driver.fingerprint_id, score) for driver, score in candidates]
+            for _, _, candidates in all_candidates
+        ])
+        
+        return [(idx, sighting, by_id[fid] if fid else None)
+                for (idx, sighting, _), fid in zip(all_candidates, chosen)]
+    
     def process_observation(self, sighting: DriverSighting, is_dense: bool = False) -> Tuple[str, float, bool]:
         results = self.process_batch([sighting], is_dense)
         return results[0] if results else (self._create_fingerprint(), 0.5, True)
     
     def _check_cross_grid_cache(self, sighting: DriverSighting) -> Optional[TrackedDriver]:
         now = sighting.timestamp
-        cutoff = now - timedelta(seconds=self.CROSS_GRID_TTL_SECONDS)
+        cutoff = now - self.CROSS_GRID_TTL_SECONDS
         
-        expired = [k for k, v in self.cross_grid_cache.items() if v[3] < cutoff]
-        for k in expired:
-            del self.cross_grid_cache[k]
+        self.cross_grid_cache.expire_before(cutoff)
         
         best_match = None
         best_distance = float('inf')
         
-        for fid, (vtype, lat, lng, ts) in self.cross_grid_cache.items():
-            if vtype != sighting.vehicle_type:
-                continue
-            
-            distance = haversine_m(lat, lng, sighting.lat, sighting.lng)
-            time_diff = (now - ts).total_seconds()
+        zone_speed = ZONE_REGISTRY.speed_ms[sighting.zone_idx]
+        radius_m = zone_speed * self.CROSS_GRID_TTL_SECONDS + 150
+        
+        for fid, entry in self.cross_grid_cache.query(sighting.vehicle_type, sighting.lat, sighting.lng, radius_m):
+            distance = haversine_m(entry.lat, entry.lng, sighting.lat, sighting.lng)
+            time_diff = now - entry.timestamp
             
-            max_allowed = self._get_zone_speed(sighting.zone_id) * time_diff + 150
+            max_allowed = zone_speed * time_diff + 150
             
             if distance < max_allowed and distance < best_distance:
                 driver = self.tracked_drivers.get(fid)
@@ -431,20 +591,29 @@ class DriverDeduplicator:
     def _update_cross_grid_cache(self, driver: TrackedDriver):
         if driver.positions:
             lat, lng, ts = driver.positions[-1]
-            self.cross_grid_cache[driver.fingerprint_id] = (
-                driver.vehicle_type, lat, lng, ts
-            )
+            self.cross_grid_cache.put(driver.fingerprint_id, driver.vehicle_type, lat, lng, ts)
     
     def _find_recent_match(self, sighting: DriverSighting, threshold_m: int,
                            excluded_ids: Set[str] = None) -> Tuple[Optional[TrackedDriver], float]:
+        zone_speed = ZONE_REGISTRY.speed_ms[sighting.zone_idx]
+        horizon = self.RECENT_MATCH_HORIZON_SECONDS
+        radius_m = (zone_speed + self.MAX_SPEED_MS) * horizon + threshold_m + 100
+        
+        nearby_ids = self.spatial_grid.get_drivers_within(sighting.lat, sighting.lng, radius_m,
+                                                          sighting.vehicle_type)
+        candidates = (self.tracked_drivers[fid] for fid in nearby_ids if fid in self.tracked_drivers)
+        return self._best_recent_match(sighting, threshold_m, excluded_ids, candidates)
+    
+    def _best_recent_match(self, sighting: DriverSighting, threshold_m: int, excluded_ids: Optional[Set[str]],
+                           candidates: Iterable[TrackedDriver]) -> Tuple[Optional[TrackedDriver], float]:
         best_match = None
         best_score = 0
         now = sighting.timestamp
-        zone_speed = self._get_zone_speed(sighting.zone_id)
+        zone_speed = ZONE_REGISTRY.speed_ms[sighting.zone_idx]
         excluded = excluded_ids or set()
         
-        for fid, driver in self.tracked_drivers.items():
-            if fid in excluded:
+        for driver in candidates:
+            if driver.fingerprint_id in excluded:
                 continue
             if driver.vehicle_type != sighting.vehicle_type:
                 continue
@@ -454,8 +623,8 @@ class DriverDeduplicator:
             if not driver.positions:
                 continue
             last_time = driver.positions[-1][2]
-            time_diff = (now - last_time).total_seconds()
-            if time_diff < 0 or time_diff > 60:
+            time_diff = now - last_time
+            if time_diff < 0 or time_diff > self.RECENT_MATCH_HORIZON_SECONDS:
                 continue
             
             pred_lat, pred_lng = driver.get_predicted_position(now)
@@ -507,11 +676,11 @@ class DriverDeduplicator:
         last_pos = driver.positions[-1]
         last_lat, last_lng, last_time = last_pos
         
-        time_diff = (sighting.timestamp - last_time).total_seconds()
+        time_diff = sighting.timestamp - last_time
         if time_diff < 0:
             return 0
         
-        zone_speed = self._get_zone_speed(sighting.zone_id)
+        zone_speed = ZONE_REGISTRY.speed_ms[sighting.zone_idx]
         
         base_threshold = threshold_m
         speed_allowance = driver.last_speed_ms * time_diff * 1.5
@@ -531,9 +700,8 @@ class DriverDeduplicator:
         distance_score = max(0, 1 - (distance_m / max(max_distance, 1)))
         
         bearing_score = 1.0
-        if sighting.bearing is not None and driver.bearings:
-            last_bearing = driver.bearings[-1]
-            bearing_diff = abs(sighting.bearing - last_bearing)
+        if sighting.bearing is not None and driver.last_bearing is not None:
+            bearing_diff = abs(sighting.bearing - driver.last_bearing)
             bearing_diff = min(bearing_diff, 360 - bearing_diff)
             bearing_score = max(0, 1 - (bearing_diff / 120))
         
@@ -582,8 +750,8 @@ class DriverDeduplicator:
         p1 = driver.positions[-2]
         p2 = driver.positions[-1]
         
-        expected_bearing = calculate_bearing(p1[0], p1[1], p2[0], p2[1])
-        actual_bearing = calculate_bearing(p2[0], p2[1], sighting.lat, sighting.lng)
+        expected_bearing = bearing_deg(p1[0], p1[1], p2[0], p2[1])
+        actual_bearing = bearing_deg(p2[0], p2[1], sighting.lat, sighting.lng)
         
         bearing_diff = abs(expected_bearing - actual_bearing)
         bearing_diff = min(bearing_diff, 360 - bearing_diff)
@@ -597,12 +765,10 @@ class DriverDeduplicator:
         best_match = None
         best_score = 0
         
-        cutoff = datetime.now() - timedelta(minutes=5)
+        cutoff = self._clock() - 300
         
-        for fid, driver in list(self.dead_archive.items()):
-            if driver.vehicle_type != sighting.vehicle_type:
-                continue
-            
+        for fid, entry in self.dead_archive.query(sighting.vehicle_type, sighting.lat, sighting.lng, threshold_m * 3):
+            driver = entry.value
             if driver.last_seen < cutoff:
                 continue
             
@@ -619,51 +785,75 @@ class DriverDeduplicator:
                     best_match = driver
         
         if best_match:
-            del self.dead_archive[best_match.fingerprint_id]
+            self.dead_archive.pop(best_match.fingerprint_id)
             best_match.state = TrackState.ACTIVE
             best_match.missing_since = None
             best_match.confidence = min(best_match.confidence, 0.6)
             self._update_driver(best_match, sighting)
             self.tracked_drivers[best_match.fingerprint_id] = best_match
+            self._refresh_counts(best_match)
             return best_match
         
         return None
     
+    def _schedule_state_deadline(self, driver: TrackedDriver):
+        ttl = self.ACTIVE_TTL_SECONDS if driver.state == TrackState.ACTIVE else self.MISSING_TTL_SECONDS
+        heapq.heappush(self._state_deadlines, (
+            driver.last_seen + ttl, next(self._deadline_seq),
+            driver.fingerprint_id, driver.last_seen, driver.state
+        ))
+    
     def _update_track_states(self):
-        now = datetime.now()
+        """Apply TTL transitions whose deadline has passed; at most one transition per track per call"""
+        now = self._clock()
+        newly_missing = []
         
-        for fid, driver in list(self.tracked_drivers.items()):
-            time_since_seen = (now - driver.last_seen).total_seconds()
+        while self._state_deadlines and self._state_deadlines[0][0] < now:
+            _, _, fid, last_seen, state = heapq.heappop(self._state_deadlines)
+            driver = self.tracked_drivers.get(fid)
+            if not driver or driver.state != state or driver.last_seen != last_seen:
+                continue
             
             if driver.state == TrackState.ACTIVE:
-                if time_since_seen > self.ACTIVE_TTL_SECONDS:
-                    driver.state = TrackState.MISSING
-                    driver.missing_since = now
-                    self._apply_confidence_decay(driver)
-                    self._update_cross_grid_cache(driver)
+                driver.state = TrackState.MISSING
+                driver.missing_since = now
+                self._apply_confidence_decay(driver)
+                self._update_cross_grid_cache(driver)
+                self._refresh_counts(driver)
+                newly_missing.append(driver)
             
             elif driver.state == TrackState.MISSING:
-                if time_since_seen > self.MISSING_TTL_SECONDS:
-                    driver.state = TrackState.DEAD
-                    self.dead_archive[fid] = driver
-                    del self.tracked_drivers[fid]
-                    self.spatial_grid.remove_driver(fid, driver.grid_cell)
-                    if fid in self.cross_grid_cache:
-                        del self.cross_grid_cache[fid]
-                    self._stats['expired'] += 1
-        
-        archive_cutoff = now - timedelta(minutes=self.DEAD_ARCHIVE_MINUTES)
-        expired_archive = [fid for fid, d in self.dead_archive.items() 
-                          if d.last_seen < archive_cutoff]
-        for fid in expired_archive:
-            del self.dead_archive[fid]
+                driver.state = TrackState.DEAD
+                self._archive_driver(driver)
+                del self.tracked_drivers[fid]
+                self.spatial_grid.remove_driver(fid, driver.vehicle_type, driver.grid_cell)
+                self.cross_grid_cache.pop(fid)
+                self._refresh_counts(driver)
+                self._stats['expired'] += 1
+        
+        for driver in newly_missing:
+            self._schedule_state_deadline(driver)
+        
+        archive_cutoff = now - self.DEAD_ARCHIVE_MINUTES * 60
+        for _, entry in self.dead_archive.expire_before(archive_cutoff):
+            self.store.release(entry.value.track)
+    
+    def _archive_driver(self, driver: TrackedDriver):
+        if not driver.positions:
+            self.store.release(driver.track)
+            return
+        lat, lng, _ = driver.positions[-1]
+        self.dead_archive.put(driver.fingerprint_id, driver.vehicle_type, lat, lng,
+                              driver.last_seen, driver)
     
     def _update_driver(self, driver: TrackedDriver, sighting: DriverSighting):
         old_zone = driver.zone_id
         
-        driver.positions.append((sighting.lat, sighting.lng, sighting.timestamp))
+        self.store.append(driver.track, sighting.lat, sighting.lng, sighting.timestamp,
+                          sighting.bearing, sighting.zone_idx, FLAG_DEDUP)
         if sighting.bearing is not None:
-            driver.bearings.append(sighting.bearing)
+            driver.last_bearing = sighting.bearing
+            driver.bearing_count += 1
         
         driver.last_seen = sighting.timestamp
         driver.observation_count += 1
@@ -677,29 +867,31 @@ class DriverDeduplicator:
         driver.state = TrackState.ACTIVE
         driver.missing_since = None
         driver.confidence = min(0.99, driver.confidence + 0.03)
+        self._schedule_state_deadline(driver)
+        self._refresh_counts(driver)
         
         driver.grid_cell = self.spatial_grid.update_driver(
-            driver.fingerprint_id, driver.grid_cell, sighting.lat, sighting.lng
+            driver.fingerprint_id, driver.vehicle_type, driver.grid_cell, sighting.lat, sighting.lng
         )
         
         self._update_cross_grid_cache(driver)
         
         self._track_zone_transition(driver, old_zone, sighting.zone_id)
         self._track_observation(driver)
-        
-        if len(driver.positions) > 30:
-            driver.positions = driver.positions[-30:]
-        if len(driver.bearings) > 30:
-            driver.bearings = driver.bearings[-30:]
+
     
     def _add_new_driver(self, fingerprint_id: str, sighting: DriverSighting):
-        grid_cell = self.spatial_grid.add_driver(fingerprint_id, sighting.lat, sighting.lng)
+        grid_cell = self.spatial_grid.add_driver(fingerprint_id, sighting.vehicle_type, sighting.lat, sighting.lng)
+        track = self.store.acquire(fingerprint_id)
+        self.store.append(track, sighting.lat, sighting.lng, sighting.timestamp,
+                          sighting.bearing, sighting.zone_idx, FLAG_DEDUP)
         
         driver = TrackedDriver(
             fingerprint_id=fingerprint_id,
             vehicle_type=sighting.vehicle_type,
-            positions=[(sighting.lat, sighting.lng, sighting.timestamp)],
-            bearings=[sighting.bearing] if sighting.bearing else [],
+            track=track,
+            last_bearing=sighting.bearing if sighting.bearing else None,
+            bearing_count=1 if sighting.bearing else 0,
             confidence=0.5,
             first_seen=sighting.timestamp,
             last_seen=sighting.timestamp,
@@ -709,6 +901,8 @@ class DriverDeduplicator:
             last_eta=sighting.eta_seconds
         )
         self.tracked_drivers[fingerprint_id] = driver
+        self._schedule_state_deadline(driver)
+        self._refresh_counts(driver)
         self._update_cross_grid_cache(driver)
     
     def _create_fingerprint(self, sighting: DriverSighting = None) -> str:
@@ -722,43 +916,93 @@ class DriverDeduplicator:
                 if d.state == TrackState.ACTIVE and d.confidence >= min_confidence]
     
     def get_driver_count(self) -> int:
-        return len([d for d in self.tracked_drivers.values() if d.state == TrackState.ACTIVE])
+        self._verify_counts()
+        return self._active_count
     
     def get_counts_by_type(self) -> Dict[str, int]:
-        counts = {'UberX': 0, 'Comfort': 0, 'XL': 0, 'Black': 0}
-        type_mapping = {
-            'UBERX': 'UberX', 'COMFORT': 'Comfort', 'XL': 'XL', 'BLACK': 'Black',
-            'UberX': 'UberX', 'Comfort': 'Comfort', 'Black': 'Black'
-        }
-        
-        for driver in self.tracked_drivers.values():
-            if driver.state != TrackState.ACTIVE:
-                continue
-            ptype = type_mapping.get(driver.vehicle_type, 'UberX')
-            counts[ptype] += 1
-        
-        return counts
+        self._verify_counts()
+        return dict(self._type_counts)
     
     def get_counts_by_zone(self) -> Dict[str, Dict[str, int]]:
-        zone_counts = {}
-        type_mapping = {
-            'UBERX': 'UberX', 'COMFORT': 'Comfort', 'XL': 'XL', 'BLACK': 'Black',
-            'UberX': 'UberX', 'Comfort': 'Comfort', 'Black': 'Black'
-        }
+        self._verify_counts()
+        return {zone: dict(counts) for zone, counts in self._zone_type_counts.items()}
+    
+    def _count_key(self, driver: TrackedDriver) -> Optional[Tuple[str, str]]:
+        if driver.state != TrackState.ACTIVE or driver.fingerprint_id not in self.tracked_drivers:
+            return None
+        ptype = self.VEHICLE_TYPE_MAPPING.get(driver.vehicle_type, 'UberX')
+        return (driver.zone_id or 'unknown', ptype)
+    
+    def _refresh_counts(self, driver: TrackedDriver):
+        """Move driver between the incremental (zone, type) counters after a state or zone change"""
+        new_key = self._count_key(driver)
+        old_key = self._counted.get(driver.fingerprint_id)
+        if new_key == old_key:
+            return
+        
+        if old_key:
+            zone, ptype = old_key
+            self._active_count -= 1
+            self._type_counts[ptype] -= 1
+            zone_counts = self._zone_type_counts[zone]
+            zone_counts[ptype] -= 1
+            if not any(zone_counts.values()):
+                del self._zone_type_counts[zone]
+            del self._counted[driver.fingerprint_id]
+        
+        if new_key:
+            zone, ptype = new_key
+            self._active_count += 1
+            self._type_counts[ptype] += 1
+            if zone not in self._zone_type_counts:
+                self._zone_type_counts[zone] = {'UberX': 0, 'Comfort': 0, 'XL': 0, 'Black': 0}
+            self._zone_type_counts[zone][ptype] += 1
+            self._counted[driver.fingerprint_id] = new_key
+    
+    def _reset_counts(self):
+        self._counted: Dict[str, Tuple[str, str]] = {}
+        self._active_count = 0
+        self._type_counts = {'UberX': 0, 'Comfort': 0, 'XL': 0, 'Black': 0}
+        self._zone_type_counts: Dict[str, Dict[str, int]] = {}
+    
+    def _recount(self) -> Tuple[int, Dict[str, int], Dict[str, Dict[str, int]]]:
+        type_counts = {'UberX': 0, 'Comfort': 0, 'XL': 0, 'Black': 0}
+        zone_counts: Dict[str, Dict[str, int]] = {}
         
         for driver in self.tracked_drivers.values():
-            if driver.state != TrackState.ACTIVE:
+            key = self._count_key(driver)
+            if not key:
                 continue
-            zone = driver.zone_id or 'unknown'
+            zone, ptype = key
+            type_counts[ptype] += 1
             if zone not in zone_counts:
                 zone_counts[zone] = {'UberX': 0, 'Comfort': 0, 'XL': 0, 'Black': 0}
-            ptype = type_mapping.get(driver.vehicle_type, 'UberX')
             zone_counts[zone][ptype] += 1
         
-        return zone_counts
+        return sum(type_counts.values()), type_counts, zone_counts
+    
+    def _verify_counts(self):
+        """Debug check: fail loudly, naming the keys, when the incremental counters drift from a recount"""
+        if not self.DEBUG_VERIFY_COUNTS:
+            return
+        
+        active, type_counts, zone_counts = self._recount()
+        if (active, type_counts, zone_counts) == (self._active_count, self._type_counts, self._zone_type_counts):
+            return
+        
+        diffs = []
+        if active != self._active_count:
+            diffs.append(f"active {self._active_count} != {active}")
+        for ptype in sorted(set(type_counts) | set(self._type_counts)):
+            if self._type_counts.get(ptype, 0) != type_counts.get(ptype, 0):
+                diffs.append(f"{ptype} {self._type_counts.get(ptype, 0)} != {type_counts.get(ptype, 0)}")
+        for zone in sorted(set(zone_counts) | set(self._zone_type_counts)):
+            if self._zone_type_counts.get(zone) != zone_counts.get(zone):
+                diffs.append(f"{zone} {self._zone_type_counts.get(zone)} != {zone_counts.get(zone)}")
+        raise AssertionError("fleet counters drifted (incremental != recount): " + '; '.join(diffs))
     
     def get_recent_drivers(self, minutes: int = 10) -> List[Dict]:
-        cutoff = datetime.now() - timedelta(minutes=minutes)
+        cutoff = self._clock() - minutes * 60
         result = []
         
         for driver in self.tracked_drivers.values():
@@ -768,12 +1012,12 @@ class DriverDeduplicator:
                     'fingerprint_id': driver.fingerprint_id,
                     'lat': lat,
                     'lng': lng,
-                    'bearing': driver.bearings[-1] if driver.bearings else None,
+                    'bearing': driver.last_bearing,
                     'vehicle_type': driver.vehicle_type,
                     'zone_id': driver.zone_id,
                     'confidence': driver.confidence,
                     'observations': driver.observation_count,
-                    'last_seen': driver.last_seen,
+                    'last_seen': clock.to_datetime(driver.last_seen),
                     'state': driver.state.value,
                     'speed_ms': driver.last_speed_ms
                 })
@@ -819,7 +1063,7 @@ class DriverDeduplicator:
             if driver.fingerprint_id in self._driver_zone_entry:
                 entry_zone, entry_time = self._driver_zone_entry[driver.fingerprint_id]
                 if entry_zone == old_zone:
-                    dwell = (driver.last_seen - entry_time).total_seconds()
+                    dwell = driver.last_seen - entry_time
                     self._zone_flow_tracking[old_zone]['dwell_times'].append(dwell)
         
         if new_zone:
@@ -854,105 +1098,88 @@ class DriverDeduplicator:
     
     def get_zone_window_features(self, window_minutes: float = 15.0) -> Dict[str, Dict]:
         """Get ML features for all zones for the current window"""
-        zone_counts = self.get_counts_by_zone()
-        features = {}
-        
-        all_outflows = []
-        all_dwells = []
-        all_drops = []
-        
-        for zone_id in set(list(self._zone_flow_tracking.keys()) + list(zone_counts.keys())):
-            tracking = self._zone_flow_tracking.get(zone_id, {
-                'inflow': 0, 'outflow': 0, 'dwell_times': [],
-                'speeds': [], 'confidences': [], 'observations': 0,
-                'start_count': 0, 'end_count': 0
-            })
-            
-            counts = zone_counts.get(zone_id, {'UberX': 0, 'Comfort': 0, 'XL': 0, 'Black': 0})
-            current_count = sum(counts.values())
-            start_count = self._window_start_counts.get(zone_id, current_count)
-            
-            inflow = tracking['inflow']
-            outflow = tracking['outflow']
-            dwell_times = tracking['dwell_times']
-            speeds = tracking['speeds']
-            confidences = tracking['confidences']
-            observations = tracking['observations']
-            
-            inflow_rate = inflow / window_minutes if window_minutes > 0 else 0
-            outflow_rate = outflow / window_minutes if window_minutes > 0 else 0
-            net_flow = inflow - outflow
-            driver_count_change = current_count - start_count
-            
-            avg_dwell = sum(dwell_times) / len(dwell_times) if dwell_times else 0
-            min_dwell = min(dwell_times) if dwell_times else None
-            max_dwell = max(dwell_times) if dwell_times else None
-            
-            avg_speed = sum(speeds) / len(speeds) if speeds else 0
-            max_speed = max(speeds) if speeds else None
-            
-            avg_confidence = sum(confidences) / len(confidences) if confidences else 0
-            
-            features[zone_id] = {
-                'driver_count': current_count,
-                'driver_count_start': start_count,
-                'driver_count_end': current_count,
-                'driver_count_change': driver_count_change,
-                'inflow_count': inflow,
-                'outflow_count': outflow,
-                'inflow_rate': inflow_rate,
-                'outflow_rate': outflow_rate,
-                'net_flow': net_flow,
-                'avg_dwell_sec': avg_dwell,
-                'min_dwell_sec': min_dwell,
-                'max_dwell_sec': max_dwell,
-                'avg_speed_ms': avg_speed,
-                'max_speed_ms': max_speed,
-                'confidence_avg': avg_confidence,
-                'observation_count': observations,
-            }
-            
-            all_outflows.append(outflow_rate)
-            if avg_dwell > 0:
-                all_dwells.append(avg_dwell)
-            all_drops.append(-driver_count_change if driver_count_change < 0 else 0)
-        
-        max_outflow = max(all_outflows) if all_outflows else 1
-        max_dwell = max(all_dwells) if all_dwells else 1
-        max_drop = max(all_drops) if all_drops else 1
-        
-        for zone_id, feat in features.items():
-            outflow_norm = feat['outflow_rate'] / max_outflow if max_outflow > 0 else 0
-            dwell_norm = feat['avg_dwell_sec'] / max_dwell if max_dwell > 0 else 0
-            drop = -feat['driver_count_change'] if feat['driver_count_change'] < 0 else 0
-            drop_norm = drop / max_drop if max_drop > 0 else 0
-            
-            demand_proxy = (
-                0.45 * outflow_norm +
-                0.35 * (1 - dwell_norm) +
-                0.20 * drop_norm
-            )
-            
-            if demand_proxy >= 0.6:
-                activity_class = 'HOT'
-            elif demand_proxy >= 0.35:
-                activity_class = 'WARM'
+        return build_zone_window_features(self._zone_flow_tracking, self._window_start_counts,
+                                          self.get_counts_by_zone(), window_minutes)
+    
+    CHECKPOINT_FIELDS = (
+        'fingerprint_id', 'vehicle_type', 'last_bearing', 'bearing_count', 'confidence',
+        'first_seen', 'last_seen', 'zone_id', 'observation_count', 'missing_since',
+        'velocity_lat', 'velocity_lng', 'last_eta', 'last_speed_ms', 'smoothed_speed_ms', 'smoothed_heading',
+    )
+    CHECKPOINT_TIME_FIELDS = ('first_seen', 'last_seen', 'missing_since')
+    
+    def _driver_row(self, driver: TrackedDriver, epoch_offset: float) -> tuple:
+        row = []
+        for name in self.CHECKPOINT_FIELDS:
+            value = getattr(driver, name)
+            if name in self.CHECKPOINT_TIME_FIELDS and value is not None:
+                value += epoch_offset
+            row.append(value)
+        return (*row, driver.state.value)
+    
+    def _driver_from_row(self, row: tuple, epoch_offset: float) -> Optional[TrackedDriver]:
+        values = dict(zip(self.CHECKPOINT_FIELDS, row))
+        for name in self.CHECKPOINT_TIME_FIELDS:
+            if values[name] is not None:
+                values[name] -= epoch_offset
+        driver = TrackedDriver(track=self.store.acquire(values['fingerprint_id']),
+                               state=TrackState(row[-1]), **values)
+        if not driver.positions:
+            self.store.release(driver.track)
+            return None
+        return driver
+    
+    def export_state(self, epoch_offset: float) -> Dict:
+        """Tracks, archive and cross-grid cache as plain rows; timestamps shifted by epoch_offset"""
+        return {
+            'drivers': [self._driver_row(d, epoch_offset) for d in self.tracked_drivers.values()],
+            'archive': [self._driver_row(entry.value, epoch_offset) for _, entry in self.dead_archive.items()],
+            'cross_grid': [(fid, e.vehicle_type, e.lat, e.lng, e.timestamp + epoch_offset)
+                           for fid, e in self.cross_grid_cache.items()],
+            'stats': dict(self._stats),
+        }
+    
+    def restore_state(self, state: Dict, epoch_offset: float):
+        """Replace current tracking with a checkpoint, dropping whatever the TTLs have since expired"""
+        self.reset()
+        now = self._clock()
+        live_cutoff = now - self.ACTIVE_TTL_SECONDS - self.MISSING_TTL_SECONDS
+        archive_cutoff = now - self.DEAD_ARCHIVE_MINUTES * 60
+        
+        for row in state['drivers'] + state['archive']:
+            driver = self._driver_from_row(row, epoch_offset)
+            if driver is None:
+                continue
+            if driver.last_seen < archive_cutoff:
+                self.store.release(driver.track)
+            elif driver.state == TrackState.DEAD or driver.last_seen < live_cutoff:
+                driver.state = TrackState.DEAD
+                self._archive_driver(driver)
             else:
-                activity_class = 'COLD'
-            
-            feat['outflow_rate_norm'] = outflow_norm
-            feat['dwell_norm'] = dwell_norm
-            feat['drop_norm'] = drop_norm
-            feat['demand_proxy'] = demand_proxy
-            feat['activity_class'] = activity_class
-            feat['anomaly_score'] = 0
-        
-        return features
+                lat, lng, _ = driver.positions[-1]
+                driver.grid_cell = self.spatial_grid.add_driver(driver.fingerprint_id, driver.vehicle_type, lat, lng)
+                self.tracked_drivers[driver.fingerprint_id] = driver
+                self._schedule_state_deadline(driver)
+                self._refresh_counts(driver)
+        
+        cross_grid_cutoff = now - self.CROSS_GRID_TTL_SECONDS
+        for fid, vehicle_type, lat, lng, ts in state['cross_grid']:
+            ts -= epoch_offset
+            if fid in self.tracked_drivers and ts >= cross_grid_cutoff:
+                self.cross_grid_cache.put(fid, vehicle_type, lat, lng, ts)
+        
+        self._stats.update(state['stats'])
     
     def reset(self):
+        for driver in self.tracked_drivers.values():
+            self.store.release(driver.track)
+        for _, entry in self.dead_archive.items():
+            self.store.release(entry.value.track)
         self.tracked_drivers.clear()
         self.dead_archive.clear()
         self.cross_grid_cache.clear()
+        self._state_deadlines.clear()
+        self._reset_counts()
         self.spatial_grid = SpatialGrid()
         self._seen_fingerprints_this_cycle.clear()
         self._zone_flow_tracking.clear()
@@ -979,26 +1206,100 @@ class DriverDeduplicator:
         }
 
 
-def haversine_m(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
-    R = 6371000
-    lat1_rad = math.radians(lat1)
-    lat2_rad = math.radians(lat2)
-    delta_lat = math.radians(lat2 - lat1)
-    delta_lng = math.radians(lng2 - lng1)
+def build_zone_window_features(flow_tracking: Dict[str, Dict], window_start_counts: Dict[str, int],
+                               zone_counts: Dict[str, Dict[str, int]],
+                               window_minutes: float = 15.0) -> Dict[str, Dict]:
+    """Window features per zone, with demand normalised across every zone given"""
+    features = {}
     
-    a = math.sin(delta_lat/2)**2 + math.cos(lat1_rad) * math.cos(lat2_rad) * math.sin(delta_lng/2)**2
-    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
+    all_outflows = []
+    all_dwells = []
+    all_drops = []
     
-    return R * c
-
-
-def calculate_bearing(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
-    lat1_rad = math.radians(lat1)
-    lat2_rad = math.radians(lat2)
-    delta_lng = math.radians(lng2 - lng1)
+    for zone_id in set(list(flow_tracking.keys()) + list(zone_counts.keys())):
+        tracking = flow_tracking.get(zone_id, {
+            'inflow': 0, 'outflow': 0, 'dwell_times': [],
+            'speeds': [], 'confidences': [], 'observations': 0,
+            'start_count': 0, 'end_count': 0
+        })
+        
+        counts = zone_counts.get(zone_id, {'UberX': 0, 'Comfort': 0, 'XL': 0, 'Black': 0})
+        current_count = sum(counts.values())
+        start_count = window_start_counts.get(zone_id, current_count)
+        
+        inflow = tracking['inflow']
+        outflow = tracking['outflow']
+        dwell_times = tracking['dwell_times']
+        speeds = tracking['speeds']
+        confidences = tracking['confidences']
+        observations = tracking['observations']
+        
+        inflow_rate = inflow / window_minutes if window_minutes > 0 else 0
+        outflow_rate = outflow / window_minutes if window_minutes > 0 else 0
+        net_flow = inflow - outflow
+        driver_count_change = current_count - start_count
+        
+        avg_dwell = sum(dwell_times) / len(dwell_times) if dwell_times else 0
+        min_dwell = min(dwell_times) if dwell_times else None
+        max_dwell = max(dwell_times) if dwell_times else None
+        
+        avg_speed = sum(speeds) / len(speeds) if speeds else 0
+        max_speed = max(speeds) if speeds else None
+        
+        avg_confidence = sum(confidences) / len(confidences) if confidences else 0
+        
+        features[zone_id] = {
+            'driver_count': current_count,
+            'driver_count_start': start_count,
+            'driver_count_end': current_count,
+            'driver_count_change': driver_count_change,
+            'inflow_count': inflow,
+            'outflow_count': outflow,
+            'inflow_rate': inflow_rate,
+            'outflow_rate': outflow_rate,
+            'net_flow': net_flow,
+            'avg_dwell_sec': avg_dwell,
+            'min_dwell_sec': min_dwell,
+            'max_dwell_sec': max_dwell,
+            'avg_speed_ms': avg_speed,
+            'max_speed_ms': max_speed,
+            'confidence_avg': avg_confidence,
+            'observation_count': observations,
+        }
+        
+        all_outflows.append(outflow_rate)
+        if avg_dwell > 0:
+            all_dwells.append(avg_dwell)
+        all_drops.append(-driver_count_change if driver_count_change < 0 else 0)
+    
+    max_outflow = max(all_outflows) if all_outflows else 1
+    max_dwell = max(all_dwells) if all_dwells else 1
+    max_drop = max(all_drops) if all_drops else 1
     
-    x = math.sin(delta_lng) * math.cos(lat2_rad)
-    y = math.cos(lat1_rad) * math.sin(lat2_rad) - math.sin(lat1_rad) * math.cos(lat2_rad) * math.cos(delta_lng)
+    for zone_id, feat in features.items():
+        outflow_norm = feat['outflow_rate'] / max_outflow if max_outflow > 0 else 0
+        dwell_norm = feat['avg_dwell_sec'] / max_dwell if max_dwell > 0 else 0
+        drop = -feat['driver_count_change'] if feat['driver_count_change'] < 0 else 0
+        drop_norm = drop / max_drop if max_drop > 0 else 0
+        
+        demand_proxy = (
+            0.45 * outflow_norm +
+            0.35 * (1 - dwell_norm) +
+            0.20 * drop_norm
+        )
+        
+        if demand_proxy >= 0.6:
+            activity_class = 'HOT'
+        elif demand_proxy >= 0.35:
+            activity_class = 'WARM'
+        else:
+            activity_class = 'COLD'
+        
+        feat['outflow_rate_norm'] = outflow_norm
+        feat['dwell_norm'] = dwell_norm
+        feat['drop_norm'] = drop_norm
+        feat['demand_proxy'] = demand_proxy
+        feat['activity_class'] = activity_class
+        feat['anomaly_score'] = 0
     
-    bearing = math.degrees(math.atan2(x, y))
-    return (bearing + 360) % 360
+    return features
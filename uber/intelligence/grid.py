@@ -7,6 +7,9 @@ import math
 from dataclasses import dataclass
 from typing import List, Dict, Tuple
 
+from .geo import haversine_m
+from .zones import SCAN_ZONES, ZONE_REGISTRY, zone_id_for_name
+
 
 @dataclass
 class GridPoint:
@@ -16,35 +19,11 @@ class GridPoint:
     zone_name: str
     is_dense: bool
     priority: int
+    zone_idx: int = -1
 
 
 class PerthGrid:
-    PERTH_ZONES = [
-        # CBD Area
-        {'name': 'Perth CBD', 'lat': -31.9505, 'lng': 115.8605, 'radius': 2, 'dense': True, 'priority': 10},
-        {'name': 'Northbridge', 'lat': -31.9440, 'lng': 115.8575, 'radius': 1, 'dense': True, 'priority': 9},
-        {'name': 'East Perth', 'lat': -31.9550, 'lng': 115.8750, 'radius': 1, 'dense': True, 'priority': 8},
-        {'name': 'West Perth', 'lat': -31.9480, 'lng': 115.8430, 'radius': 1, 'dense': True, 'priority': 7},
-        {'name': 'Elizabeth Quay', 'lat': -31.9580, 'lng': 115.8580, 'radius': 0.5, 'dense': True, 'priority': 9},
-        
-        # Fremantle Area
-        {'name': 'Fremantle', 'lat': -32.0569, 'lng': 115.7439, 'radius': 2, 'dense': True, 'priority': 10},
-        {'name': 'Fremantle Port', 'lat': -32.0480, 'lng': 115.7380, 'radius': 1, 'dense': True, 'priority': 8},
-        {'name': 'South Fremantle', 'lat': -32.0720, 'lng': 115.7500, 'radius': 1, 'dense': True, 'priority': 7},
-        
-        # Southern Suburbs
-        {'name': 'Armadale', 'lat': -32.1530, 'lng': 116.0150, 'radius': 2, 'dense': True, 'priority': 8},
-        {'name': 'Rockingham', 'lat': -32.2771, 'lng': 115.7299, 'radius': 2, 'dense': True, 'priority': 8},
-        {'name': 'Success', 'lat': -32.1447, 'lng': 115.8483, 'radius': 1.5, 'dense': True, 'priority': 7},
-        
-        # Inner Suburbs
-        {'name': 'Cannington', 'lat': -32.0162, 'lng': 115.9350, 'radius': 1.5, 'dense': True, 'priority': 8},
-        
-        # Northern Suburbs
-        {'name': 'Midland', 'lat': -31.8890, 'lng': 116.0060, 'radius': 2, 'dense': True, 'priority': 8},
-        {'name': 'Girrawheen', 'lat': -31.8380, 'lng': 115.8380, 'radius': 1.5, 'dense': True, 'priority': 7},
-        {'name': 'Heathridge', 'lat': -31.7620, 'lng': 115.7620, 'radius': 1.5, 'dense': True, 'priority': 7},
-    ]
+    PERTH_ZONES = SCAN_ZONES
     
     def __init__(self):
         self.grid_points: List[GridPoint] = []
@@ -52,14 +31,15 @@ class PerthGrid:
     
     def _generate_grid(self):
         for zone in self.PERTH_ZONES:
-            zone_id = zone['name'].lower().replace(' ', '_')
+            zone_id = zone_id_for_name(zone['name'])
             self.grid_points.append(GridPoint(
                 lat=zone['lat'],
                 lng=zone['lng'],
                 zone_id=zone_id,
                 zone_name=zone['name'],
                 is_dense=zone['dense'],
-                priority=zone['priority']
+                priority=zone['priority'],
+                zone_idx=ZONE_REGISTRY.id_of(zone_id)
             ))
         
         self.grid_points.sort(key=lambda p: -p.priority)
@@ -68,7 +48,8 @@ class PerthGrid:
                                radius_km: float, spacing_km: float,
                                zone_name: str, is_dense: bool, priority: int) -> List[GridPoint]:
         points = []
-        zone_id = zone_name.lower().replace(' ', '_')
+        zone_id = zone_id_for_name(zone_name)
+        zone_idx = ZONE_REGISTRY.id_of(zone_id)
         
         lat_offset = spacing_km / 111.0
         lng_offset = spacing_km / (111.0 * math.cos(math.radians(center_lat)))
@@ -80,7 +61,7 @@ class PerthGrid:
                 lat = center_lat + (lat_step * lat_offset)
                 lng = center_lng + (lng_step * lng_offset)
                 
-                dist = self._haversine(center_lat, center_lng, lat, lng)
+                dist = haversine_m(center_lat, center_lng, lat, lng) / 1000
                 if dist <= radius_km:
                     points.append(GridPoint(
                         lat=round(lat, 5),
@@ -88,23 +69,12 @@ class PerthGrid:
                         zone_id=zone_id,
                         zone_name=zone_name,
                         is_dense=is_dense,
-                        priority=priority
+                        priority=priority,
+                        zone_idx=zone_idx
                     ))
         
         return points
     
-    def _haversine(self, lat1: float, lng1: float, lat2: float, lng2: float) -> float:
-        R = 6371
-        lat1_rad = math.radians(lat1)
-        lat2_rad = math.radians(lat2)
-        delta_lat = math.radians(lat2 - lat1)
-        delta_lng = math.radians(lng2 - lng1)
-        
-        a = math.sin(delta_lat/2)**2 + math.cos(lat1_rad) * math.cos(lat2_rad) * math.sin(delta_lng/2)**2
-        c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
-        
-        return R * c
-    
     def get_all_points(self) -> List[GridPoint]:
         return self.grid_points
     
@@ -115,11 +85,11 @@ class PerthGrid:
         closest_zone = None
         min_dist = float('inf')
         
-        for zone in self.PERTH_ZONES:
-            dist = self._haversine(lat, lng, zone['lat'], zone['lng'])
+        for profile in ZONE_REGISTRY.scanned():
+            dist = haversine_m(lat, lng, profile.center[0], profile.center[1]) / 1000
             if dist < min_dist:
                 min_dist = dist
-                closest_zone = zone['name'].lower().replace(' ', '_')
+                closest_zone = profile.zone_id
         
         return closest_zone or 'unknown'
     
@@ -0,0 +1,107 @@
+"""
+Intelligence Metrics
+Fixed-bucket histograms rendered in the Prometheus text exposition format.
+An observation is a bisect and three increments with no lock, so timing
+hot paths stays cheap; a scrape racing an update can be off by one sample.
+"""
+
+import threading
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+AGE_BUCKETS = (1, 2, 5, 10, 15, 30, 60, 120, 300, 600)
+CYCLE_BUCKETS = (1, 2, 5, 10, 20, 30, 60, 120, 300)
+
+
+class Histogram:
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Upper bound of the bucket holding the q-th observation (None past the last bucket)"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, n in zip(self.buckets, self.counts):
+            seen += n
+            if seen >= rank:
+                return bound
+        return None
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels: Iterable[Tuple[str, str]]) -> str:
+    pairs = ','.join(f'{k}="{_escape(v)}"' for k, v in labels)
+    return '{' + pairs + '}' if pairs else ''
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._families: Dict[str, Tuple[str, Tuple[float, ...], Dict[tuple, Histogram]]] = {}
+        self._lock = threading.Lock()
+
+    def histogram(self, name: str, help_text: str, buckets: Sequence[float] = LATENCY_BUCKETS,
+                  **labels) -> Histogram:
+        """Get or create the histogram for name + labels; callers keep the handle for the hot path"""
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            family = self._families.get(name)
+            if family is None:
+                family = self._families[name] = (help_text, tuple(buckets), {})
+            series = family[2]
+            hist = series.get(key)
+            if hist is None:
+                hist = series[key] = Histogram(family[1])
+            return hist
+
+    def render(self, gauges: Optional[List[Tuple[str, str, List[Tuple[dict, float]]]]] = None,
+               counters: Optional[List[Tuple[str, str, List[Tuple[dict, float]]]]] = None) -> str:
+        """
+        Prometheus text format. Gauges and counters are (name, help, [(labels, value)])
+        read at scrape time; counter names get the _total suffix.
+        """
+        lines = []
+        with self._lock:
+            families = [(name, help_text, list(series.items()))
+                        for name, (help_text, _, series) in sorted(self._families.items())]
+
+        for name, help_text, series in families:
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} histogram')
+            for key, hist in series:
+                cumulative = 0
+                for bound, n in zip(hist.buckets, hist.counts):
+                    cumulative += n
+                    lines.append(f'{name}_bucket{_format_labels(key + (("le", _format_value(bound)),))} {cumulative}')
+                lines.append(f'{name}_bucket{_format_labels(key + (("le", "+Inf"),))} {hist.count}')
+                lines.append(f'{name}_sum{_format_labels(key)} {_format_value(hist.sum)}')
+                lines.append(f'{name}_count{_format_labels(key)} {hist.count}')
+
+        typed = [(name, 'gauge', help_text, samples) for name, help_text, samples in gauges or []]
+        typed += [(f'{name}_total', 'counter', help_text, samples) for name, help_text, samples in counters or []]
+        for name, kind, help_text, samples in typed:
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            for labels, value in samples:
+                lines.append(f'{name}{_format_labels(sorted(labels.items()))} {_format_value(value)}')
+
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,360 @@
+"""
+Intelligence Persistence
+Write-behind writers that take rows off the scan thread and store them in
+batches: observations with bulk fingerprint upserts, and zone transition
+events with hourly zone_flow_aggregates rollups via INSERT ... ON CONFLICT,
+so historical flow queries read rollups instead of replaying raw events.
+"""
+
+import queue
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+
+def _import_models():
+    try:
+        import models
+    except ImportError:
+        from uber import models
+    return models
+
+
+def _dialect_insert(db):
+    """(insert, least) for the bound database; Postgres in deployment, SQLite accepted for local runs"""
+    from sqlalchemy import func
+    if db.engine.dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+        return insert, func.least
+    from sqlalchemy.dialects.sqlite import insert
+    return insert, func.min
+
+
+def _upsert_flow_aggregates(db, table, rows: List[dict]):
+    """Add rollup rows onto existing hourly aggregates, weighting travel time by driver count"""
+    from sqlalchemy import case
+    insert, _ = _dialect_insert(db)
+
+    stmt = insert(table).values(rows)
+    excluded = stmt.excluded
+    existing = table.__table__.c
+    avg_travel = case(
+        (excluded.avg_travel_time_sec.is_(None), existing.avg_travel_time_sec),
+        (existing.avg_travel_time_sec.is_(None), excluded.avg_travel_time_sec),
+        else_=(existing.avg_travel_time_sec * existing.driver_count
+               + excluded.avg_travel_time_sec * excluded.driver_count)
+        / (existing.driver_count + excluded.driver_count),
+    )
+    return stmt.on_conflict_do_update(
+        index_elements=['source_zone_id', 'target_zone_id', 'hour'],
+        set_={
+            'driver_count': existing.driver_count + excluded.driver_count,
+            'avg_travel_time_sec': avg_travel,
+            'uberx_count': existing.uberx_count + excluded.uberx_count,
+            'xl_count': existing.xl_count + excluded.xl_count,
+            'black_count': existing.black_count + excluded.black_count,
+        },
+    )
+
+
+def _upsert_fingerprints(db, table, rows: List[dict]):
+    """Insert new fingerprints; for known ones move last-seen fields and add this batch's sightings"""
+    insert, least = _dialect_insert(db)
+
+    stmt = insert(table).values(rows)
+    excluded = stmt.excluded
+    existing = table.__table__.c
+    return stmt.on_conflict_do_update(
+        index_elements=['fingerprint_id'],
+        set_={
+            'last_seen_lat': excluded.last_seen_lat,
+            'last_seen_lng': excluded.last_seen_lng,
+            'last_bearing': excluded.last_bearing,
+            'last_seen_at': excluded.last_seen_at,
+            'primary_zone': excluded.primary_zone,
+            'observation_count': existing.observation_count + excluded.observation_count,
+            'confidence_score': least(0.99, existing.confidence_score + 0.02 * excluded.observation_count),
+        },
+    )
+
+
+def build_hourly_rollups(events: List[dict]) -> List[dict]:
+    """Aggregate flow events into one row per (source, target, hour)"""
+    groups: Dict[Tuple[str, str, datetime], dict] = {}
+    travel: Dict[Tuple[str, str, datetime], List[float]] = defaultdict(list)
+
+    for event in events:
+        hour = event['timestamp'].replace(minute=0, second=0, microsecond=0)
+        key = (event['source_zone'], event['target_zone'], hour)
+        row = groups.get(key)
+        if row is None:
+            row = groups[key] = {
+                'source_zone_id': key[0], 'target_zone_id': key[1], 'hour': hour,
+                'driver_count': 0, 'avg_travel_time_sec': None,
+                'uberx_count': 0, 'xl_count': 0, 'black_count': 0,
+            }
+        row['driver_count'] += 1
+        vehicle_type = (event.get('vehicle_type') or '').lower()
+        if vehicle_type in ('uberx', 'xl', 'black'):
+            row[f'{vehicle_type}_count'] += 1
+        if event.get('travel_time_sec') is not None:
+            travel[key].append(event['travel_time_sec'])
+
+    for key, times in travel.items():
+        groups[key]['avg_travel_time_sec'] = sum(times) / len(times)
+    return list(groups.values())
+
+
+def _event_row(event: dict) -> dict:
+    completed_at = event['timestamp']
+    travel_time = event.get('travel_time_sec')
+    return {
+        'fingerprint_id': event['fingerprint_id'],
+        'source_zone_id': event['source_zone'],
+        'target_zone_id': event['target_zone'],
+        'vehicle_type': event['vehicle_type'],
+        'travel_time_sec': travel_time,
+        'distance_m': event.get('distance_m'),
+        'avg_speed_ms': event.get('avg_speed_ms'),
+        'heading_deg': event.get('heading_deg'),
+        'started_at': completed_at - timedelta(seconds=travel_time) if travel_time else completed_at,
+        'completed_at': completed_at,
+    }
+
+
+def build_fingerprint_rows(observations: List[dict]) -> List[dict]:
+    """One row per fingerprint: first sighting for the insert, latest for last-seen, count for the increment"""
+    grouped: Dict[str, List[dict]] = {}
+    for obs in observations:
+        grouped.setdefault(obs['fingerprint_id'], []).append(obs)
+
+    rows = []
+    for fingerprint_id, sightings in grouped.items():
+        first, last = sightings[0], sightings[-1]
+        rows.append({
+            'fingerprint_id': fingerprint_id,
+            'vehicle_type': first['vehicle_type'],
+            'first_seen_lat': first['lat'],
+            'first_seen_lng': first['lng'],
+            'last_seen_lat': last['lat'],
+            'last_seen_lng': last['lng'],
+            'last_bearing': last.get('bearing'),
+            'avg_speed': 0,
+            'observation_count': len(sightings),
+            'confidence_score': min(0.99, first['confidence'] + 0.02 * (len(sightings) - 1)),
+            'primary_zone': last['zone_id'],
+            'first_seen_at': first['timestamp'],
+            'last_seen_at': last['timestamp'],
+            'is_active': True,
+        })
+    return rows
+
+
+def _observation_row(obs: dict) -> dict:
+    return {
+        'scan_batch_id': obs['batch_id'],
+        'lat': obs['lat'],
+        'lng': obs['lng'],
+        'bearing': obs.get('bearing'),
+        'vehicle_type': obs['vehicle_type'],
+        'zone_id': obs['zone_id'],
+        'fingerprint_id': obs['fingerprint_id'],
+        'confidence': obs['confidence'],
+        'observed_at': obs['timestamp'],
+    }
+
+
+class _BatchWriter:
+    """
+    Rows are queued by the scan thread and written by a background thread in
+    batches of up to BATCH_SIZE or every FLUSH_INTERVAL_SEC. A failed batch is
+    retried with backoff while the queue absorbs new rows; once the queue is
+    full new rows are shed and counted rather than stalling the scan.
+    """
+    BATCH_SIZE = 500
+    FLUSH_INTERVAL_SEC = 5
+    MAX_QUEUE = 20000
+    MAX_RETRIES = 3
+    RETRY_DELAY_SEC = 2
+    LOG_TAG = 'Writer'
+
+    def __init__(self, flask_app):
+        self.flask_app = flask_app
+        self._queue: queue.Queue = queue.Queue(maxsize=self.MAX_QUEUE)
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._stats = {
+            'written': 0,
+            'batches': 0,
+            'dropped': 0,
+            'retries': 0,
+            'failed': 0,
+            'peak_queued': 0,
+            'last_flush_ms': 0.0,
+        }
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10):
+        """Stop the writer after flushing whatever is still queued"""
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=timeout)
+            self._thread = None
+
+    def _put(self, item: Any):
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            self._stats['dropped'] += 1
+            return
+        queued = self._queue.qsize()
+        if queued > self._stats['peak_queued']:
+            self._stats['peak_queued'] = queued
+
+    def _take_batch(self, timeout: float) -> List[Any]:
+        batch = []
+        deadline = time.monotonic() + timeout
+        while len(batch) < self.BATCH_SIZE:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            batch = self._take_batch(self.FLUSH_INTERVAL_SEC)
+            for attempt in range(self.MAX_RETRIES + 1):
+                if not batch or self.write_batch(batch):
+                    break
+                if attempt == self.MAX_RETRIES or self._stop_event.is_set():
+                    self._stats['failed'] += len(batch)
+                    break
+                self._stats['retries'] += 1
+                self._stop_event.wait(self.RETRY_DELAY_SEC * (attempt + 1))
+
+        while True:
+            batch = self._take_batch(0)
+            if not batch:
+                break
+            if not self.write_batch(batch):
+                self._stats['failed'] += len(batch)
+
+    def write_batch(self, batch: List[Any]) -> bool:
+        models = _import_models()
+        start = time.perf_counter()
+        with self.flask_app.app_context():
+            try:
+                self._write(models, batch)
+                models.db.session.commit()
+            except Exception as e:
+                models.db.session.rollback()
+                print(f"[{self.LOG_TAG}] Failed to write batch of {len(batch)}: {e}", flush=True)
+                return False
+
+        self._stats['last_flush_ms'] = round((time.perf_counter() - start) * 1000, 1)
+        self._stats['written'] += len(batch)
+        self._stats['batches'] += 1
+        return True
+
+    def _write(self, models, batch: List[Any]):
+        raise NotImplementedError
+
+    def get_stats(self) -> dict:
+        return {**self._stats, 'queued': self._queue.qsize()}
+
+
+class FlowEventWriter(_BatchWriter):
+    LOG_TAG = 'FlowWriter'
+
+    def submit(self, event: dict):
+        """Queue a flow event whose 'timestamp' is a wall-clock datetime"""
+        self._put(event)
+
+    def _write(self, models, events: List[dict]):
+        db = models.db
+        db.session.execute(models.DriverFlowEvent.__table__.insert(), [_event_row(e) for e in events])
+        db.session.execute(_upsert_flow_aggregates(db, models.ZoneFlowAggregate, build_hourly_rollups(events)))
+
+
+class ObservationWriter(_BatchWriter):
+    """Observations and scan batch lifecycle, written in arrival order"""
+    LOG_TAG = 'ObservationWriter'
+    BATCH_SIZE = 1000
+    FLUSH_INTERVAL_SEC = 2
+    MAX_QUEUE = 50000
+
+    def submit(self, observation: dict):
+        """Queue an observation dict as emitted by the daemon (wall-clock 'timestamp', 'batch_id')"""
+        self._put(('observation', observation))
+
+    def complete_batch(self, batch_id: str, unique_drivers: int):
+        self._put(('complete', {'batch_id': batch_id, 'completed_at': datetime.now(),
+                                'unique_drivers': unique_drivers}))
+
+    def _write(self, models, items: List[Tuple[str, dict]]):
+        db = models.db
+        insert, _ = _dialect_insert(db)
+        observations = [payload for kind, payload in items if kind == 'observation']
+        completions = [payload for kind, payload in items if kind == 'complete']
+
+        if observations:
+            started = {}
+            for obs in observations:
+                started.setdefault(obs['batch_id'], obs['timestamp'])
+            db.session.execute(insert(models.ScanBatch).values([
+                {'batch_id': batch_id, 'started_at': started_at, 'status': 'running'}
+                for batch_id, started_at in started.items()
+            ]).on_conflict_do_nothing(index_elements=['batch_id']))
+
+            db.session.execute(_upsert_fingerprints(db, models.DriverFingerprint,
+                                                    build_fingerprint_rows(observations)))
+            db.session.execute(models.DriverObservation.__table__.insert(),
+                               [_observation_row(obs) for obs in observations])
+
+        for completion in completions:
+            stmt = insert(models.ScanBatch).values(started_at=completion['completed_at'], status='completed',
+                                                   **completion)
+            db.session.execute(stmt.on_conflict_do_update(
+                index_elements=['batch_id'],
+                set_={'completed_at': stmt.excluded.completed_at,
+                      'unique_drivers': stmt.excluded.unique_drivers,
+                      'status': 'completed'},
+            ))
+
+
+def query_flow_aggregates(since: datetime, source_zone: Optional[str] = None,
+                          target_zone: Optional[str] = None) -> List[dict]:
+    """Per (source, target) totals from hourly rollups since the hour containing since; needs an app context"""
+    from sqlalchemy import case, func
+    models = _import_models()
+    db, ZoneFlowAggregate = models.db, models.ZoneFlowAggregate
+
+    timed = case((ZoneFlowAggregate.avg_travel_time_sec.is_(None), 0), else_=ZoneFlowAggregate.driver_count)
+    total = func.sum(ZoneFlowAggregate.driver_count)
+    avg_travel = (func.sum(func.coalesce(ZoneFlowAggregate.avg_travel_time_sec, 0) * ZoneFlowAggregate.driver_count)
+                  / func.nullif(func.sum(timed), 0))
+
+    query = db.session.query(ZoneFlowAggregate.source_zone_id, ZoneFlowAggregate.target_zone_id, total, avg_travel)
+    query = query.filter(ZoneFlowAggregate.hour >= since.replace(minute=0, second=0, microsecond=0))
+    if source_zone:
+        query = query.filter(ZoneFlowAggregate.source_zone_id == source_zone)
+    if target_zone:
+        query = query.filter(ZoneFlowAggregate.target_zone_id == target_zone)
+    query = query.group_by(ZoneFlowAggregate.source_zone_id, ZoneFlowAggregate.target_zone_id)
+
+    return [{
+        'source_zone': source,
+        'target_zone': target,
+        'driver_count': int(count or 0),
+        'avg_travel_time_sec': round(float(travel), 1) if travel is not None else None,
+    } for source, target, count, travel in query.order_by(total.desc()).all()]
@@ -0,0 +1,129 @@
+"""
+Pipeline Stages
+Bounded queues with a worker thread each, so the scan loop hands work off
+instead of waiting on it. Each stage reports depth, throughput and handler
+time so a slow consumer shows up as a growing queue rather than a slower scan.
+"""
+
+import queue
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Optional
+
+_STOP = object()
+
+
+class RateMeter:
+    """Events per second over a sliding window"""
+    WINDOW_SEC = 60
+
+    def __init__(self):
+        self._times: deque = deque()
+        self._lock = threading.Lock()
+
+    def mark(self, now: Optional[float] = None):
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self._times.append(now)
+            self._trim(now)
+
+    def _trim(self, now: float):
+        cutoff = now - self.WINDOW_SEC
+        while self._times and self._times[0] < cutoff:
+            self._times.popleft()
+
+    def rate(self) -> float:
+        now = time.monotonic()
+        with self._lock:
+            self._trim(now)
+            return len(self._times) / self.WINDOW_SEC
+
+
+class Stage:
+    """
+    Items are handled in order by one worker. With block=True a full queue
+    makes put() wait (work that must not be lost); with block=False the item
+    is dropped and counted (best-effort work such as notifications). Items
+    offered after stop() are dropped either way, so a late producer never
+    blocks on a queue nobody drains.
+    """
+
+    def __init__(self, name: str, handler: Callable[[Any], None], maxsize: int, block: bool = True,
+                 on_error: Optional[Callable[[Exception], None]] = None):
+        self.name = name
+        self.handler = handler
+        self.block = block
+        self.on_error = on_error
+        self._queue: queue.Queue = queue.Queue(maxsize=maxsize)
+        self._thread: Optional[threading.Thread] = None
+        self._meter = RateMeter()
+        self._processed = 0
+        self._dropped = 0
+        self._errors = 0
+        self._peak_queued = 0
+        self._busy_sec = 0.0
+        self._last_ms = 0.0
+
+    @property
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.is_running:
+            return
+        self._thread = threading.Thread(target=self._run, name=f'stage-{self.name}', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 30):
+        """Handle everything already queued, then stop the worker"""
+        if not self._thread:
+            return
+        self._queue.put(_STOP)
+        self._thread.join(timeout=timeout)
+        self._thread = None
+
+    def put(self, item: Any) -> bool:
+        if self.block and self.is_running:
+            self._queue.put(item)
+        else:
+            try:
+                self._queue.put_nowait(item)
+            except queue.Full:
+                self._dropped += 1
+                return False
+        queued = self._queue.qsize()
+        if queued > self._peak_queued:
+            self._peak_queued = queued
+        return True
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+            start = time.perf_counter()
+            try:
+                self.handler(item)
+            except Exception as e:
+                self._errors += 1
+                print(f"[Pipeline] {self.name} stage error: {e}", flush=True)
+                if self.on_error:
+                    self.on_error(e)
+            elapsed = time.perf_counter() - start
+            self._busy_sec += elapsed
+            self._last_ms = elapsed * 1000
+            self._processed += 1
+            self._meter.mark()
+
+    def get_stats(self) -> dict:
+        return {
+            'queued': self._queue.qsize(),
+            'peak_queued': self._peak_queued,
+            'processed': self._processed,
+            'per_sec': round(self._meter.rate(), 2),
+            'dropped': self._dropped,
+            'errors': self._errors,
+            'avg_ms': round(self._busy_sec * 1000 / self._processed, 2) if self._processed else 0.0,
+            'last_ms': round(self._last_ms, 2),
+        }
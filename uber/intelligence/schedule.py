@@ -0,0 +1,171 @@
+"""
+Adaptive Scan Schedule
+Tracks how much each zone's driver count moves between visits and backs off
+zones that hold steady (overnight suburbs, quiet hours) so a cycle only
+polls the zones that are due. A cycle never polls more points than the
+fixed round-robin and keeps its pacing and pause, so the upstream request
+rate can only fall below the fixed schedule's, never exceed it. Savings are
+measured against the calls the fixed schedule would have made in the same
+wall time, not by counting skipped points.
+"""
+
+import threading
+from collections import deque
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Set, Tuple
+
+from .dedup import DriverDeduplicator
+from .grid import GridPoint
+
+
+@dataclass
+class ZoneSchedule:
+    change_rate: float = 1.0
+    interval_sec: float = 0.0
+    last_visit: Optional[float] = None
+
+    def is_due(self, now: float, horizon: float = 0.0) -> bool:
+        """Due if waiting for the next plan, horizon seconds away, would overrun the interval"""
+        return self.last_visit is None or now + horizon - self.last_visit >= self.interval_sec
+
+
+class AdaptiveScheduler:
+    CHANGE_ALPHA = 0.3
+    STABLE_CHANGE_RATE = 0.15
+    COUNT_SCALE = 5
+
+    MIN_INTERVAL_SEC = 10
+    MAX_INTERVAL_SEC = 40
+    # A slowed zone's worst gap between visits is its interval plus one cycle
+    # (plan() looks a cycle and the pause ahead), which has to stay inside the
+    # deduplicator's active TTL or its drivers start to decay
+    TRACK_TTL_SEC = DriverDeduplicator.ACTIVE_TTL_SECONDS
+    TTL_MARGIN_SEC = 5
+
+    def __init__(self, polls_per_point: int = 1, pause_sec: float = 0.0):
+        self.polls_per_point = polls_per_point
+        self.pause_sec = pause_sec
+        self._zones: Dict[str, ZoneSchedule] = {}
+        self._last_counts: Dict[Tuple[float, float], int] = {}
+        self._observed_zones: Set[str] = set()
+        self._lock = threading.Lock()
+        self._calls: deque = deque()
+        self._started_at: Optional[float] = None
+        self._last_cycle_end: Optional[float] = None
+        self._cycles = 0
+        self._total_points = 0
+        self._last_visited = 0
+        self._last_skipped = 0
+        self._sec_per_point: Optional[float] = None
+        self._last_cycle_sec: Optional[float] = None
+
+    def _zone(self, zone_id: str) -> ZoneSchedule:
+        zone = self._zones.get(zone_id)
+        if zone is None:
+            zone = self._zones[zone_id] = ZoneSchedule()
+        return zone
+
+    def plan(self, points: List[GridPoint], now: float) -> List[GridPoint]:
+        """Points of the zones due this cycle, in their original order; empty plans leave the stats alone"""
+        with self._lock:
+            if self._started_at is None:
+                self._started_at = now
+            horizon = self._full_cycle_sec(len(points)) + self.pause_sec
+            due = [p for p in points if self._zone(p.zone_id).is_due(now, horizon)]
+
+            self._total_points = len(points)
+            if due:
+                self._last_visited = len(due)
+                self._last_skipped = len(points) - len(due)
+        return due
+
+    def observe(self, point: GridPoint, driver_count: int, now: float):
+        """Record a completed visit; the zone is re-paced once the cycle ends"""
+        key = (point.lat, point.lng)
+        with self._lock:
+            zone = self._zone(point.zone_id)
+            previous = self._last_counts.get(key)
+            self._last_counts[key] = driver_count
+
+            if previous is not None:
+                change = abs(driver_count - previous) / max(previous, self.COUNT_SCALE)
+                zone.change_rate += self.CHANGE_ALPHA * (change - zone.change_rate)
+            zone.last_visit = now
+            self._observed_zones.add(point.zone_id)
+
+    def _full_cycle_sec(self, total_points: int) -> float:
+        return self._sec_per_point * total_points if self._sec_per_point is not None else 0.0
+
+    def _interval_cap(self) -> float:
+        """Longest interval whose worst-case gap stays inside the track TTL; 0 when no slowing is safe"""
+        cap = min(self.MAX_INTERVAL_SEC,
+                  self.TRACK_TTL_SEC - self.TTL_MARGIN_SEC - self._full_cycle_sec(self._total_points))
+        return cap if cap >= self.MIN_INTERVAL_SEC else 0.0
+
+    def record_cycle(self, cycle_sec: float, now: float):
+        """Close a cycle: re-pace each zone visited in it and log the calls it made"""
+        with self._lock:
+            if self._last_visited:
+                per_point = cycle_sec / self._last_visited
+                if self._sec_per_point is None:
+                    self._sec_per_point = per_point
+                else:
+                    self._sec_per_point += 0.2 * (per_point - self._sec_per_point)
+
+            cap = self._interval_cap()
+            for zone_id in self._observed_zones:
+                zone = self._zones[zone_id]
+                if zone.change_rate < self.STABLE_CHANGE_RATE and cap:
+                    zone.interval_sec = min(max(zone.interval_sec * 2, self.MIN_INTERVAL_SEC), cap)
+                else:
+                    zone.interval_sec = 0.0
+            self._observed_zones.clear()
+
+            self._cycles += 1
+            self._last_cycle_sec = cycle_sec
+            self._last_cycle_end = now
+            self._calls.append((now, self._last_visited * self.polls_per_point))
+            cutoff = now - 3600
+            while self._calls and self._calls[0][0] < cutoff:
+                self._calls.popleft()
+
+    def _calls_saved(self) -> Tuple[Optional[float], float]:
+        """(calls the fixed schedule would have made minus calls made, seconds covered) over the last hour"""
+        if self._sec_per_point is None or self._last_cycle_end is None:
+            return None, 0.0
+        elapsed = min(self._last_cycle_end - self._started_at, 3600)
+        fixed_cycle_sec = self._full_cycle_sec(self._total_points) + self.pause_sec
+        if elapsed <= 0 or fixed_cycle_sec <= 0:
+            return None, 0.0
+        fixed_calls = elapsed / fixed_cycle_sec * self._total_points * self.polls_per_point
+        cutoff = self._last_cycle_end - 3600
+        made = sum(calls for t, calls in self._calls if t >= cutoff)
+        return max(fixed_calls - made, 0.0), elapsed
+
+    def get_stats(self, now: float) -> dict:
+        with self._lock:
+            saved_last_hour, elapsed = self._calls_saved()
+
+            full_cycle_sec = None
+            reduction_sec = None
+            if self._sec_per_point is not None and self._last_cycle_sec is not None:
+                full_cycle_sec = round(self._sec_per_point * self._total_points, 1)
+                reduction_sec = round(max(full_cycle_sec - self._last_cycle_sec, 0.0), 1)
+
+            return {
+                'mode': 'adaptive',
+                'cycles': self._cycles,
+                'points_per_fixed_cycle': self._total_points,
+                'last_cycle_points': self._last_visited,
+                'last_cycle_skipped': self._last_skipped,
+                'zones_slowed': sum(1 for z in self._zones.values() if z.interval_sec > 0),
+                'max_interval_sec': self._interval_cap(),
+                'estimated_full_cycle_sec': full_cycle_sec,
+                'cycle_time_reduction_sec': reduction_sec,
+                'cycle_time_reduction_pct': round(reduction_sec / full_cycle_sec * 100, 1)
+                if reduction_sec is not None and full_cycle_sec else None,
+                'calls_saved_last_hour': round(saved_last_hour) if saved_last_hour is not None else None,
+                'calls_saved_per_hour': round(saved_last_hour * 3600 / elapsed)
+                if saved_last_hour is not None and elapsed >= 60 else None,
+                'zone_intervals_sec': {zone_id: z.interval_sec for zone_id, z in self._zones.items()},
+            }
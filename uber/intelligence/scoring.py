@@ -0,0 +1,160 @@
+"""
+Vectorized Match Scoring
+Scores a whole coordinate batch against its candidate tracks in one NumPy pass.
+Mirrors DriverDeduplicator._calculate_match_score term for term, so the
+batched and per-pair paths produce the same scores (within float rounding).
+"""
+
+from typing import List, Sequence
+
+import numpy as np
+
+from .geo import bearing_deg_np, haversine_m_np
+
+
+class TrackArrays:
+    """Column view of the candidate tracks for one batch"""
+
+    def __init__(self, drivers: Sequence):
+        n = len(drivers)
+        self.has_pos = np.zeros(n, dtype=bool)
+        self.n_pos = np.zeros(n, dtype=np.int64)
+        self.last_lat = np.zeros(n)
+        self.last_lng = np.zeros(n)
+        self.last_ts = np.zeros(n)
+        self.prev_lat = np.zeros(n)
+        self.prev_lng = np.zeros(n)
+        self.vel_lat = np.zeros(n)
+        self.vel_lng = np.zeros(n)
+        self.speed = np.zeros(n)
+        self.last_bearing = np.full(n, np.nan)
+        self.last_eta = np.full(n, np.nan)
+
+        for j, driver in enumerate(drivers):
+            positions = driver.positions
+            self.speed[j] = driver.last_speed_ms
+            self.vel_lat[j] = driver.velocity_lat
+            self.vel_lng[j] = driver.velocity_lng
+            if driver.last_bearing is not None:
+                self.last_bearing[j] = driver.last_bearing
+            if driver.last_eta is not None:
+                self.last_eta[j] = driver.last_eta
+            if not positions:
+                continue
+
+            self.has_pos[j] = True
+            self.n_pos[j] = len(positions)
+            lat, lng, ts = positions[-1]
+            self.last_lat[j] = lat
+            self.last_lng[j] = lng
+            self.last_ts[j] = ts
+            if len(positions) >= 2:
+                self.prev_lat[j] = positions[-2][0]
+                self.prev_lng[j] = positions[-2][1]
+
+        self.expected_bearing = bearing_deg_np(self.prev_lat, self.prev_lng, self.last_lat, self.last_lng)
+
+
+class SightingArrays:
+    """Column view of one coordinate batch"""
+
+    def __init__(self, sightings: Sequence, thresholds_m: Sequence[float],
+                 zone_speeds: Sequence[float]):
+        self.lat = np.array([s.lat for s in sightings], dtype=float)
+        self.lng = np.array([s.lng for s in sightings], dtype=float)
+        self.ts = np.array([s.timestamp for s in sightings], dtype=float)
+        self.bearing = np.array([np.nan if s.bearing is None else s.bearing for s in sightings], dtype=float)
+        self.eta = np.array([np.nan if s.eta_seconds is None else s.eta_seconds for s in sightings], dtype=float)
+        self.threshold = np.asarray(thresholds_m, dtype=float)
+        self.zone_speed = np.asarray(zone_speeds, dtype=float)
+
+
+def score_pairs(sightings: List, drivers: List, rows, cols,
+                thresholds_m: Sequence[float], zone_speeds: Sequence[float],
+                weights: dict, active_ttl: float, missing_ttl: float) -> np.ndarray:
+    """Return the match score of each (sightings[rows[k]], drivers[cols[k]]) pair"""
+    rows = np.asarray(rows, dtype=np.int64)
+    cols = np.asarray(cols, dtype=np.int64)
+    if not len(rows):
+        return np.zeros(0)
+
+    s = SightingArrays(sightings, thresholds_m, zone_speeds)
+    t = TrackArrays(drivers)
+
+    s_lat = s.lat[rows]
+    s_lng = s.lng[rows]
+    last_lat = t.last_lat[cols]
+    last_lng = t.last_lng[cols]
+    speed = t.speed[cols]
+    has_two = t.n_pos[cols] >= 2
+
+    time_diff = s.ts[rows] - t.last_ts[cols]
+    valid = (time_diff >= 0) & t.has_pos[cols]
+
+    speed_allowance = speed * time_diff * 1.5
+    max_distance = np.minimum(np.maximum(s.threshold[rows] + speed_allowance, 200), 600)
+
+    dt = np.minimum(time_diff, 60)
+    pred_lat = last_lat + t.vel_lat[cols] * dt
+    pred_lng = last_lng + t.vel_lng[cols] * dt
+    distance_to_pred = haversine_m_np(pred_lat, pred_lng, s_lat, s_lng)
+    distance_to_last = haversine_m_np(last_lat, last_lng, s_lat, s_lng)
+
+    use_predicted = has_two & (speed > 2)
+    distance_m = np.where(use_predicted, distance_to_pred, distance_to_last)
+    valid &= ~(distance_m > max_distance * 2.0)
+
+    distance_score = np.maximum(0, 1 - (distance_m / np.maximum(max_distance, 1)))
+
+    bearing_diff = np.abs(s.bearing[rows] - t.last_bearing[cols])
+    bearing_diff = np.minimum(bearing_diff, 360 - bearing_diff)
+    bearing_score = np.where(np.isnan(bearing_diff), 1.0, np.maximum(0, 1 - (bearing_diff / 120)))
+
+    moving = (time_diff > 0) & has_two
+    with np.errstate(divide='ignore', invalid='ignore'):
+        observed_speed = distance_to_last / time_diff
+    speed_diff = np.abs(observed_speed - speed)
+    max_speed_diff = s.zone_speed[rows] * 0.5
+    speed_score = np.where(moving & (speed > 0), np.maximum(0, 1 - (speed_diff / max_speed_diff)), 1.0)
+
+    actual_bearing = bearing_deg_np(last_lat, last_lng, s_lat, s_lng)
+    heading_diff = np.abs(t.expected_bearing[cols] - actual_bearing)
+    heading_diff = np.minimum(heading_diff, 360 - heading_diff)
+    trajectory_score = np.where(
+        speed < 2,
+        np.maximum(0.6, 1 - (heading_diff / 180)),
+        np.maximum(0.3, 1 - (heading_diff / 120))
+    )
+    trajectory_score = np.where(moving, trajectory_score, 1.0)
+
+    eta_diff = np.abs(s.eta[rows] - t.last_eta[cols])
+    eta_tolerance = time_diff * 1.5 + 30
+    eta_score = np.where(np.isnan(eta_diff), 1.0, np.maximum(0, 1 - (eta_diff / np.maximum(eta_tolerance, 1))))
+
+    decay = (time_diff - active_ttl) / missing_ttl
+    time_penalty = np.where(time_diff > active_ttl, np.maximum(0.3, 1 - decay * 0.5), 1.0)
+
+    total_score = (
+        weights['distance'] * distance_score +
+        weights['bearing'] * bearing_score +
+        weights['speed'] * speed_score +
+        weights['trajectory'] * trajectory_score +
+        weights['eta'] * eta_score +
+        weights['time_penalty'] * time_penalty
+    )
+
+    return np.where(valid, total_score, 0.0)
+
+
+def score_matrix(sightings: List, drivers: List, thresholds_m: Sequence[float],
+                 zone_speeds: Sequence[float], weights: dict,
+                 active_ttl: float, missing_ttl: float) -> np.ndarray:
+    """Return an (len(sightings), len(drivers)) matrix of match scores"""
+    n_rows, n_cols = len(sightings), len(drivers)
+    if not n_rows or not n_cols:
+        return np.zeros((n_rows, n_cols))
+
+    rows, cols = np.divmod(np.arange(n_rows * n_cols), n_cols)
+    scores = score_pairs(sightings, drivers, rows, cols, thresholds_m, zone_speeds,
+                         weights, active_ttl, missing_ttl)
+    return scores.reshape(n_rows, n_cols)
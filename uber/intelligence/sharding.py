@@ -0,0 +1,498 @@
+"""
+Sharded Deduplication
+Tracks partitioned by region, one DriverDeduplicator per worker process, so
+per-cycle matching runs on as many cores as there are regions. A track seen
+near a foreign region's scan zones is handed to that shard as a MISSING guest;
+whichever shard matches it next becomes its owner and the previous owner drops it.
+Handoffs go out when a track enters reach, changes owner, or its guest copy is
+about to age out of the recent-match horizon, and guests are refreshed in place.
+"""
+
+import itertools
+import multiprocessing
+import threading
+from collections import defaultdict
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from . import clock
+from .dedup import DriverDeduplicator, DriverSighting, TrackState, TrackedDriver, build_zone_window_features
+from .geo import haversine_m
+from .trackstore import FLAG_DEDUP
+from .zones import REGIONS, SCAN_ZONES, ZONE_REGISTRY
+
+CountsSnapshot = Tuple[int, Dict[str, int], Dict[str, Dict[str, int]]]
+
+_GUEST_FIELDS = ('last_bearing', 'bearing_count', 'confidence', 'first_seen', 'last_seen', 'zone_id',
+                 'observation_count', 'velocity_lat', 'velocity_lng', 'last_eta', 'last_speed_ms',
+                 'smoothed_speed_ms', 'smoothed_heading')
+
+
+class ShardDeduplicator(DriverDeduplicator):
+    """Deduplicator for one region, exporting tracks that come within reach of another region"""
+    HANDOFF_RADIUS_M = DriverDeduplicator.MAX_SPEED_MS * 90
+    GUEST_REFRESH_SECONDS = DriverDeduplicator.RECENT_MATCH_HORIZON_SECONDS / 2
+
+    def __init__(self, region: str, clock: Callable[[], float] = clock.now, store=None):
+        super().__init__(clock=clock, store=store)
+        self.region = region
+        self._borders = [
+            (zone['region'], zone['lat'], zone['lng'], zone['radius'] * 1000 + self.HANDOFF_RADIUS_M)
+            for zone in SCAN_ZONES if zone['region'] != region
+        ]
+        self._guests: Set[str] = set()
+        self._handoffs: List[Dict] = []
+        self._exported: Dict[str, Tuple[Set[str], float]] = {}
+
+    def _border_regions(self, lat: float, lng: float) -> List[str]:
+        targets = []
+        for region, zone_lat, zone_lng, reach_m in self._borders:
+            if region in targets or abs(lat - zone_lat) * 111000 > reach_m:
+                continue
+            if haversine_m(lat, lng, zone_lat, zone_lng) <= reach_m:
+                targets.append(region)
+        return targets
+
+    def _update_cross_grid_cache(self, driver: TrackedDriver):
+        super()._update_cross_grid_cache(driver)
+        if driver.fingerprint_id in self._guests or not driver.positions:
+            return
+
+        fid = driver.fingerprint_id
+        lat, lng, ts = driver.positions[-1]
+        targets = self._border_regions(lat, lng)
+        if not targets:
+            self._exported.pop(fid, None)
+            return
+
+        exported = self._exported.get(fid)
+        if exported is None or ts - exported[1] >= self.GUEST_REFRESH_SECONDS:
+            send = targets
+            self._exported[fid] = (set(targets), ts)
+        else:
+            send = [region for region in targets if region not in exported[0]]
+            exported[0].update(send)
+        if send:
+            self._handoffs.append(self._export(driver, send))
+
+    def _update_driver(self, driver: TrackedDriver, sighting: DriverSighting):
+        self._guests.discard(driver.fingerprint_id)
+        super()._update_driver(driver, sighting)
+
+    def _export(self, driver: TrackedDriver, targets: List[str]) -> Dict:
+        return {
+            'targets': targets,
+            'fingerprint_id': driver.fingerprint_id,
+            'vehicle_type': driver.vehicle_type,
+            'positions': list(driver.positions[-2:]),
+            'last_bearing': driver.last_bearing,
+            'bearing_count': driver.bearing_count,
+            'confidence': driver.confidence,
+            'first_seen': driver.first_seen,
+            'last_seen': driver.last_seen,
+            'zone_id': driver.zone_id,
+            'observation_count': driver.observation_count,
+            'velocity_lat': driver.velocity_lat,
+            'velocity_lng': driver.velocity_lng,
+            'last_eta': driver.last_eta,
+            'last_speed_ms': driver.last_speed_ms,
+            'smoothed_speed_ms': driver.smoothed_speed_ms,
+            'smoothed_heading': driver.smoothed_heading,
+        }
+
+    def take_handoffs(self) -> List[Dict]:
+        handoffs, self._handoffs = self._handoffs, []
+        if len(self._exported) > 2 * len(self.tracked_drivers) + 100:
+            self._exported = {fid: entry for fid, entry in self._exported.items() if fid in self.tracked_drivers}
+        return handoffs
+
+    def adopt(self, record: Dict):
+        """Import a neighbour's track as a MISSING guest; it is only counted once matched here"""
+        fid = record['fingerprint_id']
+        current = self.tracked_drivers.get(fid)
+        if current is not None:
+            if fid in self._guests and current.last_seen < record['last_seen']:
+                self._refresh_guest(current, record)
+            return
+        self.drop(fid)
+
+        zone_idx = ZONE_REGISTRY.id_of(record['zone_id'])
+        track = self.store.acquire(fid)
+        for lat, lng, ts in record['positions']:
+            self.store.append(track, lat, lng, ts, record['last_bearing'], zone_idx, FLAG_DEDUP)
+
+        driver = TrackedDriver(
+            fingerprint_id=fid,
+            vehicle_type=record['vehicle_type'],
+            track=track,
+            last_bearing=record['last_bearing'],
+            bearing_count=record['bearing_count'],
+            confidence=record['confidence'],
+            first_seen=record['first_seen'],
+            last_seen=record['last_seen'],
+            zone_id=record['zone_id'],
+            observation_count=record['observation_count'],
+            state=TrackState.MISSING,
+            missing_since=self._clock(),
+            velocity_lat=record['velocity_lat'],
+            velocity_lng=record['velocity_lng'],
+            last_eta=record['last_eta'],
+            last_speed_ms=record['last_speed_ms'],
+            smoothed_speed_ms=record['smoothed_speed_ms'],
+            smoothed_heading=record['smoothed_heading'],
+        )
+        lat, lng, _ = record['positions'][-1]
+        driver.grid_cell = self.spatial_grid.add_driver(fid, driver.vehicle_type, lat, lng)
+        self.tracked_drivers[fid] = driver
+        self._guests.add(fid)
+        self._schedule_state_deadline(driver)
+        self._update_cross_grid_cache(driver)
+
+    def _refresh_guest(self, driver: TrackedDriver, record: Dict):
+        """Bring a guest up to its owner's latest state without giving up its store slot or grid entry"""
+        zone_idx = ZONE_REGISTRY.id_of(record['zone_id'])
+        last_ts = driver.positions[-1][2] if driver.positions else float('-inf')
+        for lat, lng, ts in record['positions']:
+            if ts > last_ts:
+                self.store.append(driver.track, lat, lng, ts, record['last_bearing'], zone_idx, FLAG_DEDUP)
+        for name in _GUEST_FIELDS:
+            setattr(driver, name, record[name])
+        driver.missing_since = self._clock()
+
+        lat, lng, _ = record['positions'][-1]
+        driver.grid_cell = self.spatial_grid.update_driver(driver.fingerprint_id, driver.vehicle_type,
+                                                           driver.grid_cell, lat, lng)
+        self._schedule_state_deadline(driver)
+        super()._update_cross_grid_cache(driver)
+
+    def drop(self, fingerprint_id: str):
+        """Forget a track that another shard now owns, without counting it as expired"""
+        self._guests.discard(fingerprint_id)
+        self._exported.pop(fingerprint_id, None)
+        driver = self.tracked_drivers.pop(fingerprint_id, None)
+        if driver is not None:
+            self.spatial_grid.remove_driver(fingerprint_id, driver.vehicle_type, driver.grid_cell)
+            self._refresh_counts(driver)
+            self.store.release(driver.track)
+        else:
+            entry = self.dead_archive.pop(fingerprint_id)
+            if entry is not None:
+                self.store.release(entry.value.track)
+        self.cross_grid_cache.pop(fingerprint_id)
+        self._driver_zone_entry.pop(fingerprint_id, None)
+
+    def reset(self):
+        super().reset()
+        self._guests.clear()
+        self._handoffs.clear()
+        self._exported.clear()
+
+    def get_window_state(self) -> Tuple[Dict[str, Dict], Dict[str, int]]:
+        return self._zone_flow_tracking, self._window_start_counts
+
+    def get_counts_snapshot(self) -> CountsSnapshot:
+        return (self._active_count, dict(self._type_counts),
+                {zone: dict(counts) for zone, counts in self._zone_type_counts.items()})
+
+
+def _shard_main(conn, region: str):
+    """Worker process: apply releases and handoffs, run the request, reply with counts"""
+    now = [clock.now()]
+    dedup = ShardDeduplicator(region, clock=lambda: now[0])
+
+    while True:
+        try:
+            message = conn.recv()
+        except (EOFError, KeyboardInterrupt):
+            break
+        if message[0] == 'stop':
+            break
+
+        kind, ticket, now[0], releases, handoffs, payload = message
+        for fid in releases:
+            dedup.drop(fid)
+        for record in handoffs:
+            dedup.adopt(record)
+
+        result, error = None, None
+        try:
+            if kind == 'batch':
+                rows, is_dense = payload
+                result = dedup.process_batch([DriverSighting(*row) for row in rows], is_dense)
+            elif kind == 'call':
+                method, args = payload
+                result = getattr(dedup, method)(*args)
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            print(f"[Shard] {region} failed on {kind}: {error}", flush=True)
+
+        conn.send((ticket, result, error, dedup.take_handoffs(), dedup.get_counts_snapshot()))
+
+    conn.close()
+
+
+class _Shard:
+    __slots__ = ('region', 'process', 'conn', 'in_flight', 'releases', 'handoffs', 'counts')
+
+    def __init__(self, region: str, process, conn):
+        self.region = region
+        self.process = process
+        self.conn = conn
+        self.in_flight = 0
+        self.releases: List[str] = []
+        self.handoffs: List[Dict] = []
+        self.counts: CountsSnapshot = (0, {'UberX': 0, 'Comfort': 0, 'XL': 0, 'Black': 0}, {})
+
+
+class ShardedDeduplicator:
+    """
+    Drop-in for DriverDeduplicator that routes each coordinate batch to the shard
+    owning its zone's region. Batches can be submitted ahead and collected later,
+    so shards in different regions match in parallel.
+    """
+    REGIONS = REGIONS
+    START_METHOD = 'spawn'
+    OWNER_TTL_SECONDS = (DriverDeduplicator.ACTIVE_TTL_SECONDS + DriverDeduplicator.MISSING_TTL_SECONDS
+                         + DriverDeduplicator.DEAD_ARCHIVE_MINUTES * 60)
+    OWNER_PRUNE_EVERY = 500
+
+    def __init__(self, regions: Tuple[str, ...] = REGIONS, clock: Callable[[], float] = clock.now):
+        self.regions = tuple(regions)
+        self._clock = clock
+        self._shard_of = {region: i for i, region in enumerate(self.regions)}
+        self._shards: List[_Shard] = []
+        self._lock = threading.RLock()
+        self._tickets = itertools.count()
+        self._ticket_shard: Dict[int, int] = {}
+        self._replies: Dict[int, Tuple[int, Any, Optional[str]]] = {}
+        self._discard: Set[int] = set()
+        self._owner: Dict[str, Tuple[int, float]] = {}
+        self._batches_since_prune = 0
+        self._stats = {'handoffs': 0, 'ownership_changes': 0}
+
+    def _ensure_started(self):
+        if self._shards:
+            return
+        ctx = multiprocessing.get_context(self.START_METHOD)
+        for region in self.regions:
+            parent_conn, child_conn = ctx.Pipe()
+            process = ctx.Process(target=_shard_main, args=(child_conn, region),
+                                  name=f"dedup-shard-{region}", daemon=True)
+            process.start()
+            child_conn.close()
+            self._shards.append(_Shard(region, process, parent_conn))
+        print(f"[Shard] Started {len(self._shards)} dedup shards: {', '.join(self.regions)}", flush=True)
+
+    def close(self):
+        with self._lock:
+            for shard in self._shards:
+                try:
+                    shard.conn.send(('stop',))
+                except (OSError, BrokenPipeError):
+                    pass
+            for shard in self._shards:
+                shard.process.join(timeout=5)
+                if shard.process.is_alive():
+                    shard.process.terminate()
+                shard.conn.close()
+            self._shards = []
+            self._ticket_shard.clear()
+            self._replies.clear()
+            self._discard.clear()
+            self._owner.clear()
+
+    def shard_for_zone(self, zone_idx: int) -> int:
+        return self._shard_of.get(ZONE_REGISTRY.profiles[zone_idx].region, 0)
+
+    def _send(self, index: int, kind: str, payload) -> int:
+        self._ensure_started()
+        shard = self._shards[index]
+        ticket = next(self._tickets)
+        releases, shard.releases = shard.releases, []
+        handoffs, shard.handoffs = shard.handoffs, []
+        shard.conn.send((kind, ticket, self._clock(), releases, handoffs, payload))
+        shard.in_flight += 1
+        self._ticket_shard[ticket] = index
+        return ticket
+
+    def _receive(self, index: int):
+        shard = self._shards[index]
+        ticket, result, error, handoffs, counts = shard.conn.recv()
+        shard.in_flight -= 1
+        shard.counts = counts
+
+        for record in handoffs:
+            self._stats['handoffs'] += 1
+            for region in record['targets']:
+                target = self._shard_of.get(region)
+                if target is not None:
+                    self._shards[target].handoffs.append(record)
+
+        del self._ticket_shard[ticket]
+        if ticket in self._discard:
+            self._discard.discard(ticket)
+            return
+        self._replies[ticket] = (index, result, error)
+
+    def _claim(self, index: int, results: List[Tuple[str, float, bool]]):
+        """Record which shard matched each fingerprint; the previous owner is told to drop it"""
+        now = self._clock()
+        for fid, _, _ in results:
+            previous = self._owner.get(fid)
+            if previous is not None and previous[0] != index:
+                self._shards[previous[0]].releases.append(fid)
+                self._stats['ownership_changes'] += 1
+            self._owner[fid] = (index, now)
+
+        self._batches_since_prune += 1
+        if self._batches_since_prune >= self.OWNER_PRUNE_EVERY:
+            self._batches_since_prune = 0
+            cutoff = now - self.OWNER_TTL_SECONDS
+            self._owner = {fid: entry for fid, entry in self._owner.items() if entry[1] >= cutoff}
+
+    def submit_batch(self, sightings: List[DriverSighting], is_dense: bool = False) -> Optional[int]:
+        if not sightings:
+            return None
+        rows = [(s.lat, s.lng, s.bearing, s.vehicle_type, s.timestamp, s.zone_id, s.eta_seconds, s.confidence)
+                for s in sightings]
+        with self._lock:
+            return self._send(self.shard_for_zone(sightings[0].zone_idx), 'batch', (rows, is_dense))
+
+    def ready(self, ticket: Optional[int]) -> bool:
+        with self._lock:
+            if ticket is None or ticket in self._replies:
+                return True
+            shard = self._shards[self._ticket_shard[ticket]]
+            while ticket not in self._replies and shard.conn.poll():
+                self._receive(self._ticket_shard[ticket])
+            return ticket in self._replies
+
+    def collect(self, ticket: Optional[int]) -> List[Tuple[str, float, bool]]:
+        if ticket is None:
+            return []
+        with self._lock:
+            while ticket not in self._replies:
+                self._receive(self._ticket_shard[ticket])
+            index, results, error = self._replies.pop(ticket)
+            if error:
+                raise RuntimeError(f"dedup shard {self._shards[index].region}: {error}")
+            self._claim(index, results)
+            return results
+
+    def process_batch(self, sightings: List[DriverSighting], is_dense: bool = False) -> List[Tuple[str, float, bool]]:
+        return self.collect(self.submit_batch(sightings, is_dense))
+
+    def process_observation(self, sighting: DriverSighting, is_dense: bool = False) -> Tuple[str, float, bool]:
+        return self.process_batch([sighting], is_dense)[0]
+
+    def _sync(self):
+        """Deliver queued releases and handoffs, then wait for every shard to answer"""
+        with self._lock:
+            self._ensure_started()
+            for index, shard in enumerate(self._shards):
+                if shard.releases or shard.handoffs:
+                    self._discard.add(self._send(index, 'sync', None))
+            for index, shard in enumerate(self._shards):
+                while shard.in_flight:
+                    self._receive(index)
+
+    def _call_all(self, method: str, *args) -> List[Any]:
+        with self._lock:
+            self._ensure_started()
+            tickets = [self._send(index, 'call', (method, args)) for index in range(len(self._shards))]
+            results = []
+            for ticket in tickets:
+                while ticket not in self._replies:
+                    self._receive(self._ticket_shard[ticket])
+                index, result, error = self._replies.pop(ticket)
+                if error:
+                    raise RuntimeError(f"dedup shard {self._shards[index].region}: {error}")
+                results.append(result)
+            return results
+
+    def get_driver_count(self) -> int:
+        self._sync()
+        return sum(shard.counts[0] for shard in self._shards)
+
+    def get_counts_by_type(self) -> Dict[str, int]:
+        self._sync()
+        merged = {'UberX': 0, 'Comfort': 0, 'XL': 0, 'Black': 0}
+        for shard in self._shards:
+            for ptype, count in shard.counts[1].items():
+                merged[ptype] = merged.get(ptype, 0) + count
+        return merged
+
+    def get_counts_by_zone(self) -> Dict[str, Dict[str, int]]:
+        self._sync()
+        merged: Dict[str, Dict[str, int]] = {}
+        for shard in self._shards:
+            for zone, counts in shard.counts[2].items():
+                zone_counts = merged.setdefault(zone, {'UberX': 0, 'Comfort': 0, 'XL': 0, 'Black': 0})
+                for ptype, count in counts.items():
+                    zone_counts[ptype] = zone_counts.get(ptype, 0) + count
+        return {zone: counts for zone, counts in merged.items() if any(counts.values())}
+
+    def get_recent_drivers(self, minutes: int = 10) -> List[Dict]:
+        self._sync()
+        return [driver for shard_drivers in self._call_all('get_recent_drivers', minutes)
+                for driver in shard_drivers]
+
+    def start_window(self):
+        self._sync()
+        self._call_all('start_window')
+
+    def reset(self):
+        with self._lock:
+            self._sync()
+            for shard in self._shards:
+                shard.releases.clear()
+                shard.handoffs.clear()
+            self._call_all('reset')
+            self._owner.clear()
+            self._stats = {'handoffs': 0, 'ownership_changes': 0}
+
+    def get_zone_window_features(self, window_minutes: float = 15.0) -> Dict[str, Dict]:
+        """Merge raw per-shard flow tracking first so demand is normalised across all regions"""
+        zone_counts = self.get_counts_by_zone()
+        flow_tracking: Dict[str, Dict] = {}
+        start_counts: Dict[str, int] = defaultdict(int)
+
+        for shard_tracking, shard_start_counts in self._call_all('get_window_state'):
+            for zone_id, count in shard_start_counts.items():
+                start_counts[zone_id] += count
+            for zone_id, tracking in shard_tracking.items():
+                merged = flow_tracking.get(zone_id)
+                if merged is None:
+                    flow_tracking[zone_id] = tracking
+                    continue
+                for key, value in tracking.items():
+                    merged[key] = merged[key] + value
+
+        return build_zone_window_features(flow_tracking, dict(start_counts), zone_counts, window_minutes)
+
+    def get_stats(self) -> Dict:
+        self._sync()
+        shard_stats = self._call_all('get_stats')
+        active = sum(s['active'] for s in shard_stats)
+
+        matching_stats: Dict[str, int] = defaultdict(int)
+        for s in shard_stats:
+            for key, value in s['matching_stats'].items():
+                matching_stats[key] += value
+
+        return {
+            'total': active,
+            'active': active,
+            'missing': sum(s['missing'] for s in shard_stats),
+            'archived': sum(s['archived'] for s in shard_stats),
+            'cross_grid_cache': sum(s['cross_grid_cache'] for s in shard_stats),
+            'avg_confidence': sum(s['avg_confidence'] * s['active'] for s in shard_stats) / active if active else 0,
+            'high_confidence': sum(s['high_confidence'] for s in shard_stats),
+            'avg_observations': sum(s['avg_observations'] * s['active'] for s in shard_stats) / active if active else 0,
+            'by_type': self.get_counts_by_type(),
+            'matching_stats': dict(matching_stats),
+            'shards': {
+                'regions': list(self.regions),
+                'owned_fingerprints': len(self._owner),
+                **self._stats,
+            },
+        }
@@ -0,0 +1,180 @@
+"""
+Ground-Truth Traffic Simulator
+Virtual vehicles drive street-lattice routes between the PERTH_GRID zones and are
+polled the way IntelligenceDaemon._run_cycle polls them: one fetch per grid point,
+only vehicles inside the zone's visibility radius, with dropped samples, GPS jitter
+and bearing noise. Every sighting carries the id of the vehicle that produced it.
+"""
+
+import math
+import random
+from dataclasses import dataclass, field
+from typing import Iterator, List, Optional, Tuple
+
+from .dedup import DriverSighting
+from .grid import PERTH_GRID, GridPoint
+from .zones import ZONE_REGISTRY
+
+METERS_PER_DEG_LAT = 111000
+ORIGIN_LAT, ORIGIN_LNG = -31.9505, 115.8605
+VEHICLE_TYPES = ['UberX', 'UberX', 'UberX', 'Comfort', 'XL', 'Black']
+
+
+@dataclass
+class SimVehicle:
+    vehicle_id: int
+    vehicle_type: str
+    home: GridPoint
+    x: float
+    y: float
+    speed_factor: float
+    route: List[Tuple[float, float]] = field(default_factory=list)
+    heading: float = 0.0
+    dwell_until: float = 0.0
+    offline_until: float = 0.0
+
+
+class TrafficSimulator:
+    """Vehicles on a square street lattice; positions are metres east/north of the CBD"""
+    BLOCK_M = 200
+    MAX_LEG_BLOCKS = 6
+    TRIP_RADIUS_M = 1500
+    AWAY_TRIP_PROBABILITY = 0.15
+    MAX_DWELL_SEC = 120
+
+    FETCH_SECONDS = 1.5
+    CYCLE_PAUSE_SEC = 3
+
+    MISS_PROBABILITY = 0.1
+    NO_BEARING_PROBABILITY = 0.05
+    POSITION_NOISE_M = 8
+    BEARING_NOISE_DEG = 6
+    OFFLINE_RATE_PER_HOUR = 0.5
+    OFFLINE_MINUTES = (2, 20)
+
+    def __init__(self, n_vehicles: int, start: float = 1000.0, seed: int = 7,
+                 grid_points: Optional[List[GridPoint]] = None):
+        self.rng = random.Random(seed)
+        self.now = start
+        self.grid_points = list(grid_points or PERTH_GRID.get_all_points())
+        self._cos = math.cos(math.radians(ORIGIN_LAT))
+
+        weights = [p.priority for p in self.grid_points]
+        self.vehicles: List[SimVehicle] = []
+        for vehicle_id in range(n_vehicles):
+            home = self.rng.choices(self.grid_points, weights)[0]
+            x, y = self._snap(*self._near(home))
+            vehicle = SimVehicle(vehicle_id, self.rng.choice(VEHICLE_TYPES), home, x, y,
+                                 speed_factor=self.rng.uniform(0.5, 1.0))
+            self._plan_trip(vehicle)
+            self.vehicles.append(vehicle)
+
+    def _to_xy(self, lat: float, lng: float) -> Tuple[float, float]:
+        return ((lng - ORIGIN_LNG) * METERS_PER_DEG_LAT * self._cos,
+                (lat - ORIGIN_LAT) * METERS_PER_DEG_LAT)
+
+    def _to_lat_lng(self, x: float, y: float) -> Tuple[float, float]:
+        return (ORIGIN_LAT + y / METERS_PER_DEG_LAT,
+                ORIGIN_LNG + x / (METERS_PER_DEG_LAT * self._cos))
+
+    def _snap(self, x: float, y: float) -> Tuple[float, float]:
+        return (round(x / self.BLOCK_M) * self.BLOCK_M, round(y / self.BLOCK_M) * self.BLOCK_M)
+
+    def _near(self, point: GridPoint) -> Tuple[float, float]:
+        cx, cy = self._to_xy(point.lat, point.lng)
+        r = self.TRIP_RADIUS_M * math.sqrt(self.rng.random())
+        theta = self.rng.random() * 2 * math.pi
+        return cx + r * math.cos(theta), cy + r * math.sin(theta)
+
+    def _plan_trip(self, vehicle: SimVehicle):
+        """Staircase route along lattice streets to a point near home or, sometimes, another zone"""
+        if self.rng.random() < self.AWAY_TRIP_PROBABILITY:
+            destination = self.rng.choice(self.grid_points)
+        else:
+            destination = vehicle.home
+        tx, ty = self._snap(*self._near(destination))
+
+        x, y = vehicle.x, vehicle.y
+        route = []
+        while (x, y) != (tx, ty):
+            axes = [axis for axis, remaining in (('x', tx - x), ('y', ty - y)) if remaining]
+            axis = self.rng.choice(axes)
+            leg = self.BLOCK_M * self.rng.randint(1, self.MAX_LEG_BLOCKS)
+            if axis == 'x':
+                x += max(-leg, min(leg, tx - x))
+            else:
+                y += max(-leg, min(leg, ty - y))
+            route.append((x, y))
+        vehicle.route = route
+
+    def _zone_speed(self, vehicle: SimVehicle) -> float:
+        lat, lng = self._to_lat_lng(vehicle.x, vehicle.y)
+        nearest = min(self.grid_points, key=lambda p: (p.lat - lat) ** 2 + (p.lng - lng) ** 2)
+        return ZONE_REGISTRY.speed_ms[nearest.zone_idx]
+
+    def _move(self, vehicle: SimVehicle, dt: float):
+        if vehicle.dwell_until > self.now:
+            return
+        remaining = self._zone_speed(vehicle) * vehicle.speed_factor * dt
+
+        while remaining > 0:
+            if not vehicle.route:
+                vehicle.dwell_until = self.now + self.rng.uniform(0, self.MAX_DWELL_SEC)
+                self._plan_trip(vehicle)
+                return
+            wx, wy = vehicle.route[0]
+            dx, dy = wx - vehicle.x, wy - vehicle.y
+            dist = math.hypot(dx, dy)
+            if dist > 0:
+                vehicle.heading = math.degrees(math.atan2(dx, dy)) % 360
+            if dist <= remaining:
+                vehicle.x, vehicle.y = wx, wy
+                vehicle.route.pop(0)
+                remaining -= dist
+            else:
+                vehicle.x += dx / dist * remaining
+                vehicle.y += dy / dist * remaining
+                remaining = 0
+
+    def advance(self, dt: float):
+        self.now += dt
+        go_offline = self.OFFLINE_RATE_PER_HOUR * dt / 3600
+        for vehicle in self.vehicles:
+            if vehicle.offline_until > self.now:
+                continue
+            if self.rng.random() < go_offline:
+                vehicle.offline_until = self.now + 60 * self.rng.uniform(*self.OFFLINE_MINUTES)
+                continue
+            self._move(vehicle, dt)
+
+    def poll(self, point: GridPoint) -> Tuple[List[DriverSighting], List[int]]:
+        """Sightings one fetch at point would return, with the true vehicle id of each"""
+        px, py = self._to_xy(point.lat, point.lng)
+        visibility_m = ZONE_REGISTRY.profiles[point.zone_idx].visibility_km * 1000
+
+        sightings, truth = [], []
+        for vehicle in self.vehicles:
+            if vehicle.offline_until > self.now:
+                continue
+            if math.hypot(vehicle.x - px, vehicle.y - py) > visibility_m:
+                continue
+            if self.rng.random() < self.MISS_PROBABILITY:
+                continue
+            lat, lng = self._to_lat_lng(vehicle.x + self.rng.gauss(0, self.POSITION_NOISE_M),
+                                        vehicle.y + self.rng.gauss(0, self.POSITION_NOISE_M))
+            bearing = None
+            if self.rng.random() >= self.NO_BEARING_PROBABILITY:
+                bearing = (vehicle.heading + self.rng.gauss(0, self.BEARING_NOISE_DEG)) % 360
+            sightings.append(DriverSighting(lat=lat, lng=lng, bearing=bearing,
+                                            vehicle_type=vehicle.vehicle_type,
+                                            timestamp=self.now, zone_id=point.zone_id))
+            truth.append(vehicle.vehicle_id)
+        return sightings, truth
+
+    def cycle(self) -> Iterator[Tuple[GridPoint, List[DriverSighting], List[int]]]:
+        """One daemon cycle: every grid point fetched in turn, then the cycle pause"""
+        for point in self.grid_points:
+            self.advance(self.FETCH_SECONDS)
+            sightings, truth = self.poll(point)
+            yield point, sightings, truth
+        self.advance(self.CYCLE_PAUSE_SEC)
@@ -0,0 +1,117 @@
+"""
+Timed Spatial Index
+Keyed entries bucketed by (vehicle type, cell) and expired from a time-ordered heap.
+Backs the cross-grid cache and the dead-track archive, which are both queried as
+"same vehicle type within X metres" and trimmed by age.
+"""
+
+import heapq
+import math
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Set, Tuple
+
+METERS_PER_DEG_LAT = 111000
+
+
+class TimedEntry(NamedTuple):
+    vehicle_type: str
+    lat: float
+    lng: float
+    timestamp: float
+    value: Any
+    cell: Tuple[int, int]
+
+
+class TimedSpatialIndex:
+    def __init__(self, cell_size_m: float = 250):
+        self.cell_size_m = cell_size_m
+        self._entries: Dict[str, TimedEntry] = {}
+        self._buckets: Dict[Tuple[str, int, int], Set[str]] = {}
+        self._heap: List[Tuple[float, int, str]] = []
+        self._seq = 0
+        self._row_cos: Dict[int, float] = {}
+
+    def _cos_for_row(self, row: int) -> float:
+        cos = self._row_cos.get(row)
+        if cos is None:
+            center_lat = (row + 0.5) * self.cell_size_m / METERS_PER_DEG_LAT
+            cos = max(math.cos(math.radians(center_lat)), 0.01)
+            self._row_cos[row] = cos
+        return cos
+
+    def _cell(self, lat: float, lng: float) -> Tuple[int, int]:
+        row = math.floor(lat * METERS_PER_DEG_LAT / self.cell_size_m)
+        col = math.floor(lng * METERS_PER_DEG_LAT * self._cos_for_row(row) / self.cell_size_m)
+        return (row, col)
+
+    def put(self, key: str, vehicle_type: str, lat: float, lng: float,
+            timestamp: float, value: Any = None):
+        self.pop(key)
+        cell = self._cell(lat, lng)
+        self._entries[key] = TimedEntry(vehicle_type, lat, lng, timestamp, value, cell)
+        self._buckets.setdefault((vehicle_type, cell[0], cell[1]), set()).add(key)
+        self._seq += 1
+        heapq.heappush(self._heap, (timestamp, self._seq, key))
+
+    def get(self, key: str) -> Optional[TimedEntry]:
+        return self._entries.get(key)
+
+    def pop(self, key: str, default: Any = None) -> Optional[TimedEntry]:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return default
+        bucket_key = (entry.vehicle_type, entry.cell[0], entry.cell[1])
+        bucket = self._buckets.get(bucket_key)
+        if bucket is not None:
+            bucket.discard(key)
+            if not bucket:
+                del self._buckets[bucket_key]
+        return entry
+
+    def expire_before(self, cutoff: float) -> List[Tuple[str, TimedEntry]]:
+        """Drop entries whose timestamp is older than cutoff; returns what was dropped"""
+        expired = []
+        while self._heap and self._heap[0][0] < cutoff:
+            ts, _, key = heapq.heappop(self._heap)
+            entry = self._entries.get(key)
+            if entry is not None and entry.timestamp == ts:
+                expired.append((key, self.pop(key)))
+        if len(self._heap) > 4 * len(self._entries) + 64:
+            self._compact()
+        return expired
+
+    def _compact(self):
+        self._heap = [(e.timestamp, i, k) for i, (k, e) in enumerate(self._entries.items())]
+        heapq.heapify(self._heap)
+        self._seq = len(self._heap)
+
+    def query(self, vehicle_type: str, lat: float, lng: float,
+              radius_m: float) -> Iterator[Tuple[str, TimedEntry]]:
+        """Entries of vehicle_type whose cell may lie within radius_m (callers check exact distance)"""
+        dlat = radius_m / METERS_PER_DEG_LAT
+        first_row, _ = self._cell(lat - dlat, lng)
+        last_row, _ = self._cell(lat + dlat, lng)
+
+        for row in range(first_row, last_row + 1):
+            scale = METERS_PER_DEG_LAT * self._cos_for_row(row) / self.cell_size_m
+            dlng = radius_m / (METERS_PER_DEG_LAT * self._cos_for_row(row))
+            for col in range(math.floor((lng - dlng) * scale) - 1, math.floor((lng + dlng) * scale) + 2):
+                bucket = self._buckets.get((vehicle_type, row, col))
+                if not bucket:
+                    continue
+                for key in bucket:
+                    yield key, self._entries[key]
+
+    def clear(self):
+        self._entries.clear()
+        self._buckets.clear()
+        self._heap.clear()
+        self._row_cos.clear()
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def items(self) -> Iterator[Tuple[str, TimedEntry]]:
+        return iter(list(self._entries.items()))
@@ -0,0 +1,218 @@
+"""
+Shared Track Store
+Fixed-capacity ring buffers of observed points per fingerprint, kept in flat arrays.
+DriverDeduplicator and TrajectoryAnalyzer hold refcounted handles into the same store:
+a point seen by both is written once and flagged for each reader.
+"""
+
+import math
+from array import array
+from typing import Callable, Dict, List, Optional
+
+from .zones import ZONE_REGISTRY
+
+FLAG_DEDUP = 1
+FLAG_TRAJECTORY = 2
+
+
+class TrackHandle:
+    __slots__ = ('store', 'key', 'slot', 'count', 'refs', 'live')
+
+    def __init__(self, store: 'TrackStore', key: str, slot: int):
+        self.store = store
+        self.key = key
+        self.slot = slot
+        self.count = 0
+        self.refs = 1
+        self.live = [0, 0, 0]
+
+
+class TrackView:
+    """Read-only sequence of one reader's points in a track, oldest first"""
+    __slots__ = ('handle', 'flag', 'limit', 'make')
+
+    def __init__(self, handle: Optional[TrackHandle], flag: int, limit: int, make: Callable):
+        self.handle = handle
+        self.flag = flag
+        self.limit = limit
+        self.make = make
+
+    def __len__(self) -> int:
+        handle = self.handle
+        if handle is None or handle.slot < 0:
+            return 0
+        return min(self.limit, handle.live[self.flag])
+
+    def _index_from_end(self, k: int) -> int:
+        """Array index of the k-th newest point carrying this view's flag (k >= 1)"""
+        handle = self.handle
+        store = handle.store
+        cap = store.capacity
+        base = handle.slot * cap
+        flags = store.flags
+        for n in range(handle.count - 1, max(handle.count - cap, 0) - 1, -1):
+            idx = base + n % cap
+            if flags[idx] & self.flag:
+                k -= 1
+                if k == 0:
+                    return idx
+        raise IndexError('track view index out of range')
+
+    def _indices(self) -> List[int]:
+        size = len(self)
+        handle = self.handle
+        store = handle.store if handle else None
+        out = []
+        if not size:
+            return out
+        cap = store.capacity
+        base = handle.slot * cap
+        flags = store.flags
+        for n in range(handle.count - 1, max(handle.count - cap, 0) - 1, -1):
+            idx = base + n % cap
+            if flags[idx] & self.flag:
+                out.append(idx)
+                if len(out) == size:
+                    break
+        out.reverse()
+        return out
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self.make(self.handle.store, idx) for idx in self._indices()[i]]
+        size = len(self)
+        if i < 0:
+            i += size
+        if not 0 <= i < size:
+            raise IndexError('track view index out of range')
+        return self.make(self.handle.store, self._index_from_end(size - i))
+
+    def __iter__(self):
+        store = self.handle.store if self.handle else None
+        for idx in self._indices():
+            yield self.make(store, idx)
+
+
+class TrackStore:
+    CAPACITY = 50
+
+    def __init__(self, capacity: int = CAPACITY, initial_slots: int = 64):
+        self.capacity = capacity
+        self.lat = array('d')
+        self.lng = array('d')
+        self.ts = array('d')
+        self.bearing = array('d')
+        self.zone = array('H')
+        self.flags = array('B')
+        self._n_slots = 0
+        self._free: List[int] = []
+        self._handles: Dict[str, TrackHandle] = {}
+        self._grow(initial_slots)
+
+    def _grow(self, n_new: int):
+        size = n_new * self.capacity
+        for column in (self.lat, self.lng, self.ts, self.bearing):
+            column.extend(array('d', [0.0]) * size)
+        self.zone.extend(array('H', [0]) * size)
+        self.flags.extend(array('B', [0]) * size)
+        self._free.extend(range(self._n_slots + n_new - 1, self._n_slots - 1, -1))
+        self._n_slots += n_new
+
+    def acquire(self, key: str) -> TrackHandle:
+        handle = self._handles.get(key)
+        if handle is not None:
+            handle.refs += 1
+            return handle
+        if not self._free:
+            self._grow(max(self._n_slots, 64))
+        handle = TrackHandle(self, key, self._free.pop())
+        self._handles[key] = handle
+        return handle
+
+    def release(self, handle: Optional[TrackHandle]):
+        if handle is None or handle.slot < 0:
+            return
+        handle.refs -= 1
+        if handle.refs > 0:
+            return
+        base = handle.slot * self.capacity
+        self.flags[base:base + self.capacity] = array('B', [0]) * self.capacity
+        self._free.append(handle.slot)
+        if self._handles.get(handle.key) is handle:
+            del self._handles[handle.key]
+        handle.slot = -1
+        handle.count = 0
+        handle.live = [0, 0, 0]
+
+    def append(self, handle: TrackHandle, lat: float, lng: float, ts: float,
+               bearing: Optional[float], zone_idx: int, flag: int):
+        cap = self.capacity
+        idx = handle.slot * cap + handle.count % cap
+        live = handle.live
+        if handle.count >= cap:
+            old = self.flags[idx]
+            if old & FLAG_DEDUP:
+                live[FLAG_DEDUP] -= 1
+            if old & FLAG_TRAJECTORY:
+                live[FLAG_TRAJECTORY] -= 1
+
+        self.lat[idx] = lat
+        self.lng[idx] = lng
+        self.ts[idx] = ts
+        self.bearing[idx] = math.nan if bearing is None else bearing
+        self.zone[idx] = zone_idx
+        self.flags[idx] = flag
+        handle.count += 1
+        if flag & FLAG_DEDUP:
+            live[FLAG_DEDUP] += 1
+        if flag & FLAG_TRAJECTORY:
+            live[FLAG_TRAJECTORY] += 1
+
+    def flag_last(self, handle: TrackHandle, lat: float, lng: float, ts: float, flag: int) -> bool:
+        """Share the newest point with another reader if it is the same observation"""
+        if not handle.count:
+            return False
+        idx = handle.slot * self.capacity + (handle.count - 1) % self.capacity
+        if self.flags[idx] & flag:
+            return False
+        if self.ts[idx] != ts or self.lat[idx] != lat or self.lng[idx] != lng:
+            return False
+        self.flags[idx] |= flag
+        handle.live[flag] += 1
+        return True
+
+    def position(self, idx: int):
+        return (self.lat[idx], self.lng[idx], self.ts[idx])
+
+    def bearing_at(self, idx: int) -> Optional[float]:
+        bearing = self.bearing[idx]
+        return None if bearing != bearing else bearing
+
+    def zone_at(self, idx: int) -> str:
+        return ZONE_REGISTRY.zone_id(self.zone[idx])
+
+    def points(self, handle: TrackHandle) -> List[int]:
+        """Array indices of every buffered point in the track, oldest first"""
+        if handle.slot < 0:
+            return []
+        base = handle.slot * self.capacity
+        return [base + n % self.capacity for n in range(max(handle.count - self.capacity, 0), handle.count)]
+    
+    def get_stats(self) -> Dict:
+        return {
+            'tracks': len(self._handles),
+            'slots': self._n_slots,
+            'capacity': self.capacity,
+            'bytes': sum(c.itemsize * len(c) for c in (self.lat, self.lng, self.ts,
+                                                         self.bearing, self.zone, self.flags)),
+        }
+
+
+_track_store: Optional[TrackStore] = None
+
+
+def get_track_store() -> TrackStore:
+    global _track_store
+    if _track_store is None:
+        _track_store = TrackStore()
+    return _track_store
@@ -6,11 +6,17 @@ Fixes: Dwell time bug, occupancy from trajectories, EWMA smoothing,
        time-windowed flows, destination confidence gating
 """
 
-import math
-from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Tuple
+import heapq
+from typing import Deque, Dict, List, Optional, Set, Tuple
 from dataclasses import dataclass, field
-from collections import defaultdict
+from collections import Counter, defaultdict, deque
+
+import numpy as np
+
+from . import clock
+from .geo import bearing_deg, bearing_deg_np, haversine_m, haversine_m_np
+from .trackstore import FLAG_TRAJECTORY, TrackHandle, TrackStore, TrackView, get_track_store
+from .zones import ZONE_REGISTRY
 
 
 @dataclass
@@ -18,23 +24,30 @@ class TrackPoint:
     lat: float
     lng: float
     bearing: Optional[float]
-    timestamp: datetime
+    timestamp: float
     zone_id: str
 
 
+def _track_point(store: TrackStore, idx: int) -> TrackPoint:
+    lat, lng, timestamp = store.position(idx)
+    return TrackPoint(lat=lat, lng=lng, bearing=store.bearing_at(idx),
+                      timestamp=timestamp, zone_id=store.zone_at(idx))
+
+
 @dataclass
 class DriverTrajectory:
     fingerprint_id: str
     vehicle_type: str
-    points: List[TrackPoint] = field(default_factory=list)
+    track: Optional[TrackHandle] = None
     current_zone: Optional[str] = None
+    current_zone_idx: Optional[int] = None
     predicted_destination: Optional[str] = None
     predicted_dest_confidence: float = 0.0
     heading_deg: float = 0
     avg_speed_ms: float = 0
-    last_updated: datetime = field(default_factory=datetime.now)
+    last_updated: float = field(default_factory=clock.now)
     
-    zone_entry_time: Optional[datetime] = None
+    zone_entry_time: Optional[float] = None
     total_dwell_time_sec: float = 0
     zones_visited: List[str] = field(default_factory=list)
     
@@ -43,19 +56,31 @@ class DriverTrajectory:
     
     confidence: float = 0.5
     
+    POINT_HISTORY = 50
+    
+    @property
+    def points(self) -> TrackView:
+        return TrackView(self.track, FLAG_TRAJECTORY, self.POINT_HISTORY, _track_point)
+    
     def add_point(self, point: TrackPoint) -> Optional[Tuple[str, float]]:
         old_zone = self.current_zone
         old_zone_dwell = None
         
         if self.current_zone != point.zone_id:
             if self.current_zone and self.zone_entry_time:
-                old_zone_dwell = (point.timestamp - self.zone_entry_time).total_seconds()
+                old_zone_dwell = point.timestamp - self.zone_entry_time
                 self.total_dwell_time_sec += old_zone_dwell
             
             if point.zone_id not in self.zones_visited:
                 self.zones_visited.append(point.zone_id)
         
-        self.points.append(point)
+        if self.current_zone != point.zone_id or self.current_zone_idx is None:
+            self.current_zone_idx = ZONE_REGISTRY.id_of(point.zone_id)
+        
+        store = self.track.store
+        if not store.flag_last(self.track, point.lat, point.lng, point.timestamp, FLAG_TRAJECTORY):
+            store.append(self.track, point.lat, point.lng, point.timestamp, point.bearing,
+                         self.current_zone_idx, FLAG_TRAJECTORY)
         self.last_updated = point.timestamp
         
         if self.current_zone != point.zone_id:
@@ -63,9 +88,6 @@ class DriverTrajectory:
         
         self.current_zone = point.zone_id
         
-        if len(self.points) > 50:
-            self.points = self.points[-50:]
-        
         if len(self.points) >= 2:
             self._compute_velocity()
         
@@ -80,7 +102,7 @@ class DriverTrajectory:
         p1 = self.points[-2]
         p2 = self.points[-1]
         
-        time_diff = (p2.timestamp - p1.timestamp).total_seconds()
+        time_diff = p2.timestamp - p1.timestamp
         if time_diff <= 0:
             return
         
@@ -91,7 +113,7 @@ class DriverTrajectory:
         self.smoothed_speed_ms = alpha * instant_speed + (1 - alpha) * self.smoothed_speed_ms
         self.avg_speed_ms = self.smoothed_speed_ms
         
-        new_heading = calculate_bearing(p1.lat, p1.lng, p2.lat, p2.lng)
+        new_heading = bearing_deg(p1.lat, p1.lng, p2.lat, p2.lng)
         
         heading_diff = new_heading - self.smoothed_heading_deg
         if heading_diff > 180:
@@ -107,7 +129,7 @@ class DriverTrajectory:
     
     def get_current_dwell_time(self) -> float:
         if self.zone_entry_time:
-            return (datetime.now() - self.zone_entry_time).total_seconds()
+            return clock.now() - self.zone_entry_time
         return 0
     
     def has_stable_heading(self, window: int = 3, tolerance_deg: float = 30) -> bool:
@@ -120,7 +142,7 @@ class DriverTrajectory:
                 p1, p2 = self.points[i - 1], self.points[i]
             else:
                 p1, p2 = self.points[i], self.points[i + 1]
-            heading = calculate_bearing(p1.lat, p1.lng, p2.lat, p2.lng)
+            heading = bearing_deg(p1.lat, p1.lng, p2.lat, p2.lng)
             recent_headings.append(heading)
         
         if not recent_headings:
@@ -139,6 +161,51 @@ class DriverTrajectory:
         return True
 
 
+class WindowCounter:
+    """Event count over a sliding window, kept as a fixed ring of time buckets with a running total"""
+    __slots__ = ('bucket_seconds', 'buckets', 'total', '_head')
+    
+    def __init__(self, window_seconds: float = 300, bucket_seconds: float = 10):
+        self.bucket_seconds = bucket_seconds
+        self.buckets = [0] * max(1, int(window_seconds // bucket_seconds))
+        self.total = 0
+        self._head: Optional[int] = None
+    
+    def advance(self, now: float):
+        """Expire buckets that have slid out of the window; at most one pass over the ring"""
+        current = int(now // self.bucket_seconds)
+        head = self._head
+        if head is not None and current <= head:
+            return
+        size = len(self.buckets)
+        if head is None or current - head >= size:
+            self.buckets = [0] * size
+            self.total = 0
+        else:
+            for idx in range(head + 1, current + 1):
+                slot = idx % size
+                self.total -= self.buckets[slot]
+                self.buckets[slot] = 0
+        self._head = current
+    
+    def add(self, timestamp: float, count: int = 1):
+        self.advance(timestamp)
+        idx = int(timestamp // self.bucket_seconds)
+        if self._head - idx >= len(self.buckets):
+            return
+        self.buckets[idx % len(self.buckets)] += count
+        self.total += count
+    
+    def history(self) -> List[Tuple[float, int]]:
+        """(bucket start, count) for non-empty buckets, oldest first"""
+        if self._head is None:
+            return []
+        size = len(self.buckets)
+        return [(idx * self.bucket_seconds, self.buckets[idx % size])
+                for idx in range(self._head - size + 1, self._head + 1)
+                if self.buckets[idx % size]]
+
+
 @dataclass
 class ZoneMetrics:
     zone_id: str
@@ -148,47 +215,53 @@ class ZoneMetrics:
     net_flow: float = 0.0
     avg_dwell_time_sec: float = 0.0
     
-    inflow_history: List[Tuple[datetime, int]] = field(default_factory=list)
-    outflow_history: List[Tuple[datetime, int]] = field(default_factory=list)
-    count_history: List[Tuple[datetime, int]] = field(default_factory=list)
-    dwell_times: List[float] = field(default_factory=list)
+    inflows: WindowCounter = field(default_factory=lambda: WindowCounter(ZoneMetrics.WINDOW_MINUTES * 60))
+    outflows: WindowCounter = field(default_factory=lambda: WindowCounter(ZoneMetrics.WINDOW_MINUTES * 60))
+    dwell_times: Deque[float] = field(default_factory=lambda: deque(maxlen=100))
     
     heat_score: float = 0.0
-    last_updated: datetime = field(default_factory=datetime.now)
+    last_updated: float = field(default_factory=clock.now)
     
-    def update_flow_rates(self, window_minutes: int = 5):
-        now = datetime.now()
-        cutoff = now - timedelta(minutes=window_minutes)
-        
-        recent_inflow = sum(count for ts, count in self.inflow_history if ts >= cutoff)
-        recent_outflow = sum(count for ts, count in self.outflow_history if ts >= cutoff)
+    dirty: bool = True
+    computed_bucket: Optional[int] = None
+    
+    WINDOW_MINUTES = 5
+    DWELL_AVERAGE_COUNT = 50
+    
+    def needs_update(self, now: float) -> bool:
+        """Dirty, or the flow window has slid past a bucket while it still held counts"""
+        if self.dirty:
+            return True
+        if not (self.inflows.total or self.outflows.total):
+            return False
+        return int(now // self.inflows.bucket_seconds) != self.computed_bucket
+    
+    def update_flow_rates(self):
+        now = clock.now()
+        self.inflows.advance(now)
+        self.outflows.advance(now)
         
-        self.inflow_rate = recent_inflow / window_minutes
-        self.outflow_rate = recent_outflow / window_minutes
+        self.inflow_rate = self.inflows.total / self.WINDOW_MINUTES
+        self.outflow_rate = self.outflows.total / self.WINDOW_MINUTES
         self.net_flow = self.inflow_rate - self.outflow_rate
-        
-        if self.dwell_times:
-            recent_dwells = self.dwell_times[-50:]
-            self.avg_dwell_time_sec = sum(recent_dwells) / len(recent_dwells)
-        
-        self._cleanup_old_data(cutoff)
         self.last_updated = now
-    
-    def _cleanup_old_data(self, cutoff: datetime):
-        self.inflow_history = [(ts, c) for ts, c in self.inflow_history if ts >= cutoff]
-        self.outflow_history = [(ts, c) for ts, c in self.outflow_history if ts >= cutoff]
-        self.count_history = [(ts, c) for ts, c in self.count_history if ts >= cutoff]
-        
-        if len(self.dwell_times) > 100:
-            self.dwell_times = self.dwell_times[-100:]
+        self.computed_bucket = int(now // self.inflows.bucket_seconds)
     
     def record_inflow(self, count: int = 1):
-        self.inflow_history.append((datetime.now(), count))
+        self.inflows.add(clock.now(), count)
+        self.dirty = True
     
     def record_outflow(self, count: int = 1, dwell_time: float = 0):
-        self.outflow_history.append((datetime.now(), count))
+        self.outflows.add(clock.now(), count)
+        self.dirty = True
         if dwell_time > 0:
-            self.dwell_times.append(dwell_time)
+            self.add_dwell_time(dwell_time)
+    
+    def add_dwell_time(self, dwell_time: float):
+        self.dirty = True
+        self.dwell_times.append(dwell_time)
+        recent = list(self.dwell_times)[-self.DWELL_AVERAGE_COUNT:]
+        self.avg_dwell_time_sec = sum(recent) / len(recent)
     
     def calculate_heat_score(self, driver_count: int) -> float:
         driver_weight = min(1.0, driver_count / 20)
@@ -203,32 +276,102 @@ class ZoneMetrics:
         return self.heat_score
 
 
-class TrajectoryAnalyzer:
-    ZONE_CENTERS = {
-        'perth_cbd': (-31.9505, 115.8605),
-        'northbridge': (-31.9440, 115.8579),
-        'subiaco': (-31.9490, 115.8270),
-        'fremantle': (-32.0569, 115.7467),
-        'south_fremantle': (-32.0700, 115.7500),
-        'north_fremantle': (-32.0350, 115.7450),
-        'perth_airport': (-31.9403, 115.9670),
-        'scarborough': (-31.8920, 115.7570),
-        'joondalup': (-31.7440, 115.7650),
-        'rockingham': (-32.2920, 115.7290),
-        'armadale': (-32.1540, 116.0150),
-        'midland': (-31.8890, 116.0110),
-        'morley': (-31.8890, 115.9050),
-        'cannington': (-32.0180, 115.9350),
-        'victoria_park': (-31.9760, 115.8970),
-        'south_perth': (-31.9760, 115.8640),
-        'claremont': (-31.9800, 115.7810),
-        'east_perth': (-31.9550, 115.8700),
-        'west_perth': (-31.9480, 115.8430),
-        'leederville': (-31.9360, 115.8410),
-        'cottesloe': (-31.9990, 115.7570),
-        'applecross': (-32.0100, 115.8420),
-    }
+class _FlowBucket:
+    __slots__ = ('pairs', 'targets', 'total')
     
+    def __init__(self):
+        self.pairs: Counter = Counter()
+        self.targets: Counter = Counter()
+        self.total = 0
+
+
+class FlowEventLog:
+    """
+    Zone transition events kept for a retention window, with per-bucket
+    (source, target) and per-target counts so windowed queries read aggregates.
+    Raw events beyond max_events are shed oldest first and counted in dropped;
+    the aggregates keep every flow for the full retention window.
+    """
+    
+    def __init__(self, retention_seconds: float = 3600, max_events: int = 20000, bucket_seconds: float = 60):
+        self.retention_seconds = retention_seconds
+        self.max_events = max_events
+        self.bucket_seconds = bucket_seconds
+        self.events: Deque[dict] = deque()
+        self._buckets: Dict[int, _FlowBucket] = {}
+        self.dropped = 0
+    
+    def __len__(self) -> int:
+        return len(self.events)
+    
+    def __iter__(self):
+        return iter(self.events)
+    
+    def append(self, event: dict):
+        self.events.append(event)
+        if len(self.events) > self.max_events:
+            self.events.popleft()
+            self.dropped += 1
+        
+        idx = int(event['timestamp'] // self.bucket_seconds)
+        bucket = self._buckets.get(idx)
+        if bucket is None:
+            bucket = self._buckets[idx] = _FlowBucket()
+        bucket.pairs[event['source_zone'], event['target_zone']] += 1
+        bucket.targets[event['target_zone']] += 1
+        bucket.total += 1
+        self.expire(event['timestamp'])
+    
+    def expire(self, now: float):
+        cutoff = now - self.retention_seconds
+        while self.events and self.events[0]['timestamp'] < cutoff:
+            self.events.popleft()
+        cutoff_idx = int(cutoff // self.bucket_seconds)
+        while self._buckets:
+            oldest = next(iter(self._buckets))
+            if oldest >= cutoff_idx:
+                break
+            del self._buckets[oldest]
+    
+    def _window(self, since: float) -> List[_FlowBucket]:
+        """Buckets from the one containing since up to now; windows are rounded to bucket edges"""
+        now = clock.now()
+        self.expire(now)
+        first = int(max(since, now - self.retention_seconds) // self.bucket_seconds)
+        last = int(now // self.bucket_seconds)
+        if last - first + 1 > len(self._buckets):
+            return [b for idx, b in self._buckets.items() if idx >= first]
+        return [self._buckets[idx] for idx in range(first, last + 1) if idx in self._buckets]
+    
+    def pair_counts(self, since: float) -> Counter:
+        counts = Counter()
+        for bucket in self._window(since):
+            counts.update(bucket.pairs)
+        return counts
+    
+    def target_count(self, target: str, since: float) -> int:
+        return sum(bucket.targets.get(target, 0) for bucket in self._window(since))
+    
+    def count(self, since: float) -> int:
+        return sum(bucket.total for bucket in self._window(since))
+    
+    def since(self, since: float) -> List[dict]:
+        """Retained raw events at or after since, oldest first"""
+        recent = []
+        for event in reversed(self.events):
+            if event['timestamp'] < since:
+                break
+            recent.append(event)
+        recent.reverse()
+        return recent
+    
+    def clear(self):
+        self.events.clear()
+        self._buckets.clear()
+        self.dropped = 0
+
+
+class TrajectoryAnalyzer:
     DESTINATION_KEYWORDS = {
         'airport': ['airport', 'terminal'],
         'cbd': ['cbd', 'perth_cbd', 'city'],
@@ -237,15 +380,28 @@ class TrajectoryAnalyzer:
     }
     
     MIN_DEST_CONFIDENCE = 0.55
+    OCCUPANCY_WINDOW_SECONDS = 300
+    FLOW_RETENTION_SECONDS = 3600
+    FLOW_EVENT_LIMIT = 20000
     
-    def __init__(self):
+    def __init__(self, store: Optional[TrackStore] = None):
+        self.store = store or get_track_store()
         self.trajectories: Dict[str, DriverTrajectory] = {}
         self.zone_flows: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
         self.active_flows: Dict[str, List[str]] = defaultdict(list)
-        self._last_cleanup = datetime.now()
+        self._last_cleanup = clock.now()
         
         self.zone_metrics: Dict[str, ZoneMetrics] = {}
-        self._flow_event_history: List[dict] = []
+        self.flow_log = FlowEventLog(self.FLOW_RETENTION_SECONDS, self.FLOW_EVENT_LIMIT)
+        
+        self._reset_occupancy()
+        self._reset_predictions()
+        self._destination_table: Optional[Tuple] = None
+        
+        self._metric_updates = 0
+        self._metric_updates_avoided = 0
+        # What the old per-observation all-zone pass would have recomputed
+        self._eager_metric_updates = 0
     
     def _get_zone_metrics(self, zone_id: str) -> ZoneMetrics:
         if zone_id not in self.zone_metrics:
@@ -253,16 +409,64 @@ class TrajectoryAnalyzer:
         return self.zone_metrics[zone_id]
     
     def _compute_zone_occupancy(self, zone_id: str) -> int:
-        cutoff = datetime.now() - timedelta(minutes=5)
-        count = 0
-        for traj in self.trajectories.values():
-            if traj.current_zone == zone_id and traj.last_updated >= cutoff:
-                count += 1
-        return count
+        return self._zone_occupancy.get(zone_id, 0)
+    
+    def _reset_occupancy(self):
+        self._zone_occupancy: Dict[str, int] = {}
+        self._occupied: Dict[str, str] = {}
+        self._occupancy_deadlines: List[Tuple[float, str]] = []
+        self._occupancy_pending: Set[str] = set()
+    
+    def _refresh_occupancy(self, traj: DriverTrajectory, now: float):
+        """Move a trajectory between zone occupancy counters after a zone change, update or expiry"""
+        fid = traj.fingerprint_id
+        zone = None
+        if fid in self.trajectories and traj.last_updated >= now - self.OCCUPANCY_WINDOW_SECONDS:
+            zone = traj.current_zone
+        old_zone = self._occupied.get(fid)
+        
+        if zone != old_zone:
+            if old_zone:
+                self._zone_occupancy[old_zone] -= 1
+                if not self._zone_occupancy[old_zone]:
+                    del self._zone_occupancy[old_zone]
+                del self._occupied[fid]
+                self._mark_dirty(old_zone)
+            if zone:
+                self._zone_occupancy[zone] = self._zone_occupancy.get(zone, 0) + 1
+                self._occupied[fid] = zone
+                self._mark_dirty(zone)
+        
+        if zone and fid not in self._occupancy_pending:
+            heapq.heappush(self._occupancy_deadlines,
+                           (traj.last_updated + self.OCCUPANCY_WINDOW_SECONDS, fid))
+            self._occupancy_pending.add(fid)
+    
+    def _expire_occupancy(self, now: float):
+        """Uncount trajectories not updated within the window; writer thread only, readers see the counters"""
+        while self._occupancy_deadlines and self._occupancy_deadlines[0][0] < now:
+            _, fid = heapq.heappop(self._occupancy_deadlines)
+            self._occupancy_pending.discard(fid)
+            traj = self.trajectories.get(fid)
+            if traj is not None:
+                self._refresh_occupancy(traj, now)
+    
+    def _drop_occupancy(self, fid: str):
+        zone = self._occupied.pop(fid, None)
+        if zone:
+            self._zone_occupancy[zone] -= 1
+            if not self._zone_occupancy[zone]:
+                del self._zone_occupancy[zone]
+            self._mark_dirty(zone)
+    
+    def _mark_dirty(self, zone_id: str):
+        metrics = self.zone_metrics.get(zone_id)
+        if metrics is not None:
+            metrics.dirty = True
     
     def update_driver(self, fingerprint_id: str, vehicle_type: str,
                       lat: float, lng: float, bearing: Optional[float],
-                      zone_id: str, timestamp: datetime,
+                      zone_id: str, timestamp: float,
                       confidence: float = 0.5) -> Optional[dict]:
         if confidence < 0.7:
             return None
@@ -273,6 +477,7 @@ class TrajectoryAnalyzer:
             self.trajectories[fingerprint_id] = DriverTrajectory(
                 fingerprint_id=fingerprint_id,
                 vehicle_type=vehicle_type,
+                track=self.store.acquire(fingerprint_id),
                 confidence=confidence
             )
             metrics = self._get_zone_metrics(zone_id)
@@ -290,6 +495,9 @@ class TrajectoryAnalyzer:
         )
         
         transition_result = traj.add_point(point)
+        now = clock.now()
+        self._refresh_occupancy(traj, now)
+        self._expire_occupancy(now)
         
         flow_event = None
         if transition_result:
@@ -302,18 +510,16 @@ class TrajectoryAnalyzer:
             new_metrics = self._get_zone_metrics(zone_id)
             new_metrics.record_inflow(1)
         
-        dest, dest_conf = self._predict_destination_with_confidence(traj)
-        traj.predicted_destination = dest
-        traj.predicted_dest_confidence = dest_conf
+        self._stale_predictions.add(fingerprint_id)
         
         self._periodic_cleanup()
-        self._update_zone_metrics()
+        self._eager_metric_updates += len(self.zone_metrics)
         
         return flow_event
     
     def _record_zone_transition(self, traj: DriverTrajectory, 
                                  source: str, target: str,
-                                 timestamp: datetime) -> dict:
+                                 timestamp: float) -> dict:
         self.zone_flows[source][target] += 1
         
         travel_time = None
@@ -325,7 +531,7 @@ class TrajectoryAnalyzer:
                     first_in_old = p
                     break
             if first_in_old:
-                travel_time = (timestamp - first_in_old.timestamp).total_seconds()
+                travel_time = timestamp - first_in_old.timestamp
                 distance = haversine_m(first_in_old.lat, first_in_old.lng,
                                        traj.points[-1].lat, traj.points[-1].lng)
         
@@ -341,83 +547,121 @@ class TrajectoryAnalyzer:
             'timestamp': timestamp
         }
         
-        self._flow_event_history.append(flow_event)
-        if len(self._flow_event_history) > 500:
-            self._flow_event_history = self._flow_event_history[-500:]
+        self.flow_log.append(flow_event)
         
         return flow_event
     
     def _update_zone_metrics(self):
+        """Recompute rates, occupancy and heat for zones that changed since the last refresh"""
+        now = clock.now()
         for zone_id, metrics in self.zone_metrics.items():
-            metrics.update_flow_rates(window_minutes=5)
-            occupancy = self._compute_zone_occupancy(zone_id)
+            if not metrics.needs_update(now):
+                self._metric_updates_avoided += 1
+                continue
+            metrics.update_flow_rates()
+            occupancy = self._zone_occupancy.get(zone_id, 0)
             metrics.current_driver_count = occupancy
             metrics.calculate_heat_score(occupancy)
+            metrics.dirty = False
+            self._metric_updates += 1
     
-    def _predict_destination_with_confidence(self, traj: DriverTrajectory) -> Tuple[Optional[str], float]:
-        if len(traj.points) < 3:
-            return None, 0
-        
-        is_freeway = any(kw in (traj.current_zone or '').lower() 
-                        for kw in ['fwy', 'freeway', 'hwy'])
-        min_speed = 5 if is_freeway else 2
-        
-        if traj.avg_speed_ms < min_speed:
-            return None, 0
-        
-        if not traj.has_stable_heading(window=3, tolerance_deg=30):
-            return None, 0
-        
-        last_point = traj.points[-1]
-        heading = traj.heading_deg
-        
-        best_dest = None
-        best_confidence = 0
+    def _destinations(self) -> Tuple:
+        """(zone ids, registry ids, lats, lngs) of zones with a centre, rebuilt if the registry grows"""
+        destinations = ZONE_REGISTRY.destinations
+        if self._destination_table is None or len(self._destination_table[0]) != len(destinations):
+            self._destination_table = (
+                [d.zone_id for d in destinations],
+                np.array([d.idx for d in destinations]),
+                np.array([d.center[0] for d in destinations]),
+                np.array([d.center[1] for d in destinations]),
+            )
+        return self._destination_table
+    
+    def _predict_destinations(self, trajs: List[DriverTrajectory]) -> List[Tuple[Optional[str], float]]:
+        """Best destination and confidence per trajectory, scored against every zone centre in one pass"""
+        results: List[Tuple[Optional[str], float]] = [(None, 0)] * len(trajs)
         
-        for zone_id, (zone_lat, zone_lng) in self.ZONE_CENTERS.items():
-            if zone_id == traj.current_zone:
+        eligible = []
+        for i, traj in enumerate(trajs):
+            if len(traj.points) < 3:
                 continue
-            
-            bearing_to_zone = calculate_bearing(
-                last_point.lat, last_point.lng,
-                zone_lat, zone_lng
-            )
-            
-            bearing_diff = abs(heading - bearing_to_zone)
-            bearing_diff = min(bearing_diff, 360 - bearing_diff)
-            
-            if bearing_diff > 60:
+            is_freeway = traj.current_zone_idx is not None and ZONE_REGISTRY.is_freeway[traj.current_zone_idx]
+            min_speed = 5 if is_freeway else 2
+            if traj.avg_speed_ms < min_speed:
                 continue
-            
-            distance_km = haversine_m(last_point.lat, last_point.lng, zone_lat, zone_lng) / 1000
-            
-            bearing_score = 1 - (bearing_diff / 60)
-            distance_score = max(0, 1 - (distance_km / 15))
-            
-            dest_confidence = bearing_score * 0.6 + distance_score * 0.4
-            
-            if dest_confidence > best_confidence:
-                best_confidence = dest_confidence
-                best_dest = zone_id
-        
-        if best_confidence >= self.MIN_DEST_CONFIDENCE:
-            return best_dest, best_confidence
-        return None, 0
+            if not traj.has_stable_heading(window=3, tolerance_deg=30):
+                continue
+            eligible.append(i)
+        
+        zone_ids, zone_idxs, zone_lats, zone_lngs = self._destinations()
+        if not eligible or not zone_ids:
+            return results
+        
+        last_points = [trajs[i].points[-1] for i in eligible]
+        lat = np.array([p.lat for p in last_points])[:, None]
+        lng = np.array([p.lng for p in last_points])[:, None]
+        heading = np.array([trajs[i].heading_deg for i in eligible])[:, None]
+        current = np.array([-1 if trajs[i].current_zone_idx is None else trajs[i].current_zone_idx
+                            for i in eligible])[:, None]
+        
+        bearing_diff = np.abs(heading - bearing_deg_np(lat, lng, zone_lats, zone_lngs))
+        bearing_diff = np.minimum(bearing_diff, 360 - bearing_diff)
+        distance_km = haversine_m_np(lat, lng, zone_lats, zone_lngs) / 1000
+        
+        bearing_score = 1 - (bearing_diff / 60)
+        distance_score = np.maximum(0, 1 - (distance_km / 15))
+        confidence = bearing_score * 0.6 + distance_score * 0.4
+        confidence[(bearing_diff > 60) | (zone_idxs == current)] = 0
+        
+        best = confidence.argmax(axis=1)
+        for row, i in enumerate(eligible):
+            best_confidence = float(confidence[row, best[row]])
+            if best_confidence >= self.MIN_DEST_CONFIDENCE:
+                results[i] = (zone_ids[best[row]], best_confidence)
+        return results
+    
+    def _reset_predictions(self):
+        self._stale_predictions: Set[str] = set()
+        self._heading_to: Dict[str, Set[str]] = {}
+    
+    def _set_prediction(self, traj: DriverTrajectory, dest: Optional[str], confidence: float):
+        """Store a prediction on the trajectory and move it between destination index entries"""
+        fid = traj.fingerprint_id
+        old_dest = traj.predicted_destination
+        if old_dest != dest:
+            if old_dest and old_dest in self._heading_to:
+                self._heading_to[old_dest].discard(fid)
+                if not self._heading_to[old_dest]:
+                    del self._heading_to[old_dest]
+            if dest:
+                self._heading_to.setdefault(dest, set()).add(fid)
+        traj.predicted_destination = dest
+        traj.predicted_dest_confidence = confidence
+    
+    def refresh(self):
+        """
+        Bring derived state up to date. Called on the writer thread (the daemon's
+        process stage, once per cycle); readers only look at what this left behind.
+        """
+        self._expire_occupancy(clock.now())
+        self._update_zone_metrics()
+        self._refresh_predictions()
     
-    def _predict_destination(self, traj: DriverTrajectory) -> Optional[str]:
-        dest, conf = self._predict_destination_with_confidence(traj)
-        return dest
+    def _refresh_predictions(self):
+        """Predict destinations for trajectories that gained points since the last refresh"""
+        if not self._stale_predictions:
+            return
+        stale, self._stale_predictions = self._stale_predictions, set()
+        trajs = [self.trajectories[fid] for fid in stale if fid in self.trajectories]
+        for traj, (dest, confidence) in zip(trajs, self._predict_destinations(trajs)):
+            self._set_prediction(traj, dest, confidence)
     
     def get_zone_flow_summary(self, minutes: int = 30) -> Dict[str, List[dict]]:
-        cutoff = datetime.now() - timedelta(minutes=minutes)
+        cutoff = clock.now() - minutes * 60
         
-        windowed_flows: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
-        
-        for event in self._flow_event_history:
-            if event['timestamp'] >= cutoff:
-                source = event['source_zone']
-                target = event['target_zone']
-                windowed_flows[source][target] += 1
+        windowed_flows: Dict[str, Dict[str, int]] = defaultdict(dict)
+        for (source, target), count in self.flow_log.pair_counts(cutoff).items():
+            windowed_flows[source][target] = count
         
         result = {}
         for source_zone, targets in windowed_flows.items():
@@ -436,38 +680,43 @@ class TrajectoryAnalyzer:
         drivers = []
         zone_lower = zone_id.lower()
         
-        for fid, traj in self.trajectories.items():
-            if traj.predicted_destination and zone_lower in traj.predicted_destination.lower():
-                if traj.predicted_dest_confidence >= self.MIN_DEST_CONFIDENCE:
-                    drivers.append({
-                        'fingerprint_id': fid,
-                        'vehicle_type': traj.vehicle_type,
-                        'current_zone': traj.current_zone,
-                        'speed_kmh': traj.avg_speed_ms * 3.6,
-                        'eta_minutes': self._estimate_eta(traj, zone_id),
-                        'confidence': traj.predicted_dest_confidence
-                    })
+        for dest, fids in list(self._heading_to.items()):
+            if zone_lower not in dest.lower():
+                continue
+            for fid in list(fids):
+                traj = self.trajectories.get(fid)
+                if traj is None:
+                    continue
+                drivers.append({
+                    'fingerprint_id': fid,
+                    'vehicle_type': traj.vehicle_type,
+                    'current_zone': traj.current_zone,
+                    'speed_kmh': traj.avg_speed_ms * 3.6,
+                    'eta_minutes': self._estimate_eta(traj, zone_id),
+                    'confidence': traj.predicted_dest_confidence
+                })
         
         return drivers
     
     def _estimate_eta(self, traj: DriverTrajectory, dest_zone: str) -> Optional[float]:
-        if dest_zone not in self.ZONE_CENTERS:
+        center = ZONE_REGISTRY.center(dest_zone)
+        if not center:
             return None
         
         if traj.avg_speed_ms < 1:
             return None
         
-        dest_lat, dest_lng = self.ZONE_CENTERS[dest_zone]
+        dest_lat, dest_lng = center
         last_point = traj.points[-1]
         distance = haversine_m(last_point.lat, last_point.lng, dest_lat, dest_lng)
         
         return (distance / traj.avg_speed_ms) / 60
     
     def get_active_driver_trails(self, minutes: int = 10) -> List[dict]:
-        cutoff = datetime.now() - timedelta(minutes=minutes)
+        cutoff = clock.now() - minutes * 60
         trails = []
         
-        for fid, traj in self.trajectories.items():
+        for fid, traj in list(self.trajectories.items()):
             if traj.last_updated < cutoff:
                 continue
             
@@ -489,16 +738,11 @@ class TrajectoryAnalyzer:
         return trails
     
     def get_flow_to_zone(self, zone_id: str, minutes: int = 30) -> int:
-        cutoff = datetime.now() - timedelta(minutes=minutes)
-        total = 0
-        for event in self._flow_event_history:
-            if event['timestamp'] >= cutoff and event['target_zone'] == zone_id:
-                total += 1
-        return total
+        return self.flow_log.target_count(zone_id, clock.now() - minutes * 60)
     
     def get_hotspots(self, top_n: int = 10) -> List[dict]:
         sorted_zones = sorted(
-            self.zone_metrics.values(),
+            list(self.zone_metrics.values()),
             key=lambda m: m.heat_score,
             reverse=True
         )[:top_n]
@@ -511,7 +755,7 @@ class TrajectoryAnalyzer:
             'outflow_rate': round(m.outflow_rate, 2),
             'net_flow': round(m.net_flow, 2),
             'avg_dwell_time_sec': round(m.avg_dwell_time_sec, 1),
-            'coordinates': self.ZONE_CENTERS.get(m.zone_id)
+            'coordinates': ZONE_REGISTRY.center(m.zone_id)
         } for m in sorted_zones if m.heat_score > 0]
     
     def get_zone_metrics_summary(self) -> Dict[str, dict]:
@@ -524,12 +768,12 @@ class TrajectoryAnalyzer:
                 'heat_score': round(m.heat_score, 3),
                 'avg_dwell_sec': round(m.avg_dwell_time_sec, 1)
             }
-            for zone_id, m in self.zone_metrics.items()
+            for zone_id, m in list(self.zone_metrics.items())
         }
     
     def get_declining_zones(self, threshold: float = -0.5) -> List[dict]:
         declining = [
-            m for m in self.zone_metrics.values()
+            m for m in list(self.zone_metrics.values())
             if m.net_flow < threshold
         ]
         return sorted(
@@ -544,7 +788,7 @@ class TrajectoryAnalyzer:
     
     def get_accumulating_zones(self, threshold: float = 0.5) -> List[dict]:
         accumulating = [
-            m for m in self.zone_metrics.values()
+            m for m in list(self.zone_metrics.values())
             if m.net_flow > threshold
         ]
         return sorted(
@@ -558,38 +802,37 @@ class TrajectoryAnalyzer:
         )
     
     def get_recent_flow_events(self, minutes: int = 10) -> List[dict]:
-        cutoff = datetime.now() - timedelta(minutes=minutes)
+        cutoff = clock.now() - minutes * 60
         return [
-            {**evt, 'timestamp': evt['timestamp'].isoformat()}
-            for evt in self._flow_event_history
-            if evt['timestamp'] >= cutoff
+            {**evt, 'timestamp': clock.to_datetime(evt['timestamp']).isoformat()}
+            for evt in self.flow_log.since(cutoff)
         ]
     
     def _periodic_cleanup(self):
-        now = datetime.now()
-        if (now - self._last_cleanup).total_seconds() < 60:
+        now = clock.now()
+        if now - self._last_cleanup < 60:
             return
         
         self._last_cleanup = now
-        cutoff = now - timedelta(hours=1)
+        cutoff = now - 3600
         
         expired = [fid for fid, traj in self.trajectories.items()
                    if traj.last_updated < cutoff]
         for fid in expired:
-            del self.trajectories[fid]
-        
-        self._update_zone_metrics()
+            traj = self.trajectories.pop(fid)
+            self.store.release(traj.track)
+            self._drop_occupancy(fid)
+            self._set_prediction(traj, None, 0)
     
     def get_stats(self) -> dict:
         active_count = len(self.trajectories)
-        with_prediction = len([t for t in self.trajectories.values() 
-                               if t.predicted_destination and t.predicted_dest_confidence >= self.MIN_DEST_CONFIDENCE])
+        with_prediction = sum(len(fids) for fids in list(self._heading_to.values()))
         
-        cutoff = datetime.now() - timedelta(minutes=30)
-        recent_flows = len([e for e in self._flow_event_history if e['timestamp'] >= cutoff])
+        cutoff = clock.now() - 1800
+        recent_flows = self.flow_log.count(cutoff)
         
         avg_dwell = 0
-        dwells = [t.get_current_dwell_time() for t in self.trajectories.values() 
+        dwells = [t.get_current_dwell_time() for t in list(self.trajectories.values()) 
                   if t.zone_entry_time]
         if dwells:
             avg_dwell = sum(dwells) / len(dwells)
@@ -597,36 +840,116 @@ class TrajectoryAnalyzer:
         return {
             'active_trajectories': active_count,
             'with_predictions': with_prediction,
-            'total_flow_events': len(self._flow_event_history),
+            'total_flow_events': len(self.flow_log),
+            'dropped_flow_events': self.flow_log.dropped,
             'recent_flow_events': recent_flows,
             'zones_tracked': len(self.zone_flows),
             'zones_with_metrics': len(self.zone_metrics),
+            'zone_metric_updates': self._metric_updates,
+            'zone_metric_updates_avoided': self._metric_updates_avoided,
+            'zone_metric_updates_eager_equivalent': self._eager_metric_updates,
             'avg_current_dwell_sec': round(avg_dwell, 1)
         }
     
-    def reset(self):
+    CHECKPOINT_FIELDS = (
+        'fingerprint_id', 'vehicle_type', 'current_zone', 'predicted_destination', 'predicted_dest_confidence',
+        'heading_deg', 'avg_speed_ms', 'last_updated', 'zone_entry_time', 'total_dwell_time_sec',
+        'zones_visited', 'smoothed_speed_ms', 'smoothed_heading_deg', 'confidence',
+    )
+    CHECKPOINT_TIME_FIELDS = ('last_updated', 'zone_entry_time')
+    TRAJECTORY_TTL_SECONDS = 3600
+    
+    def export_state(self, epoch_offset: float) -> Dict:
+        """Trajectories, zone flows and flow metrics as plain rows; timestamps shifted by epoch_offset"""
+        self._refresh_predictions()
+        rows = []
+        for traj in self.trajectories.values():
+            row = []
+            for name in self.CHECKPOINT_FIELDS:
+                value = getattr(traj, name)
+                if name in self.CHECKPOINT_TIME_FIELDS and value is not None:
+                    value += epoch_offset
+                row.append(value)
+            rows.append(tuple(row))
+        
+        def shift(counter):
+            return [(ts + epoch_offset, count) for ts, count in counter.history()]
+        
+        return {
+            'trajectories': rows,
+            'zone_flows': {source: dict(targets) for source, targets in self.zone_flows.items()},
+            'flow_events': [{**evt, 'timestamp': evt['timestamp'] + epoch_offset} for evt in self.flow_log],
+            'zone_metrics': [(m.zone_id, shift(m.inflows), shift(m.outflows), list(m.dwell_times))
+                             for m in self.zone_metrics.values()],
+        }
+    
+    def restore_state(self, state: Dict, epoch_offset: float):
+        """Replace current state with a checkpoint, dropping trajectories past their cleanup horizon"""
+        self.reset()
+        cutoff = clock.now() - self.TRAJECTORY_TTL_SECONDS
+        
+        for row in state['trajectories']:
+            values = dict(zip(self.CHECKPOINT_FIELDS, row))
+            for name in self.CHECKPOINT_TIME_FIELDS:
+                if values[name] is not None:
+                    values[name] -= epoch_offset
+            traj = DriverTrajectory(track=self.store.acquire(values['fingerprint_id']), **values)
+            if values['last_updated'] < cutoff or not traj.points:
+                self.store.release(traj.track)
+                continue
+            if traj.current_zone:
+                traj.current_zone_idx = ZONE_REGISTRY.id_of(traj.current_zone)
+            traj.predicted_destination = None
+            self.trajectories[traj.fingerprint_id] = traj
+            self._refresh_occupancy(traj, clock.now())
+            self._stale_predictions.add(traj.fingerprint_id)
+        
+        for source, targets in state['zone_flows'].items():
+            self.zone_flows[source].update(targets)
+        for evt in state['flow_events']:
+            self.flow_log.append({**evt, 'timestamp': evt['timestamp'] - epoch_offset})
+        self.flow_log.expire(clock.now())
+        
+        for zone_id, inflow, outflow, dwell_times in state['zone_metrics']:
+            metrics = self._get_zone_metrics(zone_id)
+            for counter, history in ((metrics.inflows, inflow), (metrics.outflows, outflow)):
+                counter.advance(clock.now())
+                for ts, count in history:
+                    counter.add(ts - epoch_offset, count)
+            for dwell_time in dwell_times:
+                metrics.add_dwell_time(dwell_time)
+    
+    def _release_trajectories(self):
+        for traj in self.trajectories.values():
+            self.store.release(traj.track)
         self.trajectories.clear()
+        self._reset_occupancy()
+        self._reset_predictions()
+    
+    def reset(self):
+        self._release_trajectories()
         self.zone_flows.clear()
         self.zone_metrics.clear()
-        self._flow_event_history.clear()
+        self.flow_log.clear()
     
     def reset_window(self) -> dict:
+        self.refresh()
         window_summary = self.get_window_summary()
         
-        self.trajectories.clear()
+        self._release_trajectories()
         self.zone_flows.clear()
         self.zone_metrics.clear()
-        self._flow_event_history.clear()
+        self.flow_log.clear()
         self.active_flows.clear()
-        self._last_cleanup = datetime.now()
+        self._last_cleanup = clock.now()
         
         return window_summary
     
     def get_window_summary(self) -> dict:
         zone_summaries = {}
-        for zone_id, metrics in self.zone_metrics.items():
-            inflow_count = sum(c for _, c in metrics.inflow_history)
-            outflow_count = sum(c for _, c in metrics.outflow_history)
+        for zone_id, metrics in list(self.zone_metrics.items()):
+            inflow_count = metrics.inflows.total
+            outflow_count = metrics.outflows.total
             
             avg_dwell = 0
             if metrics.dwell_times:
@@ -671,7 +994,7 @@ class TrajectoryAnalyzer:
             worst_zone = (None, {})
         
         total_drivers = len(self.trajectories)
-        total_flow_events = len(self._flow_event_history)
+        total_flow_events = len(self.flow_log)
         
         zones_with_data = [z for z, s in zone_summaries.items() if s.get('activity_level') != 'NO_DATA']
         
@@ -721,31 +1044,6 @@ class TrajectoryAnalyzer:
         }
 
 
-def haversine_m(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
-    R = 6371000
-    lat1_rad = math.radians(lat1)
-    lat2_rad = math.radians(lat2)
-    delta_lat = math.radians(lat2 - lat1)
-    delta_lng = math.radians(lng2 - lng1)
-    
-    a = math.sin(delta_lat/2)**2 + math.cos(lat1_rad) * math.cos(lat2_rad) * math.sin(delta_lng/2)**2
-    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
-    
-    return R * c
-
-
-def calculate_bearing(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
-    lat1_rad = math.radians(lat1)
-    lat2_rad = math.radians(lat2)
-    delta_lng = math.radians(lng2 - lng1)
-    
-    x = math.sin(delta_lng) * math.cos(lat2_rad)
-    y = math.cos(lat1_rad) * math.sin(lat2_rad) - math.sin(lat1_rad) * math.cos(lat2_rad) * math.cos(delta_lng)
-    
-    bearing = math.degrees(math.atan2(x, y))
-    return (bearing + 360) % 360
-
-
 _trajectory_analyzer: Optional[TrajectoryAnalyzer] = None
 
 
@@ -0,0 +1,201 @@
+"""
+Zone Registry
+Single source for the zone tables used across the intelligence engine.
+Every zone is compiled once into a profile with a dense integer ID, so hot
+paths index lists by ID instead of scanning zone strings.
+"""
+
+import math
+import threading
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+DEFAULT_SPEED_MS = 28
+DEFAULT_REGION = 'cbd'
+FREEWAY_KEYWORDS = ('fwy', 'freeway', 'hwy', 'highway', 'motorway')
+REGIONS = ('cbd', 'fremantle', 'south', 'north', 'east')
+
+# Coordinates polled by the daemon
+SCAN_ZONES = [
+    # CBD Area
+    {'name': 'Perth CBD', 'lat': -31.9505, 'lng': 115.8605, 'radius': 2, 'dense': True, 'priority': 10, 'region': 'cbd'},
+    {'name': 'Northbridge', 'lat': -31.9440, 'lng': 115.8575, 'radius': 1, 'dense': True, 'priority': 9, 'region': 'cbd'},
+    {'name': 'East Perth', 'lat': -31.9550, 'lng': 115.8750, 'radius': 1, 'dense': True, 'priority': 8, 'region': 'cbd'},
+    {'name': 'West Perth', 'lat': -31.9480, 'lng': 115.8430, 'radius': 1, 'dense': True, 'priority': 7, 'region': 'cbd'},
+    {'name': 'Elizabeth Quay', 'lat': -31.9580, 'lng': 115.8580, 'radius': 0.5, 'dense': True, 'priority': 9, 'region': 'cbd'},
+
+    # Fremantle Area
+    {'name': 'Fremantle', 'lat': -32.0569, 'lng': 115.7439, 'radius': 2, 'dense': True, 'priority': 10, 'region': 'fremantle'},
+    {'name': 'Fremantle Port', 'lat': -32.0480, 'lng': 115.7380, 'radius': 1, 'dense': True, 'priority': 8, 'region': 'fremantle'},
+    {'name': 'South Fremantle', 'lat': -32.0720, 'lng': 115.7500, 'radius': 1, 'dense': True, 'priority': 7, 'region': 'fremantle'},
+
+    # Southern Suburbs
+    {'name': 'Armadale', 'lat': -32.1530, 'lng': 116.0150, 'radius': 2, 'dense': True, 'priority': 8, 'region': 'south'},
+    {'name': 'Rockingham', 'lat': -32.2771, 'lng': 115.7299, 'radius': 2, 'dense': True, 'priority': 8, 'region': 'south'},
+    {'name': 'Success', 'lat': -32.1447, 'lng': 115.8483, 'radius': 1.5, 'dense': True, 'priority': 7, 'region': 'south'},
+
+    # Inner Suburbs
+    {'name': 'Cannington', 'lat': -32.0162, 'lng': 115.9350, 'radius': 1.5, 'dense': True, 'priority': 8, 'region': 'east'},
+
+    # Northern Suburbs
+    {'name': 'Midland', 'lat': -31.8890, 'lng': 116.0060, 'radius': 2, 'dense': True, 'priority': 8, 'region': 'east'},
+    {'name': 'Girrawheen', 'lat': -31.8380, 'lng': 115.8380, 'radius': 1.5, 'dense': True, 'priority': 7, 'region': 'north'},
+    {'name': 'Heathridge', 'lat': -31.7620, 'lng': 115.7620, 'radius': 1.5, 'dense': True, 'priority': 7, 'region': 'north'},
+]
+
+# Destination centres for zones that are not scanned (scanned zones use their scan coordinate)
+ZONE_CENTERS = {
+    'subiaco': (-31.9490, 115.8270),
+    'north_fremantle': (-32.0350, 115.7450),
+    'perth_airport': (-31.9403, 115.9670),
+    'scarborough': (-31.8920, 115.7570),
+    'joondalup': (-31.7440, 115.7650),
+    'morley': (-31.8890, 115.9050),
+    'victoria_park': (-31.9760, 115.8970),
+    'south_perth': (-31.9760, 115.8640),
+    'claremont': (-31.9800, 115.7810),
+    'leederville': (-31.9360, 115.8410),
+    'cottesloe': (-31.9990, 115.7570),
+    'applecross': (-32.0100, 115.8420),
+}
+
+ZONE_SPEEDS_MS = {
+    'cbd': 12, 'perth_cbd': 12, 'northbridge': 12,
+    'east_perth': 14, 'west_perth': 14, 'elizabeth_quay': 12,
+    'subiaco': 15, 'leederville': 15, 'victoria_park': 15, 'south_perth': 15,
+    'fremantle': 14, 'south_fremantle': 14, 'north_fremantle': 14, 'fremantle_port': 12,
+    'armadale': 15, 'rockingham': 15, 'cannington': 15, 'success': 17,
+    'midland': 15, 'girrawheen': 17, 'heathridge': 17,
+    'airport': 17, 'perth_airport': 17, 'default_suburb': 17,
+    'kwinana_fwy': 28, 'mitchell_fwy': 28, 'roe_hwy': 28, 'tonkin_hwy': 28, 'freeway': 28,
+}
+
+GRID_VISIBILITY_KM = {
+    'perth_cbd': 0.8, 'northbridge': 0.8, 'cbd': 0.8,
+    'fremantle': 0.9, 'south_fremantle': 0.9, 'north_fremantle': 0.9,
+    'perth_airport': 1.2, 'airport': 1.2,
+    'default': 1.0
+}
+
+
+def zone_id_for_name(name: str) -> str:
+    return name.lower().replace(' ', '_')
+
+
+def _compile_speed(zone_id: str) -> float:
+    zone_lower = zone_id.lower()
+    if zone_lower in ZONE_SPEEDS_MS:
+        return ZONE_SPEEDS_MS[zone_lower]
+    for key in ZONE_SPEEDS_MS:
+        if key in zone_lower or zone_lower in key:
+            return ZONE_SPEEDS_MS[key]
+    if 'fwy' in zone_lower or 'freeway' in zone_lower or 'hwy' in zone_lower:
+        return 28
+    if 'cbd' in zone_lower:
+        return 12
+    return DEFAULT_SPEED_MS
+
+
+@dataclass(frozen=True)
+class ZoneProfile:
+    idx: int
+    zone_id: str
+    name: str
+    speed_ms: float
+    is_freeway: bool
+    visibility_km: float
+    center: Optional[Tuple[float, float]]
+    is_dense: bool
+    priority: int
+    is_scanned: bool
+    region: str
+
+
+class ZoneRegistry:
+    """
+    Dense zone IDs in registration order. Known zones are compiled at import;
+    a zone string first seen at runtime is compiled once with the same rules.
+    """
+
+    def __init__(self):
+        self.profiles: List[ZoneProfile] = []
+        self.speed_ms: List[float] = []
+        self.is_freeway: List[bool] = []
+        self.destinations: List[ZoneProfile] = []
+        self._index: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+        scanned = {}
+        for zone in SCAN_ZONES:
+            scanned[zone_id_for_name(zone['name'])] = zone
+
+        for zone_id in list(scanned) + list(ZONE_CENTERS):
+            self._register(zone_id, scanned.get(zone_id))
+
+    def _register(self, zone_id: str, scan_zone: Optional[dict] = None) -> int:
+        zone_lower = zone_id.lower()
+        if scan_zone:
+            center = (scan_zone['lat'], scan_zone['lng'])
+        else:
+            center = ZONE_CENTERS.get(zone_id)
+
+        profile = ZoneProfile(
+            idx=len(self.profiles),
+            zone_id=zone_id,
+            name=scan_zone['name'] if scan_zone else zone_id.replace('_', ' ').title(),
+            speed_ms=_compile_speed(zone_id),
+            is_freeway=bool(zone_id) and any(kw in zone_lower for kw in FREEWAY_KEYWORDS),
+            visibility_km=GRID_VISIBILITY_KM.get(zone_lower, GRID_VISIBILITY_KM['default']),
+            center=center,
+            is_dense=bool(scan_zone and scan_zone['dense']),
+            priority=scan_zone['priority'] if scan_zone else 0,
+            is_scanned=scan_zone is not None,
+            region=scan_zone['region'] if scan_zone else self._nearest_region(center),
+        )
+        self.profiles.append(profile)
+        self.speed_ms.append(profile.speed_ms)
+        self.is_freeway.append(profile.is_freeway)
+        if center:
+            self.destinations.append(profile)
+        self._index[zone_id] = profile.idx
+        return profile.idx
+
+    def _nearest_region(self, center: Optional[Tuple[float, float]]) -> str:
+        """Region of the closest scanned zone; zones without a centre fall back to DEFAULT_REGION"""
+        if not center:
+            return DEFAULT_REGION
+        best_region, best_d2 = DEFAULT_REGION, float('inf')
+        for zone in SCAN_ZONES:
+            d2 = (zone['lat'] - center[0]) ** 2 + ((zone['lng'] - center[1]) * math.cos(math.radians(center[0]))) ** 2
+            if d2 < best_d2:
+                best_region, best_d2 = zone['region'], d2
+        return best_region
+
+    def id_of(self, zone_id: Optional[str]) -> int:
+        zone_id = zone_id or ''
+        idx = self._index.get(zone_id)
+        if idx is None:
+            with self._lock:
+                idx = self._index.get(zone_id)
+                if idx is None:
+                    idx = self._register(zone_id)
+        return idx
+
+    def get(self, zone_id: Optional[str]) -> ZoneProfile:
+        return self.profiles[self.id_of(zone_id)]
+
+    def zone_id(self, idx: int) -> str:
+        return self.profiles[idx].zone_id
+
+    def center(self, zone_id: Optional[str]) -> Optional[Tuple[float, float]]:
+        idx = self._index.get(zone_id or '')
+        return self.profiles[idx].center if idx is not None else None
+
+    def scanned(self) -> List[ZoneProfile]:
+        return [p for p in self.profiles if p.is_scanned]
+
+    def __len__(self) -> int:
+        return len(self.profiles)
+
+
+ZONE_REGISTRY = ZoneRegistry()
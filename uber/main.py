@@ -2,6 +2,7 @@ import eventlet
 
 eventlet.monkey_patch()
 
+import functools
 import os
 import sys
 
@@ -12,6 +13,7 @@ try:
     from datetime import datetime, timedelta
     from werkzeug.utils import secure_filename
     from objects.uberDev import vehicleDetails, appLaunch, driverLocation, updateLocationOnce, flightArrivals, parseFlightsByHour, uberRidersNearby, fetch_all_perth_drivers
+    from intelligence.geo import haversine_m, bearing_deg, bearing_diff_deg, cross_track_m
     import config
     import cache
     from models import db, User, Role, ChatMessage, PushSubscription, PageVisit, create_default_roles, encrypt_data, decrypt_data
@@ -1750,35 +1752,11 @@ def live_drivers_page():
 driver_cache = {}
 driver_cache_lock = {}
 
-def calculate_distance_meters(lat1, lng1, lat2, lng2):
-    """Calculate distance between two coordinates in meters using Haversine formula."""
-    import math
-    R = 6371000
-    phi1 = math.radians(lat1)
-    phi2 = math.radians(lat2)
-    delta_phi = math.radians(lat2 - lat1)
-    delta_lambda = math.radians(lng2 - lng1)
-    a = math.sin(delta_phi/2)**2 + math.cos(phi1) * math.cos(phi2) * math.sin(delta_lambda/2)**2
-    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
-    return R * c
-
 def bearing_difference(b1, b2):
     """Calculate the absolute difference between two bearings (0-180)."""
     if b1 is None or b2 is None:
         return 0
-    diff = abs(b1 - b2) % 360
-    return min(diff, 360 - diff)
-
-def calculate_bearing_to_point(lat1, lng1, lat2, lng2):
-    """Calculate bearing from point 1 to point 2 in degrees (0-360)."""
-    import math
-    delta_lng = math.radians(lng2 - lng1)
-    lat1_rad = math.radians(lat1)
-    lat2_rad = math.radians(lat2)
-    x = math.sin(delta_lng) * math.cos(lat2_rad)
-    y = math.cos(lat1_rad) * math.sin(lat2_rad) - math.sin(lat1_rad) * math.cos(lat2_rad) * math.cos(delta_lng)
-    bearing = math.degrees(math.atan2(x, y))
-    return (bearing + 360) % 360
+    return bearing_diff_deg(b1, b2)
 
 def is_moving_same_driver(new_driver, existing_driver, max_cross_track=100, max_elapsed_seconds=60):
     """
@@ -1789,7 +1767,6 @@ def is_moving_same_driver(new_driver, existing_driver, max_cross_track=100, max_
     A driver moving at 60km/h (city speed) travels ~1000m per minute.
     We check if the new position is along the expected trajectory.
     """
-    import math
     from datetime import datetime
     
     new_lat = new_driver.get('lat')
@@ -1804,7 +1781,7 @@ def is_moving_same_driver(new_driver, existing_driver, max_cross_track=100, max_
     if None in (new_lat, new_lng, ex_lat, ex_lng):
         return False
     
-    dist = calculate_distance_meters(new_lat, new_lng, ex_lat, ex_lng)
+    dist = haversine_m(new_lat, new_lng, ex_lat, ex_lng)
     
     if dist <= 100:
         b_diff = bearing_difference(new_bearing, ex_bearing)
@@ -1829,11 +1806,11 @@ def is_moving_same_driver(new_driver, existing_driver, max_cross_track=100, max_
         if dist > max_travel + 100:
             return False
     
-    bearing_to_new = calculate_bearing_to_point(ex_lat, ex_lng, new_lat, new_lng)
+    bearing_to_new = bearing_deg(ex_lat, ex_lng, new_lat, new_lng)
     movement_alignment = bearing_difference(ex_bearing, bearing_to_new)
     
     if movement_alignment <= 45:
-        cross_track = dist * math.sin(math.radians(movement_alignment))
+        cross_track = abs(cross_track_m(ex_lat, ex_lng, ex_bearing, new_lat, new_lng))
         if cross_track <= max_cross_track:
             return True
     
@@ -1846,6 +1823,11 @@ def find_matching_driver_index(new_driver, existing_drivers):
             return i
     return -1
 
+def fetch_drivers_cached(lat, lng, max_age=cache.DRIVER_LOCATION_TTL):
+    """Driver lookup through the location cache shared with the intelligence daemon."""
+    from objects.uberDev import fetch_drivers_at_location
+    return cache.get_drivers_at_location(lat, lng, fetch_drivers_at_location, max_age)
+
 @app.route('/api/live-drivers')
 @login_required
 def api_live_drivers():
@@ -1854,7 +1836,6 @@ def api_live_drivers():
     Accumulates unique drivers over 3-minute rolling window.
     """
     from datetime import datetime, timedelta
-    from objects.uberDev import fetch_drivers_at_location
     
     user_id = current_user.id
     lat = request.args.get('lat', type=float)
@@ -1873,7 +1854,7 @@ def api_live_drivers():
     cache['drivers'] = [d for d in cache['drivers'] if d.get('timestamp', now) > cutoff]
     
     try:
-        new_drivers = fetch_drivers_at_location(lat, lng)
+        new_drivers = fetch_drivers_cached(lat, lng)
         cache['sample_count'] += 1
         
         for driver in new_drivers:
@@ -1943,7 +1924,6 @@ def api_location_drivers():
     Collects 35 samples total (5 points x 7 rounds).
     """
     import time
-    from objects.uberDev import fetch_drivers_at_location
     
     location = request.args.get('location', '').strip()
     if not location:
@@ -2002,7 +1982,8 @@ def api_location_drivers():
         for round_num in range(7):
             for point_lat, point_lng in sample_points:
                 try:
-                    new_drivers = fetch_drivers_at_location(point_lat, point_lng)
+                    # Rounds revisit each point every ~2.5s; only share lookups fresher than that
+                    new_drivers = fetch_drivers_cached(point_lat, point_lng, max_age=2)
                     samples_collected += 1
                     
                     for driver in new_drivers:
@@ -2068,7 +2049,6 @@ def api_drivers_nearby():
     This ensures both endpoints always return identical counts.
     """
     from datetime import datetime, timedelta
-    from objects.uberDev import fetch_drivers_at_location
     
     user_id = current_user.id
     lat = request.args.get('lat', type=float)
@@ -2092,7 +2072,7 @@ def api_drivers_nearby():
     cache['drivers'] = [d for d in cache['drivers'] if d.get('timestamp', now) > cutoff]
     
     try:
-        new_drivers = fetch_drivers_at_location(lat, lng)
+        new_drivers = fetch_drivers_cached(lat, lng)
         cache['sample_count'] += 1
         
         for driver in new_drivers:
@@ -2555,16 +2535,6 @@ def api_hotspots():
     except Exception as e:
         print(f"Event integration error: {e}")
     
-    # Calculate distance helper
-    def calc_distance(lat1, lon1, lat2, lon2):
-        from math import radians, sin, cos, sqrt, atan2
-        R = 6371
-        lat1, lon1, lat2, lon2 = map(radians, [lat1, lon1, lat2, lon2])
-        dlat = lat2 - lat1
-        dlon = lon2 - lon1
-        a = sin(dlat/2)**2 + cos(lat1) * cos(lat2) * sin(dlon/2)**2
-        return R * 2 * atan2(sqrt(a), sqrt(1-a))
-    
     # Process each hotspot
     hotspots_result = []
     for h in HOTSPOTS:
@@ -2629,7 +2599,7 @@ def api_hotspots():
         
         # Add distance if user location provided
         if user_lat and user_lng:
-            distance = calc_distance(user_lat, user_lng, h['lat'], h['lng'])
+            distance = haversine_m(user_lat, user_lng, h['lat'], h['lng']) / 1000
             hotspot_data['distance'] = round(distance, 1)
             
             # Only include if within max distance
@@ -2997,7 +2967,7 @@ def api_smart_route():
     Considers current position, nearby hotspots, demand levels, and distance.
     """
     from datetime import datetime
-    from math import radians, sin, cos, sqrt, atan2
+    from math import sqrt
     
     # Get current position from query params
     lat = request.args.get('lat', type=float)
@@ -3006,14 +2976,6 @@ def api_smart_route():
     if not lat or not lng:
         return jsonify(success=False, message="Current location required"), 400
     
-    def calc_distance(lat1, lon1, lat2, lon2):
-        R = 6371
-        lat1, lon1, lat2, lon2 = map(radians, [lat1, lon1, lat2, lon2])
-        dlat = lat2 - lat1
-        dlon = lon2 - lon1
-        a = sin(dlat/2)**2 + cos(lat1) * cos(lat2) * sin(dlon/2)**2
-        return R * 2 * atan2(sqrt(a), sqrt(1-a))
-    
     # Get current hotspots data
     try:
         # Fetch hotspots (reuse internal logic)
@@ -3050,7 +3012,7 @@ def api_smart_route():
         
         recommendations = []
         for h in HOTSPOTS:
-            distance = calc_distance(lat, lng, h['lat'], h['lng'])
+            distance = haversine_m(lat, lng, h['lat'], h['lng']) / 1000
             
             # Calculate demand score
             demand = h['base'] * time_mult
@@ -3747,13 +3709,15 @@ from intelligence.grid import PERTH_GRID
 from intelligence.dedup import DriverDeduplicator, DriverSighting
 from intelligence.daemon import IntelligenceDaemon, get_daemon, start_daemon, stop_daemon
 from intelligence.learning import LearningEngine
-from models import DriverObservation, DriverFingerprint, ZoneConfig, HourlySnapshot, DailyPattern, CorrelationModel, PredictionModel, IntelligenceConfig, ScanBatch, ActivityReport, ZoneWindowFeature
+from models import ZoneConfig, HourlySnapshot, DailyPattern, CorrelationModel, PredictionModel, IntelligenceConfig, ActivityReport, ZoneWindowFeature
 
 _intelligence_daemon = None
 
 def get_fetch_drivers_func():
-    from objects.uberDev import fetch_drivers_at_location
-    return fetch_drivers_at_location
+    # Repeat polls of one coordinate must be real samples, so the daemon only
+    # reuses lookups younger than its poll interval; its results still warm
+    # the cache for the driver endpoints.
+    return functools.partial(fetch_drivers_cached, max_age=IntelligenceDaemon.POLL_INTERVAL_SEC)
 
 
 @app.route('/intelligence')
@@ -3784,7 +3748,34 @@ def api_intelligence_status():
             'grid_stats': PERTH_GRID.get_stats()
         })
     
-    return jsonify(success=True, status=_intelligence_daemon.get_status())
+    status = _intelligence_daemon.get_status()
+    status['location_cache'] = cache.get_location_cache_stats()
+    return jsonify(success=True, status=status)
+
+
+@app.route('/api/intelligence/metrics')
+@login_required
+def api_intelligence_metrics():
+    if not current_user.is_owner():
+        return jsonify(success=False, message='Access denied'), 403
+    
+    global _intelligence_daemon
+    
+    if _intelligence_daemon is None:
+        return app.response_class('', mimetype='text/plain; version=0.0.4')
+    
+    location_stats = cache.get_location_cache_stats()
+    extra_gauges = [
+        ('riztar_location_cache_entries', 'Cached driver locations', [({}, location_stats['entries'])]),
+    ]
+    extra_counters = [
+        ('riztar_location_cache_lookups', 'Driver location lookups by outcome',
+         [({'outcome': outcome}, location_stats[outcome]) for outcome in ('hits', 'misses', 'coalesced', 'errors')]),
+        ('riztar_location_cache_evictions', 'Live driver locations evicted to stay under the size cap',
+         [({}, location_stats['evicted'])]),
+    ]
+    return app.response_class(_intelligence_daemon.get_metrics_text(extra_gauges, extra_counters),
+                              mimetype='text/plain; version=0.0.4')
 
 
 @app.route('/api/intelligence/start', methods=['POST'])
@@ -3796,92 +3787,8 @@ def api_intelligence_start():
     global _intelligence_daemon
     
     try:
-        from objects.uberDev import fetch_drivers_at_location
-        
         if _intelligence_daemon is None:
-            _intelligence_daemon = IntelligenceDaemon(fetch_drivers_at_location, flask_app=app)
-            
-            _active_batches = {}
-            _flask_app = app
-            
-            def on_observation(data):
-                try:
-                    with _flask_app.app_context():
-                        batch_id = data.get('batch_id', 'unknown')
-                        
-                        if batch_id not in _active_batches:
-                            scan_batch = ScanBatch(
-                                batch_id=batch_id,
-                                started_at=datetime.now(),
-                                status='running'
-                            )
-                            db.session.add(scan_batch)
-                            db.session.flush()
-                            _active_batches[batch_id] = scan_batch
-                        
-                        for obs in data.get('observations', []):
-                            fp_id = obs['fingerprint_id']
-                            existing_fp = DriverFingerprint.query.filter_by(fingerprint_id=fp_id).first()
-                            
-                            if existing_fp:
-                                existing_fp.last_seen_lat = obs['lat']
-                                existing_fp.last_seen_lng = obs['lng']
-                                existing_fp.last_bearing = obs.get('bearing')
-                                existing_fp.last_seen_at = obs['timestamp']
-                                existing_fp.observation_count += 1
-                                existing_fp.confidence_score = min(0.99, existing_fp.confidence_score + 0.02)
-                                existing_fp.primary_zone = obs['zone_id']
-                            elif obs.get('is_new', False):
-                                new_fp = DriverFingerprint(
-                                    fingerprint_id=fp_id,
-                                    vehicle_type=obs['vehicle_type'],
-                                    first_seen_lat=obs['lat'],
-                                    first_seen_lng=obs['lng'],
-                                    last_seen_lat=obs['lat'],
-                                    last_seen_lng=obs['lng'],
-                                    last_bearing=obs.get('bearing'),
-                                    confidence_score=obs['confidence'],
-                                    primary_zone=obs['zone_id'],
-                                    first_seen_at=obs['timestamp'],
-                                    last_seen_at=obs['timestamp']
-                                )
-                                db.session.add(new_fp)
-                            
-                            db_obs = DriverObservation(
-                                scan_batch_id=batch_id,
-                                lat=obs['lat'],
-                                lng=obs['lng'],
-                                bearing=obs.get('bearing'),
-                                vehicle_type=obs['vehicle_type'],
-                                zone_id=obs['zone_id'],
-                                fingerprint_id=fp_id,
-                                confidence=obs['confidence'],
-                                observed_at=obs['timestamp']
-                            )
-                            db.session.add(db_obs)
-                        
-                        db.session.commit()
-                except Exception as e:
-                    db.session.rollback()
-                    print(f"DB observation error: {e}", flush=True)
-            
-            def on_cycle_complete(data):
-                try:
-                    with _flask_app.app_context():
-                        for batch_id, batch in list(_active_batches.items()):
-                            scan_batch = ScanBatch.query.filter_by(batch_id=batch_id).first()
-                            if scan_batch:
-                                scan_batch.completed_at = datetime.now()
-                                scan_batch.unique_drivers = data.get('unique_drivers', 0)
-                                scan_batch.status = 'completed'
-                            del _active_batches[batch_id]
-                        db.session.commit()
-                except Exception as e:
-                    db.session.rollback()
-                    print(f"DB cycle complete error: {e}", flush=True)
-            
-            _intelligence_daemon.register_callback('on_observation', on_observation)
-            _intelligence_daemon.register_callback('on_cycle_complete', on_cycle_complete)
+            _intelligence_daemon = IntelligenceDaemon(get_fetch_drivers_func(), flask_app=app)
         
         result = _intelligence_daemon.start()
         return jsonify(success=result, message='Intelligence engine started' if result else 'Already running')
@@ -3915,6 +3822,7 @@ def api_intelligence_hotspots():
         if _intelligence_daemon is None:
             return jsonify(success=True, hotspots=[])
         
+        _intelligence_daemon.record_dashboard_read()
         counts = _intelligence_daemon.deduplicator.get_counts_by_zone()
         hotspots = []
         for zone_id, type_counts in sorted(counts.items(), key=lambda x: sum(x[1].values()), reverse=True)[:10]:
@@ -3947,6 +3855,7 @@ def api_intelligence_drivers():
         if _intelligence_daemon is None:
             return jsonify(success=True, drivers=[], max_id=0, count=0)
         
+        _intelligence_daemon.record_dashboard_read()
         cutoff = datetime.now() - timedelta(minutes=minutes_ago)
         drivers_data = _intelligence_daemon.deduplicator.get_recent_drivers(minutes=minutes_ago)
         
@@ -4081,6 +3990,14 @@ def api_intelligence_flows():
         from uber.intelligence.trajectory import get_trajectory_analyzer
         analyzer = get_trajectory_analyzer()
         
+        hours = request.args.get('hours', type=int)
+        if hours:
+            from intelligence.persistence import query_flow_aggregates
+            flows = query_flow_aggregates(datetime.now() - timedelta(hours=hours),
+                                          source_zone=request.args.get('source'),
+                                          target_zone=request.args.get('target'))
+            return jsonify(success=True, hours=hours, flows=flows)
+        
         minutes = request.args.get('minutes', 30, type=int)
         flows = analyzer.get_zone_flow_summary(minutes=minutes)
         
@@ -4449,10 +4366,8 @@ def auto_start_intelligence_engine():
     global _intelligence_daemon
     
     try:
-        from objects.uberDev import fetch_drivers_at_location
-        
         if _intelligence_daemon is None:
-            _intelligence_daemon = IntelligenceDaemon(fetch_drivers_at_location, flask_app=app)
+            _intelligence_daemon = IntelligenceDaemon(get_fetch_drivers_func(), flask_app=app)
         
         if not _intelligence_daemon.is_running:
             result = _intelligence_daemon.start()
@@ -2,10 +2,10 @@ import re
 import requests
 import time
 import json
-import math
 import uuid
 import random
 
+from intelligence.geo import haversine_m
 from source.cred import loc_headers, fare_cookies, fare_headers, fare_query, flight_cookies, flight_headers, rider_graphql_query
 import config
 
@@ -40,19 +40,7 @@ def generate_random_location():
 
 def calculate_distance(lat1, lon1, lat2, lon2):
     """Calculate distance between two coordinates in kilometers using Haversine formula"""
-    R = 6371  # Earth's radius in km
-
-    lat1_rad = math.radians(lat1)
-    lat2_rad = math.radians(lat2)
-    delta_lat = math.radians(lat2 - lat1)
-    delta_lon = math.radians(lon2 - lon1)
-
-    a = math.sin(
-        delta_lat / 2)**2 + math.cos(lat1_rad) * math.cos(lat2_rad) * math.sin(
-            delta_lon / 2)**2
-    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
-
-    return round(R * c, 1)
+    return round(haversine_m(lat1, lon1, lat2, lon2) / 1000, 1)
 
 
 def locationTracker(addrs):